@@ -1,16 +1,34 @@
 import asyncio
 import json
 import uuid
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, StreamingResponse
 
-from src.client import ToolSelectorClient
 from src.environment import INDEX_PATH, METADATA_PATH, RESPONSE_RETRIEVAL_COUNT
+from src.llm_cache import shared_llm_cache
+from src.llm_client import TRANSPORT_STATS
+from src.results import materialize
+from src.startup import AgentStartup
 
-app = FastAPI(title="Tool Selector Backend", version="0.1.0")
+STARTUP = AgentStartup(index_path=INDEX_PATH, metadata_path=METADATA_PATH, use_async=True)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Load in a worker thread so the server accepts /healthz while the index and model come up.
+    task = asyncio.create_task(asyncio.to_thread(STARTUP.run))
+    yield
+    if not task.done():
+        task.cancel()
+    elif STARTUP.agent is not None:
+        STARTUP.agent.close()
+
+
+app = FastAPI(title="Tool Selector Backend", version="0.1.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -21,7 +39,10 @@ app.add_middleware(
 )
 
 
-AGENT = ToolSelectorClient(index_path=INDEX_PATH, metadata_path=METADATA_PATH)
+def not_ready():
+    detail = "Startup failed." if STARTUP.error else "Service is starting up."
+    return JSONResponse({"detail": detail, **STARTUP.status()}, status_code=503)
+
 
 async def stream_output(plan):
     text = json.dumps(plan, indent=2, ensure_ascii=False)
@@ -30,13 +51,50 @@ async def stream_output(plan):
         await asyncio.sleep(0.01)
 
 
+@app.get("/healthz")
+async def healthz():
+    # Liveness: the process serves requests; only a failed startup should get the worker restarted.
+    if STARTUP.error:
+        return JSONResponse({"status": "failed", "error": STARTUP.error}, status_code=500)
+    return JSONResponse({"status": "ok"})
+
+
+@app.get("/readyz")
+async def readyz():
+    if not STARTUP.ready:
+        return not_ready()
+    return JSONResponse(STARTUP.status())
+
+
+@app.get("/api/metrics")
+async def metrics():
+    if not STARTUP.ready:
+        return not_ready()
+    agent = STARTUP.agent
+    return JSONResponse({
+        "query_embedding_cache": agent.indexer.query_cache.stats(),
+        "search_paths": agent.indexer.search_stats.stats(),
+        "speculation": agent.speculation_stats.stats(),
+        "plan_cache": agent.plan_cache.stats(),
+        "llm_cache": shared_llm_cache().stats(),
+        "llm_transport": TRANSPORT_STATS.stats(),
+        "search_batching": agent.search_batcher.stats() if agent.search_batcher else None,
+        "degradation": agent.degradation(),
+        "startup": STARTUP.status(),
+    })
+
+
 @app.post("/api/query")
 async def query_tool(req: Request):
+    if not STARTUP.ready:
+        return not_ready()
     context_session_id = str(uuid.uuid4())
     data = await req.json()
     query = data.get("query", "")
     stream = bool(data.get("stream"))
-    result = AGENT.plan_query(query, count=RESPONSE_RETRIEVAL_COUNT)
+    # Optional per-request override of REQUEST_DEADLINE_MS.
+    deadline_ms = data.get("deadline_ms")
+    result = materialize(await STARTUP.agent.plan_query(query, count=RESPONSE_RETRIEVAL_COUNT, deadline_ms=deadline_ms))
 
     if stream:
         return StreamingResponse(stream_output(result), media_type="text/plain")
@@ -0,0 +1,128 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from src.embedder import Embedder  # noqa: E402
+from src.index_types import INDEX_TYPES, build_populated_index, resolve_index_config  # noqa: E402
+from src.utils import generate_function_as_text, load_functions, normalize, read_records  # noqa: E402
+
+DATASETS = [
+    ("manual_easy",   ROOT / "data" / "gorilla_openfunctions_v1_manual_test.json"),
+    ("manual_medium", ROOT / "data" / "gorilla_openfunctions_v1_manual_test_medium.json"),
+    ("manual_hard",   ROOT / "data" / "gorilla_openfunctions_v1_manual_test_hard.json"),
+    ("manual_cross",  ROOT / "data" / "gorilla_openfunctions_v1_manual_test_cross.json"),
+]
+
+
+def load_queries():
+    queries = []
+    for label, path in DATASETS:
+        if not path.exists():
+            print(f"[{label}] skipping (dataset not found: {path})")
+            continue
+        for rec in read_records(path):
+            query = rec.get("Instruction") or rec.get("question") or ""
+            if query:
+                queries.append(query)
+    return queries
+
+
+def recall_at_k(approx_ids, exact_ids):
+    k = exact_ids.shape[1]
+    hits = [len(set(a[a >= 0]) & set(e[e >= 0])) for a, e in zip(approx_ids, exact_ids)]
+    return float(np.mean(hits)) / k if hits else 0.0
+
+
+def time_single_queries(index, qvecs, k):
+    # One row per call, as Indexer.search issues it in production.
+    latencies = []
+    ids = np.empty((len(qvecs), k), dtype=np.int64)
+    for i in range(len(qvecs)):
+        t0 = time.perf_counter()
+        _, row_ids = index.search(qvecs[i:i + 1], k)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        ids[i] = row_ids[0]
+    return ids, np.array(latencies)
+
+
+def compare(corpus, qvecs, k, types, params):
+    # Exact baseline over the raw normalized vectors: no PCA / scalar quantization from the environment.
+    exact_index = faiss.IndexFlatIP(corpus.shape[1])
+    exact_index.add(corpus)
+    _, exact_ids = exact_index.search(qvecs, k)
+
+    rows = []
+    for name in types:
+        index_type, index_params = resolve_index_config(name, params)
+        t0 = time.perf_counter()
+        try:
+            index = build_populated_index(index_type, corpus, index_params)
+        except (RuntimeError, ValueError) as exc:
+            print(f"[{index_type}] build failed: {exc}")
+            continue
+        build_s = time.perf_counter() - t0
+
+        ids, latencies = time_single_queries(index, qvecs, k)
+        rows.append({
+            "index_type": index_type,
+            "build_s": build_s,
+            "recall": recall_at_k(ids, exact_ids),
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+        })
+    return rows
+
+
+def print_report(rows, k, n_corpus, n_queries):
+    print(f"\ncorpus={n_corpus} queries={n_queries} k={k} (recall measured against exact search on the raw vectors)")
+    print(f"{'index_type':<10} {'build_s':>8} {'recall@' + str(k):>10} {'p50_ms':>8} {'p99_ms':>8}")
+    for row in rows:
+        print(
+            f"{row['index_type']:<10} {row['build_s']:>8.2f} {row['recall']:>10.3f} "
+            f"{row['p50_ms']:>8.3f} {row['p99_ms']:>8.3f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare FAISS index types against exact search over the raw vectors.")
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--types", nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    parser.add_argument("--nlist", type=int)
+    parser.add_argument("--nprobe", type=int)
+    parser.add_argument("--M", type=int)
+    parser.add_argument("--efSearch", type=int)
+    parser.add_argument("--pq-m", dest="pq_m", type=int)
+    args = parser.parse_args()
+    params = {
+        key: value
+        for key, value in (("nlist", args.nlist), ("nprobe", args.nprobe), ("M", args.M),
+                           ("efSearch", args.efSearch), ("pq_m", args.pq_m))
+        if value is not None
+    }
+
+    apis = load_functions()
+    queries = load_queries()
+    if not apis or not queries:
+        print("Nothing to compare: empty tool catalog or no queries.")
+        return
+
+    embedder = Embedder()
+    texts = [generate_function_as_text(api) for api in apis.values()]
+    corpus = normalize(embedder.embed_batch(texts).astype("float32"))
+    qvecs = normalize(embedder.embed_batch(queries).astype("float32"))
+
+    k = min(args.k, len(corpus))
+    rows = compare(corpus, qvecs, k, args.types, params)
+    print_report(rows, k, len(corpus), len(queries))
+
+
+if __name__ == "__main__":
+    main()
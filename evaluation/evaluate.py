@@ -1,11 +1,15 @@
+import argparse
 import ast
 import hashlib
 import json
 from pathlib import Path
 
+from src.embedder import Embedder
 from src.indexer import Indexer
 from src.environment import INDEX_PATH, METADATA_PATH, MISMATCH_PATH
-from src.utils import read_records
+from src.index_types import build_populated_index, index_nbytes, resolve_index_config
+from src.results import materialize
+from src.utils import generate_function_as_text, load_functions, normalize, read_records
 
 
 DATASETS = [
@@ -15,6 +19,15 @@ DATASETS = [
     ("manual_cross",  Path("../data/gorilla_openfunctions_v1_manual_test_cross.json")),
 ]
 
+COMPRESSION_SETTINGS = [
+    ("float32",    {"pca_dim": 0, "scalar_quant": "none"}),
+    ("fp16",       {"pca_dim": 0, "scalar_quant": "fp16"}),
+    ("sq8",        {"pca_dim": 0, "scalar_quant": "sq8"}),
+    ("pca192",     {"pca_dim": 192, "scalar_quant": "none"}),
+    ("pca192+sq8", {"pca_dim": 192, "scalar_quant": "sq8"}),
+    ("pca96+sq8",  {"pca_dim": 96, "scalar_quant": "sq8"}),
+]
+
 
 
 def load_dataset(path, limit):
@@ -116,22 +129,23 @@ def evaluate_dataset(label, path, sample_size, k, indexer):
     total = hit = 0
     misses = []
 
+    cases = []
     for rec in rows:
         query = rec.get("Instruction") or rec.get("question") or ""
         expected = extract_expected_function(rec)
-        if not expected:
-            continue
+        if expected:
+            cases.append((query, expected))
 
+    all_hits = indexer.search_many([query for query, _ in cases])
+    for (query, expected), hits in zip(cases, all_hits):
         total += 1
-
-        hits = indexer.search(query)
         if find_matching_api(expected, hits):
             hit += 1
         else:
             misses.append({
                 "query": query,
                 "expected": expected,
-                "topk": hits,
+                "topk": materialize(hits),
             })
 
     recall = hit / total if total else 0.0
@@ -165,8 +179,69 @@ def evaluate_all(sample_size=100, k=5):
         if res:
             results.append(res)
 
+    paths = indexer.search_stats.stats()
+    print(
+        f"lexical fast path: {paths['fast_path_queries']}/{paths['queries']} queries "
+        f"({paths['fast_path_rate']:.1%}), {paths['fast_path_mean_ms']:.2f} ms vs "
+        f"{paths['dense_mean_ms']:.2f} ms dense / {paths['fused_mean_ms']:.2f} ms fused "
+        f"(+{paths['fusion_added_mean_ms']:.2f} ms BM25); "
+        f"~{paths['estimated_saved_ms']:.0f} ms saved"
+    )
+    return results
+
+
+def evaluate_compression(sample_size=100, k=5, settings=COMPRESSION_SETTINGS):
+    apis = load_functions()
+    records = [{"tool_id": tool_id, **api} for tool_id, api in apis.items()]
+    embedder = Embedder()
+    corpus = normalize(embedder.embed_batch([generate_function_as_text(r) for r in records]).astype("float32"))
+
+    cases = []
+    for label, path in DATASETS:
+        if not path.exists():
+            print(f"[{label}] skipping (dataset not found: {path})")
+            continue
+        for rec in load_dataset(path, sample_size):
+            query = rec.get("Instruction") or rec.get("question") or ""
+            expected = extract_expected_function(rec)
+            if expected:
+                cases.append((query, expected))
+    if not cases or not records:
+        print("Nothing to evaluate: empty tool catalog or no queries.")
+        return []
+    qvecs = normalize(embedder.embed_batch([q for q, _ in cases]).astype("float32"))
+
+    results = []
+    baseline = None
+    print(f"\n{'setting':<12} {'bytes':>12} {'saved':>7} {'recall@' + str(k):>10} {'lost':>7}")
+    for name, setting in settings:
+        index_type, params = resolve_index_config(None, setting)
+        try:
+            index = build_populated_index(index_type, corpus, params)
+        except ValueError as exc:
+            print(f"{name:<12} skipped ({exc})")
+            continue
+        _, ids = index.search(qvecs, k)
+        hit = sum(
+            find_matching_api(expected, [records[i] for i in row if i >= 0])
+            for (_, expected), row in zip(cases, ids)
+        )
+        res = {"setting": name, "bytes": index_nbytes(index), "recall": hit / len(cases)}
+        baseline = baseline or res
+        res["saved"] = 1 - res["bytes"] / baseline["bytes"]
+        res["recall_lost"] = baseline["recall"] - res["recall"]
+        print(f"{name:<12} {res['bytes']:>12} {res['saved']:>7.1%} {res['recall']:>10.3f} {res['recall_lost']:>7.3f}")
+        results.append(res)
+
     return results
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall harness for the Gorilla manual test sets.")
+    parser.add_argument("--compression", action="store_true",
+                        help="also report index size and recall@k for each PCA / scalar-quantization setting")
+    args = parser.parse_args()
+
     evaluate_all(sample_size=100, k=5)
+    if args.compression:
+        evaluate_compression(sample_size=100, k=5)
@@ -0,0 +1,97 @@
+import asyncio
+import time
+
+from src.environment import SEARCH_BATCH_MAX_QUERIES, SEARCH_BATCH_WINDOW_MS
+
+
+class BatchStats:
+    # Only touched from the event loop thread, so no lock.
+    def __init__(self):
+        self.batches = 0
+        self.requests = 0
+        self.queries = 0
+        self.max_batch_queries = 0
+        self.total_delay_ms = 0.0
+        self.max_delay_ms = 0.0
+
+    def record(self, requests, queries, delays_ms):
+        self.batches += 1
+        self.requests += requests
+        self.queries += queries
+        self.max_batch_queries = max(self.max_batch_queries, queries)
+        self.total_delay_ms += sum(delays_ms)
+        self.max_delay_ms = max(self.max_delay_ms, *delays_ms)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "queries": self.queries,
+            "mean_batch_queries": self.queries / self.batches if self.batches else 0.0,
+            "mean_batch_requests": self.requests / self.batches if self.batches else 0.0,
+            "max_batch_queries": self.max_batch_queries,
+            "mean_queue_delay_ms": self.total_delay_ms / self.requests if self.requests else 0.0,
+            "max_queue_delay_ms": self.max_delay_ms,
+        }
+
+
+class SearchBatcher:
+    # Coalesces search_many calls from concurrent requests: the first caller opens a window, and when it
+    # closes (or max_queries are queued) every queued segment goes through one embed + one FAISS search.
+    def __init__(self, search_many, executor=None, window_ms=SEARCH_BATCH_WINDOW_MS,
+                 max_queries=SEARCH_BATCH_MAX_QUERIES):
+        self._search_many = search_many
+        self.executor = executor
+        self.window_s = window_ms / 1000
+        self.max_queries = max_queries
+        self.batch_stats = BatchStats()
+        self._pending = []
+        self._pending_queries = 0
+        self._timer = None
+
+    async def search_many(self, queries):
+        queries = list(queries)
+        if not queries:
+            return []
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((queries, future, time.perf_counter()))
+        self._pending_queries += len(queries)
+        if self._pending_queries >= self.max_queries:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_s, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending, self._pending_queries = self._pending, [], 0
+        if batch:
+            asyncio.get_running_loop().create_task(self._run(batch))
+
+    async def _run(self, batch):
+        dispatched = time.perf_counter()
+        queries = [q for batch_queries, _, _ in batch for q in batch_queries]
+        self.batch_stats.record(len(batch), len(queries), [(dispatched - t) * 1000 for _, _, t in batch])
+        try:
+            hits = await asyncio.get_running_loop().run_in_executor(self.executor, self._search_many, queries)
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        offset = 0
+        for batch_queries, future, _ in batch:
+            # A caller that was cancelled while queued no longer wants its slice.
+            if not future.done():
+                future.set_result(hits[offset:offset + len(batch_queries)])
+            offset += len(batch_queries)
+
+    def stats(self):
+        return {
+            "window_ms": self.window_s * 1000,
+            "max_queries": self.max_queries,
+            **self.batch_stats.stats(),
+        }
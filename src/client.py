@@ -1,20 +1,73 @@
+import asyncio
 import json
 import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pprint import pprint
 
+from src.batching import SearchBatcher
 from src.context_segmenter import DeterministicSegmenter, LLMBasedSegmenter
-from src.embedder import Embedder
-from src.environment import INDEX_PATH, METADATA_PATH
+from src.deadline import CircuitBreaker, Deadline, DegradationStats
+from src.embedding_cache import normalize_cache_text
+from src.environment import (
+    DEADLINE_MIN_STAGE_MS,
+    INDEX_PATH,
+    MAX_FUSED_CANDIDATES,
+    METADATA_PATH,
+    REQUEST_DEADLINE_MS,
+    SEARCH_BATCH_WINDOW_MS,
+    SEARCH_EXECUTOR_WORKERS,
+    SHARD_ADDRESSES,
+    STAGE_DEADLINE_SHARES,
+)
 from src.executor import Executor
 from src.indexer import Indexer
+from src.llm_client import is_timeout
 from src.logger import get_logger
+from src.plan_cache import SemanticPlanCache
 from src.planner import LLMPlanner, Planner
 from src.reranker import OpenAILLMReranker, Reranker
+from src.results import merge_segment_hits
+from src.sharding import ShardedIndexer
 
 use_llm_planner = os.getenv("USE_LLM_PLANNER", "false").lower() in ("1", "true", "yes")
 use_llm_rerank = os.getenv("USE_LLM_RERANK", "false").lower() in ("1", "true", "yes")
 use_llm_context_segmenter = os.getenv("USE_LLM_CONTEXT_SEGMENTER", "false").lower() in ("1", "true", "yes")
+use_speculative_retrieval = os.getenv("SPECULATIVE_RETRIEVAL", "false").lower() in ("1", "true", "yes")
+
+
+class SpeculationStats:
+    # How many LLM segments were already covered by the speculative searches.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.segments = 0
+        self.reused = 0
+
+    def record(self, segments, reused):
+        with self._lock:
+            self.queries += 1
+            self.segments += segments
+            self.reused += reused
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queries": self.queries,
+                "segments": self.segments,
+                "reused_segments": self.reused,
+                "reuse_rate": self.reused / self.segments if self.segments else 0.0,
+            }
+
+
+def _llm_rerank_failure(result):
+    # OpenAILLMReranker answers with the retrieval order instead of raising when its call fails, with
+    # notes "rerank_fallback:<timeout|error>:...".
+    if not result.notes.startswith("rerank_fallback:"):
+        return None
+    return "timeout" if result.notes.startswith("rerank_fallback:timeout:") else "error"
+
 
 class ToolSelectorClient:
     def __init__(
@@ -22,36 +75,178 @@ class ToolSelectorClient:
         index_path=INDEX_PATH,
         metadata_path=METADATA_PATH,
         logger_name="client",
+        search_workers=SEARCH_EXECUTOR_WORKERS,
     ):
         self.logger = get_logger(logger_name)
-        self.indexer = Indexer(index_path=index_path, metadata_path=metadata_path)
+
+        t0 = time.perf_counter()
+        if SHARD_ADDRESSES:
+            self.indexer = ShardedIndexer(SHARD_ADDRESSES)
+        else:
+            self.indexer = Indexer(index_path=index_path, metadata_path=metadata_path)
         self.indexer.load()
+        t1 = time.perf_counter()
         self.context_segments = LLMBasedSegmenter() if use_llm_context_segmenter else DeterministicSegmenter()
-        self.embedder = Embedder()
+        # Reuse the indexer's embedder (and its registry-shared model) instead of loading another copy.
+        self.embedder = self.indexer.embedder
         self.reranker = OpenAILLMReranker() if use_llm_rerank else Reranker()
         self.planner = LLMPlanner() if use_llm_planner else Planner()
+        t2 = time.perf_counter()
+
+        # While the LLM segmenter is in flight, search the raw query and the deterministic segments.
+        self.speculative = use_speculative_retrieval and use_llm_context_segmenter
+        self.speculation_stats = SpeculationStats()
+        # Deterministic stages an LLM stage degrades to; the segmenter also drives speculative searches.
+        self.fallback_segments = DeterministicSegmenter()
+        self.fallback_reranker = Reranker()
+        self.fallback_planner = Planner()
+        self.breakers = {stage: CircuitBreaker() for stage in STAGE_DEADLINE_SHARES}
+        self.degradation_stats = DegradationStats()
+        self.plan_cache = SemanticPlanCache()
+        # Threads start on first submit, so clients that never search off-thread pay nothing for it.
+        self.search_executor = ThreadPoolExecutor(max_workers=search_workers, thread_name_prefix="search")
+
+        # Per-component construction time, reported by the backend's cold-start log.
+        self.startup_ms = {
+            "index_load_ms": (t1 - t0) * 1000,
+            "pipeline_stages_ms": (t2 - t1) * 1000,
+        }
+
+    def _cached_plan(self, query, count):
+        # Returns (cached result or None, key to store a fresh result under).
+        if not self.plan_cache.enabled or not str(query).strip():
+            return None, None
+        key = (self.indexer.embed_queries([query])[0], count, self.indexer.version)
+        cached = self.plan_cache.get(*key)
+        if cached is not None:
+            # A paraphrase hit answers the caller's query: the plan must echo it, not the cached one.
+            plan = cached.get("plan")
+            if isinstance(plan, dict) and "query" in plan:
+                plan = {**plan, "query": query}
+            return {**cached, "query": query, "plan": plan, "cached": True, "cached_query": cached["query"]}, key
+        return None, key
+
+    def _store_plan(self, key, result):
+        # Degraded answers are not cached, so the next similar query gets another try at the LLM stages.
+        if key is not None and not result.get("degraded"):
+            self.plan_cache.put(*key, result)
+        return {**result, "cached": False}
+
+    def _speculative_queries(self, query):
+        return [q for q in dict.fromkeys([query.strip(), *self.fallback_segments.segment(query)]) if q]
+
+    def _admit(self, name, deadline):
+        # Returns (timeout for the LLM call, reason to skip it instead).
+        timeout = deadline.slice_s(STAGE_DEADLINE_SHARES[name])
+        if timeout is not None and timeout * 1000 < DEADLINE_MIN_STAGE_MS:
+            return timeout, "deadline"
+        if not self.breakers[name].allow():
+            return timeout, "circuit_open"
+        return timeout, None
 
+    def _failure_reason(self, name, error):
+        self.logger.warning("LLM %s call failed: %s: %s", name, type(error).__name__, error)
+        return "timeout" if is_timeout(error) else "error"
+
+    def _settle(self, name, reason, degraded):
+        # Returns True when the stage has to fall back; only real call failures count against the breaker.
+        if reason is None:
+            self.breakers[name].record_success()
+            return False
+        if reason in ("timeout", "error"):
+            self.breakers[name].record_failure()
+        degraded[name] = reason
+        self.degradation_stats.record(name, reason)
+        self.logger.warning("Stage %s degraded to its deterministic fallback (%s)", name, reason)
+        return True
+
+    def _run_stage(self, name, stage, fallback, call, deadline, degraded, failure=None):
+        # `call(stage, **kw)` runs the stage; LLM stages get their slice of the deadline as `timeout`.
+        # `failure(result)` names a failure the stage answered with instead of raising, if any.
+        if not hasattr(stage, "llm_stage"):
+            return call(stage)
+        if not stage.has_client():
+            # No OPENAI_API_KEY: the call could never reach the LLM, so this is configuration, not degradation.
+            return call(fallback)
+        result = None
+        timeout, reason = self._admit(name, deadline)
+        if reason is None:
+            try:
+                result = call(stage, **({} if timeout is None else {"timeout": timeout}))
+            except Exception as e:
+                reason = self._failure_reason(name, e)
+            else:
+                reason = failure(result) if failure is not None else None
+        return call(fallback) if self._settle(name, reason, degraded) else result
+
+    def degradation(self):
+        return {
+            "breakers": {stage: breaker.stats() for stage, breaker in self.breakers.items()},
+            "degraded": self.degradation_stats.stats(),
+        }
+
+    def _unsearched(self, segmented_queries, speculative):
+        known = set(map(normalize_cache_text, speculative))
+        return list(dict.fromkeys(q for q in segmented_queries if normalize_cache_text(q) not in known))
+
+    def _combine_hits(self, segmented_queries, speculative, speculative_hits, new, new_hits):
+        # LLM segments come first so MergedHit.segments indices line up with the LLM's segments;
+        # speculative queries the LLM did not produce follow and still contribute their hits.
+        by_key = {normalize_cache_text(q): hits for q, hits in zip(speculative, speculative_hits)}
+        by_key.update((normalize_cache_text(q), hits) for q, hits in zip(new, new_hits))
+        self.speculation_stats.record(len(segmented_queries), len(segmented_queries) - len(new))
+        order = dict.fromkeys(normalize_cache_text(q) for q in [*segmented_queries, *speculative])
+        return [by_key[key] for key in order]
+
+    def _segment(self, query, deadline, degraded):
+        return self._run_stage("segmenter", self.context_segments, self.fallback_segments,
+                               lambda s, **kw: s.segment(query, **kw), deadline, degraded)
+
+    def retrieve(self, query, deadline=None, degraded=None):
+        # Returns the merged candidates and when the segments became available.
+        deadline = deadline or Deadline(0)
+        degraded = {} if degraded is None else degraded
+        if not self.speculative:
+            segmented_queries = self._segment(query, deadline, degraded)
+            segmented_at = time.perf_counter()
+            hits = self.indexer.search_many(segmented_queries)
+        else:
+            speculative = self._speculative_queries(query)
+            pending = self.search_executor.submit(self.indexer.search_many, speculative)
+            segmented_queries = self._segment(query, deadline, degraded)
+            segmented_at = time.perf_counter()
+            speculative_hits = pending.result()
+            new = self._unsearched(segmented_queries, speculative)
+            new_hits = self.indexer.search_many(new) if new else []
+            hits = self._combine_hits(segmented_queries, speculative, speculative_hits, new, new_hits)
+        return merge_segment_hits(hits, limit=MAX_FUSED_CANDIDATES), segmented_at
+
+    def _rerank(self, query, candidates, count, deadline, degraded):
+        return self._run_stage("rerank", self.reranker, self.fallback_reranker,
+                               lambda s, **kw: s.rerank(query, candidates, top_n=count, **kw),
+                               deadline, degraded, failure=_llm_rerank_failure)
+
+    def _plan(self, query, candidates, count, deadline, degraded):
+        return self._run_stage("planner", self.planner, self.fallback_planner,
+                               lambda s, **kw: s.plan(query, candidates, max_candidates=count, **kw),
+                               deadline, degraded)
 
     def plan_query_with_timing(
         self,
         query,
-        count: int = 5
+        count: int = 5,
+        deadline_ms=None
     ):
+        deadline = Deadline(REQUEST_DEADLINE_MS if deadline_ms is None else deadline_ms)
+        degraded = {}
         t0 = time.perf_counter()
-        segmented_queries = self.context_segments.segment(query)
-        t1 = time.perf_counter()
-
-        candidates = [
-            item
-            for seg_query in segmented_queries
-            for item in self.indexer.search(seg_query)
-        ]
+        candidates, t1 = self.retrieve(query, deadline, degraded)
         t2 = time.perf_counter()
 
-        rerank_result = self.reranker.rerank(query, candidates, top_n=count)
+        rerank_result = self._rerank(query, candidates, count, deadline, degraded)
         t3 = time.perf_counter()
 
-        plan = self.planner.plan(query, rerank_result.candidates, max_candidates=count)
+        plan = self._plan(query, rerank_result.candidates, count, deadline, degraded)
         t4 = time.perf_counter()
 
         timings_ms = {
@@ -69,22 +264,32 @@ class ToolSelectorClient:
             "plan": plan,
             "candidates": candidates,
             "timings_ms": timings_ms,
+            "degraded": degraded,
         }
 
     def plan_query(
         self,
         query,
-        count: int = 5
+        count: int = 5,
+        deadline_ms=None
     ):
-        segmented_queries = self.context_segments.segment(query)
-
-        candidates = [item for seg_query in segmented_queries for item in self.indexer.search(seg_query)]
-        rerank_result = self.reranker.rerank(query, candidates, top_n=count)
-        plan = self.planner.plan(query, rerank_result.candidates, max_candidates=count)
-        return {"query": query, "plan": plan, "candidates": candidates}
+        deadline = Deadline(REQUEST_DEADLINE_MS if deadline_ms is None else deadline_ms)
+        cached, key = self._cached_plan(query, count)
+        if cached is not None:
+            return cached
+        degraded = {}
+        candidates, _ = self.retrieve(query, deadline, degraded)
+        rerank_result = self._rerank(query, candidates, count, deadline, degraded)
+        plan = self._plan(query, rerank_result.candidates, count, deadline, degraded)
+        return self._store_plan(key, {"query": query, "plan": plan, "candidates": candidates, "degraded": degraded})
 
     def run_and_print(self, query, count=5):
-        result = self.plan_query(query, count=count)
+        self._print_result(query, self.plan_query(query, count=count))
+
+    def close(self):
+        self.search_executor.shutdown(wait=False)
+
+    def _print_result(self, query, result):
         self.logger.info("Query: %s", query)
         print("\nTop-k tools for query:")
         print(query)
@@ -105,6 +310,131 @@ class ToolSelectorClient:
         print(json.dumps(exec_result, indent=2, ensure_ascii=False))
 
 
+class AsyncToolSelectorClient(ToolSelectorClient):
+    # Same pipeline as ToolSelectorClient with coroutine stages: LLM calls go through AsyncOpenAI and
+    # embedding + FAISS run on the search thread pool, so one slow request does not stall the event loop.
+    def __init__(self, index_path=INDEX_PATH, metadata_path=METADATA_PATH, logger_name="client",
+                 search_workers=SEARCH_EXECUTOR_WORKERS, batch_window_ms=SEARCH_BATCH_WINDOW_MS):
+        super().__init__(index_path=index_path, metadata_path=metadata_path, logger_name=logger_name,
+                         search_workers=search_workers)
+        # Looked up per batch so wrappers installed on indexer.search_many later still apply.
+        self.search_batcher = SearchBatcher(
+            lambda queries: self.indexer.search_many(queries), self.search_executor, window_ms=batch_window_ms,
+        ) if batch_window_ms > 0 else None
+
+    def _search(self, queries):
+        if self.search_batcher is not None:
+            return asyncio.ensure_future(self.search_batcher.search_many(queries))
+        return asyncio.get_running_loop().run_in_executor(self.search_executor, self.indexer.search_many, queries)
+
+    async def _run_stage(self, name, stage, fallback, call, deadline, degraded, failure=None):
+        # `call(stage)` returns the stage's coroutine; the deadline slice is enforced with wait_for.
+        if not hasattr(stage, "llm_stage"):
+            return await call(stage)
+        if not stage.has_client(is_async=True):
+            return await call(fallback)
+        result = None
+        timeout, reason = self._admit(name, deadline)
+        if reason is None:
+            try:
+                result = await asyncio.wait_for(call(stage), timeout)
+            except Exception as e:
+                reason = self._failure_reason(name, e)
+            else:
+                reason = failure(result) if failure is not None else None
+        return await call(fallback) if self._settle(name, reason, degraded) else result
+
+    def _segment(self, query, deadline, degraded):
+        return self._run_stage("segmenter", self.context_segments, self.fallback_segments,
+                               lambda s: s.asegment(query), deadline, degraded)
+
+    def _rerank(self, query, candidates, count, deadline, degraded):
+        return self._run_stage("rerank", self.reranker, self.fallback_reranker,
+                               lambda s: s.arerank(query, candidates, top_n=count),
+                               deadline, degraded, failure=_llm_rerank_failure)
+
+    def _plan(self, query, candidates, count, deadline, degraded):
+        return self._run_stage("planner", self.planner, self.fallback_planner,
+                               lambda s: s.aplan(query, candidates, max_candidates=count), deadline, degraded)
+
+    async def retrieve(self, query, deadline=None, degraded=None):
+        deadline = deadline or Deadline(0)
+        degraded = {} if degraded is None else degraded
+        if not self.speculative:
+            segmented_queries = await self._segment(query, deadline, degraded)
+            segmented_at = time.perf_counter()
+            hits = await self._search(segmented_queries)
+        else:
+            speculative = self._speculative_queries(query)
+            pending = self._search(speculative)
+            try:
+                segmented_queries = await self._segment(query, deadline, degraded)
+            except BaseException:
+                pending.cancel()
+                raise
+            segmented_at = time.perf_counter()
+            speculative_hits = await pending
+            new = self._unsearched(segmented_queries, speculative)
+            new_hits = await self._search(new) if new else []
+            hits = self._combine_hits(segmented_queries, speculative, speculative_hits, new, new_hits)
+        return merge_segment_hits(hits, limit=MAX_FUSED_CANDIDATES), segmented_at
+
+    async def plan_query_with_timing(
+        self,
+        query,
+        count: int = 5,
+        deadline_ms=None
+    ):
+        deadline = Deadline(REQUEST_DEADLINE_MS if deadline_ms is None else deadline_ms)
+        degraded = {}
+        t0 = time.perf_counter()
+        candidates, t1 = await self.retrieve(query, deadline, degraded)
+        t2 = time.perf_counter()
+
+        rerank_result = await self._rerank(query, candidates, count, deadline, degraded)
+        t3 = time.perf_counter()
+
+        plan = await self._plan(query, rerank_result.candidates, count, deadline, degraded)
+        t4 = time.perf_counter()
+
+        timings_ms = {
+            "segment_in_llm_ms": (t1 - t0) * 1000,
+            "search_in_vector_db_ms": (t2 - t1) * 1000,
+            "rerank_in_llm_ms": (t3 - t2) * 1000,
+            "plan_in_llm_ms": (t4 - t3) * 1000,
+            "total_ms": (t4 - t0) * 1000,
+        }
+
+        return {
+            "query": query,
+            "plan": plan,
+            "candidates": candidates,
+            "timings_ms": timings_ms,
+            "degraded": degraded,
+        }
+
+    async def plan_query(
+        self,
+        query,
+        count: int = 5,
+        deadline_ms=None
+    ):
+        deadline = Deadline(REQUEST_DEADLINE_MS if deadline_ms is None else deadline_ms)
+        cached, key = None, None
+        if self.plan_cache.enabled:
+            loop = asyncio.get_running_loop()
+            cached, key = await loop.run_in_executor(self.search_executor, self._cached_plan, query, count)
+        if cached is not None:
+            return cached
+        degraded = {}
+        candidates, _ = await self.retrieve(query, deadline, degraded)
+        rerank_result = await self._rerank(query, candidates, count, deadline, degraded)
+        plan = await self._plan(query, rerank_result.candidates, count, deadline, degraded)
+        return self._store_plan(key, {"query": query, "plan": plan, "candidates": candidates, "degraded": degraded})
+
+    def run_and_print(self, query, count=5):
+        self._print_result(query, asyncio.run(self.plan_query(query, count=count)))
+
 if __name__ == "__main__":
     user_query = "Book a flight from Los Angeles to New York for two people on June 15th."
     client = ToolSelectorClient()
@@ -1,9 +1,8 @@
-import os
 import re
 
-from openai import OpenAI
-
 from src.environment import DEFAULT_SEGMENTER_MODEL
+from src.llm_cache import acomplete, complete, shared_llm_cache
+from src.llm_client import AsyncClientMixin, make_openai_client
 from src.utils import load_llm_response_as_json
 
 
@@ -32,13 +31,17 @@ class DeterministicSegmenter:
         segments = [p.strip() for p in parts if p.strip()]
         return segments[: self.max_segments]
 
+    async def asegment(self, query):
+        return self.segment(query)
+
 
-class LLMBasedSegmenter:
+class LLMBasedSegmenter(AsyncClientMixin):
+    llm_stage = "segmenter"
 
     def __init__(self):
         self.model = DEFAULT_SEGMENTER_MODEL
-        self.client = OpenAI() if os.getenv("OPENAI_API_KEY") else None
-
+        self._client = make_openai_client(self.llm_stage)
+        self.llm_cache = shared_llm_cache()
 
     def build_prompt(self, query):
         return (
@@ -47,14 +50,17 @@ class LLMBasedSegmenter:
             f"User request:\n{query}"
         )
 
-    def segment(self, query):
-        if not self.client:
+    def segment(self, query, timeout=None):
+        if not self._client:
             raise RuntimeError("LLM client not configured for segmenter.")
         prompt = self.build_prompt(query)
-        resp = self.client.responses.create(
-            model=self.model,
-            input=prompt,
-            temperature=0.0,
-        )
-        data = load_llm_response_as_json(resp.output_text)
+        data = complete(self._client, self.llm_cache, self.model, prompt, 0.0, load_llm_response_as_json,
+                        timeout=timeout)
+        return data.get("segments") or []
+
+    async def asegment(self, query):
+        if not self.async_client:
+            raise RuntimeError("LLM client not configured for segmenter.")
+        prompt = self.build_prompt(query)
+        data = await acomplete(self.async_client, self.llm_cache, self.model, prompt, 0.0, load_llm_response_as_json)
         return data.get("segments") or []
@@ -0,0 +1,78 @@
+import threading
+import time
+
+from src.environment import BREAKER_FAILURES, BREAKER_RESET_S
+
+
+class Deadline:
+    # Wall-clock budget of one plan_query call; budget_ms <= 0 means no deadline.
+    def __init__(self, budget_ms):
+        self.expires_at = time.monotonic() + budget_ms / 1000 if budget_ms and budget_ms > 0 else None
+
+    def remaining_s(self):
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def slice_s(self, share):
+        # A stage's slice is a share of what is left when it starts, so time saved early flows to later stages.
+        remaining = self.remaining_s()
+        return None if remaining is None else remaining * share
+
+
+class CircuitBreaker:
+    # Opens after `failure_threshold` consecutive failures. Once `reset_s` has passed one trial call is let
+    # through (and the cool-down re-armed): success closes the breaker, another failure keeps it open.
+    def __init__(self, failure_threshold=BREAKER_FAILURES, reset_s=BREAKER_RESET_S):
+        self.failure_threshold = max(failure_threshold, 1)
+        self.reset_s = reset_s
+        self.failures = 0
+        self.opened_at = None
+        self.opens = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_s:
+                return False
+            self.opened_at = time.monotonic()
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    self.opens += 1
+                self.opened_at = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": "closed" if self.opened_at is None else "open",
+                "consecutive_failures": self.failures,
+                "opens": self.opens,
+            }
+
+
+class DegradationStats:
+    # Per-stage count of requests answered by the deterministic fallback, by reason.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {}
+
+    def record(self, stage, reason):
+        with self._lock:
+            by_reason = self.counts.setdefault(stage, {})
+            by_reason[reason] = by_reason.get(reason, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            return {stage: dict(by_reason) for stage, by_reason in self.counts.items()}
@@ -1,11 +1,90 @@
 import os
-from sentence_transformers import SentenceTransformer
-from src.environment import DEFAULT_EMBED_MODEL
+import threading
+import time
+
+import numpy as np
+
+from src.environment import DEFAULT_EMBED_MODEL, EMBED_BACKEND, EMBED_BATCH_SIZE, EMBED_NUM_WORKERS
+from src.logger import get_logger
+from src.onnx_backend import ONNX_BACKENDS, OnnxSentenceEncoder
+from src.utils import rss_mb
+
+EMBED_BACKENDS = ("torch",) + ONNX_BACKENDS
+
+# Process-wide: one loaded model per (model path, backend), shared by every Embedder that asks for it.
+_MODELS = {}
+_MODELS_LOCK = threading.Lock()
+
+
+def _load_model(model_name, backend):
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+
+        return SentenceTransformer(model_name)
+    return OnnxSentenceEncoder(model_name, quantized=backend == "onnx-int8")
+
+
+def get_model(model_name, backend):
+    key = (model_name, backend)
+    model = _MODELS.get(key)
+    if model is not None:
+        return model
+    with _MODELS_LOCK:
+        model = _MODELS.get(key)
+        if model is None:
+            rss_before = rss_mb()
+            start = time.perf_counter()
+            model = _load_model(model_name, backend)
+            get_logger("embedder").info(
+                "Loaded embedding model %s (%s) in %.2fs, RSS +%.0f MB (now %.0f MB)",
+                model_name, backend, time.perf_counter() - start, rss_mb() - rss_before, rss_mb(),
+            )
+            _MODELS[key] = model
+    return model
+
+
+def loaded_models():
+    return list(_MODELS)
+
 
 class Embedder:
-    def __init__(self, model_path=None):
+    def __init__(self, model_path=None, backend=None):
         chosen = model_path or os.getenv("HF_MODEL_PATH") or os.getenv("SENTENCE_TRANSFORMER_MODEL") or DEFAULT_EMBED_MODEL
-        self.model = SentenceTransformer(chosen)
+        backend = backend or EMBED_BACKEND
+        if backend not in EMBED_BACKENDS:
+            raise ValueError(f"Unknown EMBED_BACKEND {backend!r}; expected one of {EMBED_BACKENDS}")
+        self.backend = backend
+        self.model_path = chosen
+        # Backends produce slightly different vectors, so the query cache keys on both.
+        self.model_name = chosen if backend == "torch" else f"{chosen}#{backend}"
+
+    @property
+    def model(self):
+        # Loaded on first encode, not at construction, and shared through the registry.
+        return get_model(self.model_path, self.backend)
 
     def embed(self, text):
         return self.model.encode([text])[0]
+
+    def embed_batch(self, texts, batch_size=EMBED_BATCH_SIZE, num_workers=EMBED_NUM_WORKERS):
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, self.model.get_sentence_embedding_dimension()), dtype="float32")
+
+        # Longest first so each batch (and each worker chunk) pads to a similar length.
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        ordered_texts = [texts[i] for i in order]
+
+        # onnxruntime parallelizes inside the session (ONNX_THREADS) instead of across processes.
+        if num_workers > 1 and self.backend == "torch":
+            pool = self.model.start_multi_process_pool(["cpu"] * num_workers)
+            try:
+                vecs = self.model.encode_multi_process(ordered_texts, pool, batch_size=batch_size)
+            finally:
+                self.model.stop_multi_process_pool(pool)
+        else:
+            vecs = self.model.encode(ordered_texts, batch_size=batch_size)
+
+        out = np.empty_like(vecs)
+        out[order] = vecs
+        return out
@@ -0,0 +1,156 @@
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from src.environment import QUERY_CACHE_PATH, QUERY_CACHE_SIZE
+
+
+def normalize_cache_text(text):
+    return " ".join(str(text).split())
+
+
+class EmbeddingCache:
+    def __init__(self, max_size=QUERY_CACHE_SIZE, path=QUERY_CACHE_PATH):
+        self.max_size = max_size
+        self.path = path or None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._db = None
+        if self.path:
+            self._open()
+
+    def _open(self):
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self._db.commit()
+
+    @staticmethod
+    def make_key(text, model_name):
+        return f"{model_name}\x1f{normalize_cache_text(text)}"
+
+    def _remember(self, key, vec):
+        if self.max_size <= 0:
+            return
+        self._entries[key] = vec
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _read_disk(self, keys):
+        found = {}
+        keys = list(keys)
+        # Stay well below SQLite's bound-parameter limit.
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._db.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk)
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def _write_disk(self, items):
+        self._db.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+            [(key, np.asarray(vec, dtype=np.float32).tobytes()) for key, vec in items],
+        )
+        self._db.commit()
+
+    def get_many(self, texts, model_name, compute):
+        keys = [self.make_key(t, model_name) for t in texts]
+        if not keys:
+            return np.zeros((0, 0), dtype=np.float32)
+        found = {}
+
+        with self._lock:
+            for key in keys:
+                if key in found:
+                    continue
+                vec = self._entries.get(key)
+                if vec is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = vec
+                    self.hits += 1
+
+            pending = [k for k in dict.fromkeys(keys) if k not in found]
+            if pending and self._db is not None:
+                from_disk = self._read_disk(pending)
+                for key, vec in from_disk.items():
+                    found[key] = vec
+                    self._remember(key, vec)
+                self.disk_hits += len(from_disk)
+                pending = [k for k in pending if k not in from_disk]
+
+        if pending:
+            # Encode outside the lock so concurrent lookups are not serialized behind the model.
+            first_text = {}
+            for key, text in zip(keys, texts):
+                first_text.setdefault(key, text)
+            vecs = np.asarray(compute([first_text[k] for k in pending]), dtype=np.float32)
+            computed = list(zip(pending, vecs))
+            with self._lock:
+                self.misses += len(pending)
+                for key, vec in computed:
+                    found[key] = vec
+                    self._remember(key, vec)
+                if self._db is not None:
+                    self._write_disk(computed)
+
+        return np.stack([found[k] for k in keys])
+
+    def embed(self, embedder, texts):
+        return self.get_many(
+            texts,
+            getattr(embedder, "model_name", ""),
+            lambda pending: embedder.embed_batch(pending, num_workers=1),
+        )
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "persistent": self._db is not None,
+            }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+class CorpusEmbeddingCache(EmbeddingCache):
+    # Tool-text embeddings reused across index builds. Disk only: a build reads each key once.
+    def __init__(self, path):
+        super().__init__(max_size=0, path=None)
+        # Opened on first use, so loading an index for serving does not create the file.
+        self.path = path or None
+
+    def get_many(self, texts, model_name, compute):
+        if self.path and self._db is None:
+            with self._lock:
+                if self._db is None:
+                    self._open()
+        return super().get_many(texts, model_name, compute)
+
+    @staticmethod
+    def make_key(text, model_name):
+        # Exact text, not whitespace-normalized: a changed tool text must be re-embedded.
+        return hashlib.sha256(f"{model_name}\x1f{text}".encode("utf-8")).hexdigest()
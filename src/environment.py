@@ -13,9 +13,11 @@ DATASET_PATHS = [
     for p in os.getenv("DATASET_PATHS", str(ROOT / "data" / "gorilla_openfunctions_v1_train.json")).split(",")
     if p.strip()
 ]
+DATASET_CACHE_DIR = os.getenv("DATASET_CACHE_DIR", str(ROOT / "index" / "dataset_cache"))
+DATASET_LOAD_WORKERS = int(os.getenv("DATASET_LOAD_WORKERS", str(min(4, os.cpu_count() or 1))))
 
 INDEX_PATH = os.getenv("INDEX_PATH", str(ROOT / "index" / "faiss.index"))
-METADATA_PATH = os.getenv("METADATA_PATH", str(ROOT / "index" / "metadata.json"))
+METADATA_PATH = os.getenv("METADATA_PATH", str(ROOT / "index" / "metadata.bin"))
 MISMATCH_PATH = os.getenv("MISMATCH_PATH", str(ROOT / "evaluation" / "mismatches.jsonl"))
 
 DEFAULT_EMBED_MODEL = os.getenv("DEFAULT_EMBED_MODEL", "all-MiniLM-L6-v2")
@@ -23,8 +25,100 @@ DEFAULT_RERANK_MODEL = os.getenv("DEFAULT_RERANK_MODEL", "gpt-4o")
 DEFAULT_PLANNER_MODEL = os.getenv("DEFAULT_PLANNER_MODEL", "gpt-4o")
 DEFAULT_SEGMENTER_MODEL = os.getenv("DEFAULT_SEGMENTER_MODEL", "gpt-4o-mini")
 
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "4096"))
+QUERY_CACHE_PATH = os.getenv("QUERY_CACHE_PATH", "")
+# Shared OpenAI transport: one keep-alive pool per process, per-stage timeouts, rate limit and retry budget.
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "10"))
+LLM_KEEPALIVE_EXPIRY_S = float(os.getenv("LLM_KEEPALIVE_EXPIRY_S", "30"))
+LLM_CONNECT_TIMEOUT_S = float(os.getenv("LLM_CONNECT_TIMEOUT_S", "5"))
+LLM_STAGE_TIMEOUTS_S = {
+    "default": float(os.getenv("LLM_TIMEOUT_S", "30")),
+    "segmenter": float(os.getenv("LLM_SEGMENTER_TIMEOUT_S", "10")),
+    "rerank": float(os.getenv("LLM_RERANK_TIMEOUT_S", "15")),
+    "planner": float(os.getenv("LLM_PLANNER_TIMEOUT_S", "20")),
+}
+LLM_RATE_LIMIT_RPS = float(os.getenv("LLM_RATE_LIMIT_RPS", "0"))
+LLM_RATE_BURST = int(os.getenv("LLM_RATE_BURST", "10"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BACKOFF_S = float(os.getenv("LLM_RETRY_BACKOFF_S", "0.25"))
+LLM_RETRY_BUDGET_RATIO = float(os.getenv("LLM_RETRY_BUDGET_RATIO", "0.1"))
+LLM_RETRY_BUDGET_MIN = int(os.getenv("LLM_RETRY_BUDGET_MIN", "10"))
+# Cache of temperature-0 LLM responses keyed on model + prompt; LLM_CACHE_PATH adds a SQLite tier.
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "1024"))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "")
+LLM_CACHE_TTL_S = float(os.getenv("LLM_CACHE_TTL_S", "86400"))
+# Semantic plan cache: reuse a recent plan_query result for a near-duplicate query (0 entries disables).
+PLAN_CACHE_SIZE = int(os.getenv("PLAN_CACHE_SIZE", "0"))
+PLAN_CACHE_THRESHOLD = float(os.getenv("PLAN_CACHE_THRESHOLD", "0.95"))
+PLAN_CACHE_TTL_S = float(os.getenv("PLAN_CACHE_TTL_S", "3600"))
+# Per-request deadline for plan_query (0 disables). Each LLM stage gets a share of the time left when it
+# starts; a slice under DEADLINE_MIN_STAGE_MS, a failed call or an open breaker falls back to the
+# deterministic stage.
+REQUEST_DEADLINE_MS = float(os.getenv("REQUEST_DEADLINE_MS", "0"))
+DEADLINE_MIN_STAGE_MS = float(os.getenv("DEADLINE_MIN_STAGE_MS", "100"))
+STAGE_DEADLINE_SHARES = {
+    "segmenter": float(os.getenv("SEGMENTER_DEADLINE_SHARE", "0.25")),
+    "rerank": float(os.getenv("RERANK_DEADLINE_SHARE", "0.5")),
+    "planner": float(os.getenv("PLANNER_DEADLINE_SHARE", "1.0")),
+}
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET_S = float(os.getenv("BREAKER_RESET_S", "30"))
+# Token budget for the candidate list in rerank / planner prompts (0 = no limit). Counts use tiktoken's
+# PROMPT_TOKENIZER_ENCODING when tiktoken is installed, otherwise ~4 characters per token.
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "1500"))
+PROMPT_TOKENIZER_ENCODING = os.getenv("PROMPT_TOKENIZER_ENCODING", "o200k_base")
+
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch")
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))
+ONNX_CACHE_DIR = os.getenv("ONNX_CACHE_DIR", str(ROOT / "index" / "onnx"))
+
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+EMBED_NUM_WORKERS = int(os.getenv("EMBED_NUM_WORKERS", "1"))
+
 INDEX_DB_RETRIEVAL_COUNT = int(os.getenv("INDEX_DB_RETRIEVAL_COUNT", "20"))
 APPLY_STD = os.getenv("APPLY_STD", "true").lower() in ("1", "true", "yes", "on")
 STD_COEF = float(os.getenv("STD_COEF", "0.5"))
+INDEX_TYPE = os.getenv("INDEX_TYPE", "flat")
+INDEX_NLIST = int(os.getenv("INDEX_NLIST", "256"))
+INDEX_NPROBE = int(os.getenv("INDEX_NPROBE", "16"))
+INDEX_HNSW_M = int(os.getenv("INDEX_HNSW_M", "32"))
+INDEX_EF_CONSTRUCTION = int(os.getenv("INDEX_EF_CONSTRUCTION", "200"))
+INDEX_EF_SEARCH = int(os.getenv("INDEX_EF_SEARCH", "64"))
+INDEX_PQ_M = int(os.getenv("INDEX_PQ_M", "48"))
+INDEX_PQ_NBITS = int(os.getenv("INDEX_PQ_NBITS", "8"))
+INDEX_PCA_DIM = int(os.getenv("INDEX_PCA_DIM", "0"))
+INDEX_SCALAR_QUANT = os.getenv("INDEX_SCALAR_QUANT", "none")
+WAL_COMPACT_THRESHOLD = int(os.getenv("WAL_COMPACT_THRESHOLD", "1000"))
+INDEX_VERIFY_CHECKSUMS = os.getenv("INDEX_VERIFY_CHECKSUMS", "false").lower() in ("1", "true", "yes", "on")
+INDEX_MMAP = os.getenv("INDEX_MMAP", "true").lower() in ("1", "true", "yes", "on")
+# Keeps tool embeddings next to the index (<index>.embeddings.sqlite) so rebuilds only embed changed tools.
+CORPUS_CACHE_ENABLED = os.getenv("CORPUS_CACHE_ENABLED", "true").lower() in ("1", "true", "yes", "on")
+
+LEXICAL_ENABLED = os.getenv("LEXICAL_ENABLED", "true").lower() in ("1", "true", "yes", "on")
+# BM25 fusion scores the query in Python against the whole lexical index on every query that misses the
+# fast path; off by default. The exact api_name fast path is unaffected.
+LEXICAL_FUSION_ENABLED = os.getenv("LEXICAL_FUSION_ENABLED", "false").lower() in ("1", "true", "yes", "on")
+LEXICAL_FUSION_WEIGHT = float(os.getenv("LEXICAL_FUSION_WEIGHT", "0.3"))
+LEXICAL_EXACT_MAX_TOOLS = int(os.getenv("LEXICAL_EXACT_MAX_TOOLS", "3"))
+
+SHARD_DIR = os.getenv("SHARD_DIR", str(ROOT / "index" / "shards"))
+SHARD_ADDRESSES = [a.strip() for a in os.getenv("SHARD_ADDRESSES", "").split(",") if a.strip()]
+# Shard requests are pickled, so the key must be a secret shared by the coordinator and its shards; there is
+# no default and shard servers refuse to start without it.
+SHARD_AUTHKEY = os.getenv("SHARD_AUTHKEY", "").encode()
+
+WARMUP_QUERIES = [
+    q.strip()
+    for q in os.getenv("WARMUP_QUERIES", "Warm up: quick flight search from LA to NYC on June 15th.").split("|")
+    if q.strip()
+]
+
+# Threads AsyncToolSelectorClient uses for embedding + FAISS search, off the event loop.
+SEARCH_EXECUTOR_WORKERS = int(os.getenv("SEARCH_EXECUTOR_WORKERS", "4"))
+# Concurrent requests' segments are searched together: wait up to the window (0 disables) or N queries.
+SEARCH_BATCH_WINDOW_MS = float(os.getenv("SEARCH_BATCH_WINDOW_MS", "2"))
+SEARCH_BATCH_MAX_QUERIES = int(os.getenv("SEARCH_BATCH_MAX_QUERIES", "64"))
+MAX_FUSED_CANDIDATES = int(os.getenv("MAX_FUSED_CANDIDATES", "20"))
 RESPONSE_RETRIEVAL_COUNT = int(os.getenv("RESPONSE_RETRIEVAL_COUNT", "5"))
 RERANK_RETRIEVAL_COUNT = int(os.getenv("RERANK_RETRIEVAL_COUNT", "5"))
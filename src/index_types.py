@@ -0,0 +1,157 @@
+import faiss
+
+from src.environment import (
+    INDEX_TYPE,
+    INDEX_NLIST,
+    INDEX_NPROBE,
+    INDEX_HNSW_M,
+    INDEX_EF_CONSTRUCTION,
+    INDEX_EF_SEARCH,
+    INDEX_PQ_M,
+    INDEX_PQ_NBITS,
+    INDEX_PCA_DIM,
+    INDEX_SCALAR_QUANT,
+)
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+SEARCH_PARAM_KEYS = ("nprobe", "efSearch")
+SCALAR_QUANT_TYPES = {"sq8": "QT_8bit", "fp16": "QT_fp16"}
+
+
+def default_index_params():
+    return {
+        "nlist": INDEX_NLIST,
+        "nprobe": INDEX_NPROBE,
+        "M": INDEX_HNSW_M,
+        "efConstruction": INDEX_EF_CONSTRUCTION,
+        "efSearch": INDEX_EF_SEARCH,
+        "pq_m": INDEX_PQ_M,
+        "pq_nbits": INDEX_PQ_NBITS,
+        "pca_dim": INDEX_PCA_DIM,
+        "scalar_quant": INDEX_SCALAR_QUANT,
+    }
+
+
+def resolve_index_config(index_type=None, params=None):
+    index_type = (index_type or INDEX_TYPE).lower()
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}'; expected one of {', '.join(INDEX_TYPES)}")
+    merged = default_index_params()
+    merged.update(params or {})
+    merged["scalar_quant"] = (merged["scalar_quant"] or "none").lower()
+    if merged["scalar_quant"] != "none" and merged["scalar_quant"] not in SCALAR_QUANT_TYPES:
+        raise ValueError(f"Unknown scalar_quant '{merged['scalar_quant']}'; expected none, sq8 or fp16")
+    if merged["scalar_quant"] != "none" and index_type == "ivf_pq":
+        raise ValueError("ivf_pq already quantizes vectors; use scalar_quant=none")
+    return index_type, merged
+
+
+def is_lossy(params):
+    return bool(params.get("pca_dim")) or params.get("scalar_quant", "none") != "none"
+
+
+def create_index(index_type, dim, params, n_train=None):
+    pca_dim = params.get("pca_dim") or 0
+    if not pca_dim:
+        return _create_base_index(index_type, dim, params, n_train)
+    if pca_dim >= dim:
+        raise ValueError(f"pca_dim={pca_dim} must be smaller than the vector dimension {dim}")
+
+    # PCA, then re-normalize so inner product stays a cosine in the reduced space. IndexPreTransform
+    # applies the same chain to every vector added and every query searched.
+    index = faiss.IndexPreTransform(
+        faiss.NormalizationTransform(pca_dim, 2.0),
+        _create_base_index(index_type, pca_dim, params, n_train),
+    )
+    index.prepend_transform(faiss.PCAMatrix(dim, pca_dim))
+    return index
+
+
+def _create_base_index(index_type, dim, params, n_train=None):
+    qtype_name = SCALAR_QUANT_TYPES.get(params.get("scalar_quant", "none"))
+    qtype = getattr(faiss.ScalarQuantizer, qtype_name) if qtype_name else None
+
+    if index_type == "flat":
+        if qtype is not None:
+            return faiss.IndexScalarQuantizer(dim, qtype, faiss.METRIC_INNER_PRODUCT)
+        return faiss.IndexFlatIP(dim)
+
+    if index_type == "hnsw":
+        if qtype is not None:
+            index = faiss.IndexHNSWSQ(dim, qtype, params["M"], faiss.METRIC_INNER_PRODUCT)
+        else:
+            index = faiss.IndexHNSWFlat(dim, params["M"], faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = params["efConstruction"]
+        return index
+
+    # IVF training needs at least one point per list (and per PQ centroid); shrink for small catalogs.
+    nlist = params["nlist"] if n_train is None else max(1, min(params["nlist"], n_train))
+    quantizer = faiss.IndexFlatIP(dim)
+
+    if index_type == "ivf_flat":
+        if qtype is not None:
+            return faiss.IndexIVFScalarQuantizer(quantizer, dim, nlist, qtype, faiss.METRIC_INNER_PRODUCT)
+        return faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+
+    pq_m = params["pq_m"]
+    if dim % pq_m:
+        raise ValueError(f"pq_m={pq_m} must divide the vector dimension {dim}")
+    nbits = params["pq_nbits"]
+    if n_train is not None:
+        while nbits > 1 and 2 ** nbits > n_train:
+            nbits -= 1
+    return faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, nbits, faiss.METRIC_INNER_PRODUCT)
+
+
+def unwrap_index(index):
+    index = faiss.downcast_index(index)
+    while isinstance(index, (faiss.IndexIDMap, faiss.IndexPreTransform)):
+        index = faiss.downcast_index(index.index)
+    return index
+
+
+def apply_search_params(index, index_type, params):
+    if index_type in ("ivf_flat", "ivf_pq"):
+        faiss.extract_index_ivf(index).nprobe = params["nprobe"]
+    elif index_type == "hnsw":
+        unwrap_index(index).hnsw.efSearch = params["efSearch"]
+
+
+def effective_index_params(index, index_type, params):
+    # create_index may shrink nlist / pq_nbits for small catalogs; record what was actually built.
+    effective = dict(params)
+    if index_type in ("ivf_flat", "ivf_pq"):
+        ivf = faiss.extract_index_ivf(index)
+        effective["nlist"] = ivf.nlist
+        if index_type == "ivf_pq":
+            effective["pq_nbits"] = faiss.downcast_index(ivf).pq.nbits
+    return effective
+
+
+def index_nbytes(index):
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def _drop_pca_training_state(index):
+    # PCAMatrix keeps the full d_in x d_in covariance eigenbasis for retraining; applying it only needs A and b.
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexPreTransform):
+        for i in range(index.chain.size()):
+            transform = faiss.downcast_VectorTransform(index.chain.at(i))
+            if isinstance(transform, faiss.PCAMatrix):
+                transform.PCAMat.clear()
+                transform.eigenvalues.clear()
+
+
+def build_populated_index(index_type, vectors, params, ids=None):
+    index = create_index(index_type, vectors.shape[1], params, n_train=len(vectors))
+    if not index.is_trained:
+        index.train(vectors)
+        _drop_pca_training_state(index)
+    if ids is None:
+        index.add(vectors)
+    else:
+        index = faiss.IndexIDMap2(index)
+        index.add_with_ids(vectors, ids)
+    apply_search_params(index, index_type, params)
+    return index
@@ -1,43 +1,270 @@
+import argparse
+import base64
+import hashlib
 import json
+import os
+import time
 from pathlib import Path
 import numpy as np
 import faiss
 from tqdm import tqdm
 
 from src.embedder import Embedder
-from src.environment import INDEX_PATH, METADATA_PATH, INDEX_DB_RETRIEVAL_COUNT, APPLY_STD, STD_COEF
-from src.utils import load_functions, generate_function_as_text, normalize
+from src.embedding_cache import CorpusEmbeddingCache, EmbeddingCache
+from src.environment import (
+    INDEX_PATH,
+    METADATA_PATH,
+    INDEX_DB_RETRIEVAL_COUNT,
+    APPLY_STD,
+    CORPUS_CACHE_ENABLED,
+    STD_COEF,
+    EMBED_BATCH_SIZE,
+    EMBED_NUM_WORKERS,
+    INDEX_MMAP,
+    WAL_COMPACT_THRESHOLD,
+    INDEX_VERIFY_CHECKSUMS,
+    LEXICAL_ENABLED,
+    LEXICAL_EXACT_MAX_TOOLS,
+    LEXICAL_FUSION_ENABLED,
+    LEXICAL_FUSION_WEIGHT,
+)
+from src.index_types import (
+    SEARCH_PARAM_KEYS,
+    apply_search_params,
+    build_populated_index,
+    create_index,
+    effective_index_params,
+    is_lossy,
+    resolve_index_config,
+)
+from src.lexical_index import LexicalIndex, SearchPathStats, fuse_scores
+from src.metadata_store import MetadataStore, stored_row, write_metadata_store
+from src.prompting import with_prompt_fragment
+from src.results import SearchHit
+from src.rwlock import ReadWriteLock
+from src.utils import load_functions, generate_function_as_text, normalize, std_keep_mask, tool_int_id
+
+
+# Manifests without a format_version predate snapshots and are read as version 1.
+SNAPSHOT_FORMAT_VERSION = 2
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def dataset_hash(ids):
+    # tool ids are content hashes, so the sorted id set identifies the catalog the index was built from.
+    return hashlib.sha256(np.sort(np.asarray(ids, dtype="<i8")).tobytes()).hexdigest()
+
+
+def embedder_fingerprint(embedder):
+    backend = getattr(embedder, "backend", None)
+    if backend is None:
+        return None
+    return {"model": embedder.model_name.split("#")[0], "backend": backend}
+
+
+def check_embedder_compatible(built_with, embedder):
+    # Corpus vectors from one model/backend are not comparable with query vectors from another.
+    current = embedder_fingerprint(embedder)
+    if built_with and current and built_with != current:
+        raise ValueError(
+            f"Index was built with {built_with['model']} ({built_with['backend']}) but queries would use "
+            f"{current['model']} ({current['backend']}); set EMBED_BACKEND / the model to match or rebuild the index."
+        )
+
+
+def tool_record(tool_id, text, api):
+    # The metadata row of one tool, the same whether it was built, added or upserted. Rows carry no
+    # positional id: the FAISS index is keyed by tool_int_id(tool_id).
+    return with_prompt_fragment({"tool_id": tool_id, "text": text, **api})
 
 
 class Indexer:
-    def __init__(self, index_path, metadata_path, dim=None):
+    def __init__(self, index_path, metadata_path, dim=None, index_type=None, index_params=None, embedder=None):
         self.index_path = Path(index_path)
         self.metadata_path = Path(metadata_path)
-        self.embedder = Embedder()
+        self.manifest_path = self.index_path.with_suffix(".manifest.json")
+        self.wal_path = self.index_path.with_suffix(".wal")
+        self.lexical_path = self.index_path.with_suffix(".lexical.json")
+        self.embedder = embedder or Embedder()
+        self.query_cache = EmbeddingCache()
+        self.corpus_cache = CorpusEmbeddingCache(
+            self.index_path.with_suffix(".embeddings.sqlite") if CORPUS_CACHE_ENABLED else None
+        )
+        self.lexical = None
+        self.search_stats = SearchPathStats()
+        self.built_with = None
 
         self.vectors = []
         self.metadata = []
         self.dim = dim
 
+        self.index_type, self.index_params = resolve_index_config(index_type, index_params)
         self.index = None
-
-    def _init_index(self, dim):
+        self._index_writable = True
+        self._id_mapped = True
+        # Bumped whenever the searchable catalog changes, so caches of search results can tell they are stale.
+        self.version = 0
+        # Upserts, deletes and compaction swap the index, metadata and overlay that searches (on the search
+        # executor and batcher threads) read; searches share the lock, writers take it alone.
+        self._rw = ReadWriteLock()
+        self._reset_incremental_state(np.zeros(0, dtype=np.int64))
+
+    def _init_index(self, dim, n_train=None):
         self.dim = dim
-        self.index = faiss.IndexFlatIP(dim)
-
-    def add(self, tool_id, text, api_info, idx):
-        vec = self.embedder.embed(text).astype("float32")
+        self.index = faiss.IndexIDMap2(create_index(self.index_type, dim, self.index_params, n_train=n_train))
+
+    def _reset_incremental_state(self, base_ids, id_order=None):
+        # self.metadata holds the base rows (as of the last build/compaction); changes since then
+        # live in the overlay/deleted sets and the write-ahead log until compact() folds them in.
+        self._base_ids = base_ids
+        self._id_order = np.argsort(base_ids, kind="stable") if id_order is None else id_order
+        self._sorted_ids = base_ids[self._id_order]
+        self._overlay = {}
+        self._deleted = set()
+        self._tombstones = set()
+        self._wal_entries = 0
+        self.version += 1
+
+    def _save_metadata(self, records, ids):
+        # A .json path keeps the legacy (human-readable) format; anything else gets the mmap-able store.
+        if self.metadata_path.suffix == ".json":
+            with open(self.metadata_path, "w") as f:
+                json.dump(records, f, indent=4)
+        else:
+            write_metadata_store(self.metadata_path, records, ids)
+
+    def _convert_legacy_metadata(self):
+        # Indexes built before the binary store have metadata.json next to them; convert it once.
+        legacy_path = self.metadata_path.with_suffix(".json")
+        if not legacy_path.exists():
+            raise FileNotFoundError(
+                f"Index metadata not found at {self.metadata_path} (nor a legacy {legacy_path.name}); "
+                "rebuild the index with `python -m src.indexer`."
+            )
+        with open(legacy_path, "r") as f:
+            records = json.load(f)
+        write_metadata_store(self.metadata_path, records, [tool_int_id(r["tool_id"]) for r in records])
+        print(f"Converted legacy metadata {legacy_path} → {self.metadata_path}")
+
+    def _load_metadata(self):
+        if self.metadata_path.suffix == ".json":
+            with open(self.metadata_path, "r") as f:
+                records = json.load(f)
+            return records, np.array([tool_int_id(r["tool_id"]) for r in records], dtype=np.int64), None
+        if not self.metadata_path.exists():
+            self._convert_legacy_metadata()
+        store = MetadataStore(self.metadata_path)
+        # Copies: the incremental state must outlive the mapping, which compaction closes.
+        id_order = None if store.id_order is None else np.array(store.id_order)
+        return store, np.array(store.ids), id_order
+
+    def _snapshot_files(self):
+        return {"index": self.index_path, "metadata": self.metadata_path, "lexical": self.lexical_path}
+
+    def _save_lexical(self, ids, records):
+        self.lexical = LexicalIndex.from_records(ids, records)
+        self.lexical.save(self.lexical_path)
+
+    def _load_lexical(self):
+        # Indexes built before the lexical index simply search dense-only.
+        self.lexical = LexicalIndex.load(self.lexical_path) if self.lexical_path.exists() else None
+
+    def _write_index(self):
+        tmp_path = f"{self.index_path}.tmp"
+        faiss.write_index(self.index, tmp_path)
+        os.replace(tmp_path, self.index_path)
+
+    def _read_index(self, mmap=INDEX_MMAP):
+        mmap_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", None) or getattr(faiss, "IO_FLAG_MMAP", None)
+        self._index_writable = not (mmap and mmap_flag is not None)
+        if not self._index_writable:
+            return faiss.read_index(str(self.index_path), mmap_flag | faiss.IO_FLAG_READ_ONLY)
+        return faiss.read_index(str(self.index_path))
+
+    def _write_manifest(self, ids):
+        manifest = {
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "index_type": self.index_type,
+            "index_params": self.index_params,
+            "dim": self.dim,
+            "count": len(ids),
+            "id_mapped": True,
+            "normalized": True,
+            "metric": "inner_product",
+            "embedder": self.built_with,
+            "dataset_hash": dataset_hash(ids),
+            "files": {
+                name: {"name": path.name, "bytes": path.stat().st_size, "sha256": file_sha256(path)}
+                for name, path in self._snapshot_files().items()
+            },
+        }
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=4)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _read_manifest(self):
+        if not self.manifest_path.exists():
+            return {"index_type": "flat", "index_params": {}}
+        with open(self.manifest_path, "r") as f:
+            return json.load(f)
+
+    def _validate_snapshot(self, manifest, verify_checksums=INDEX_VERIFY_CHECKSUMS):
+        version = manifest.get("format_version", 1)
+        if version > SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(
+                f"Index snapshot format {version} is newer than this code supports ({SNAPSHOT_FORMAT_VERSION})."
+            )
+        check_embedder_compatible(manifest.get("embedder"), self.embedder)
+        # Sizes are always compared (one stat per file); hashing the files is opt-in.
+        paths = self._snapshot_files()
+        for name, expected in manifest.get("files", {}).items():
+            path = paths[name]
+            if not path.exists():
+                raise ValueError(
+                    f"Index snapshot is missing its {name} file: {path}; rebuild the index with `python -m src.indexer`."
+                )
+            if path.stat().st_size != expected["bytes"]:
+                raise ValueError(f"Index snapshot {name} file {path} does not match the manifest (size differs).")
+            if verify_checksums and file_sha256(path) != expected["sha256"]:
+                raise ValueError(f"Index snapshot {name} file {path} does not match the manifest (checksum differs).")
+
+    def _embed_corpus(self, texts, batch_size=EMBED_BATCH_SIZE, num_workers=EMBED_NUM_WORKERS):
+        # Content-addressed on (model, exact text): only tools whose text changed since a previous build are encoded.
+        return self.corpus_cache.get_many(
+            texts,
+            getattr(self.embedder, "model_name", ""),
+            lambda pending: self.embedder.embed_batch(pending, batch_size=batch_size, num_workers=num_workers),
+        ).astype("float32")
+
+    def add(self, tool_id, text, api_info):
+        # One text at a time: a multi-process encode pool would be started and torn down per tool.
+        vec = self._embed_corpus([text], batch_size=1, num_workers=1)[0]
 
         if self.index is None:
             self._init_index(vec.shape[0])
 
         self.vectors.append(vec)
-        self.metadata.append({
-            "id": idx,
-            "tool_id": tool_id,
-            "text": text,
-            **api_info,
-        })
+        self.metadata.append(tool_record(tool_id, text, api_info))
+
+    def add_batch(self, apis, batch_size=EMBED_BATCH_SIZE, num_workers=EMBED_NUM_WORKERS):
+        tool_ids = list(apis)
+        texts = [generate_function_as_text(apis[tool_id]) for tool_id in tool_ids]
+        vecs = self._embed_corpus(texts, batch_size=batch_size, num_workers=num_workers) if texts else []
+
+        if self.index is None and len(vecs):
+            self._init_index(vecs.shape[1])
+
+        for tool_id, text, vec in zip(tool_ids, texts, vecs):
+            self.vectors.append(vec)
+            self.metadata.append(tool_record(tool_id, text, apis[tool_id]))
 
     def build_index(self):
         if not self.vectors:
@@ -47,9 +274,12 @@ class Indexer:
                     self._init_index(dummy_vec.shape[0])
                 else:
                     self._init_index(self.dim)
-            faiss.write_index(self.index, str(self.index_path))
-            with open(self.metadata_path, "w") as f:
-                json.dump(self.metadata, f, indent=4)
+            self.built_with = embedder_fingerprint(self.embedder)
+            self._write_index()
+            self._save_metadata(self.metadata, [])
+            self._save_lexical([], [])
+            self._write_manifest([])
+            self._reset_wal()
             print(f"\nNo vectors to index; saved empty index → {self.index_path}")
             print(f"Metadata saved → {self.metadata_path}\n")
             return
@@ -57,66 +287,433 @@ class Indexer:
         vectors = np.stack(self.vectors).astype("float32")
         vectors = normalize(vectors)
 
-        self.index.add(vectors)
+        ids = np.array([tool_int_id(meta["tool_id"]) for meta in self.metadata], dtype=np.int64)
 
-        faiss.write_index(self.index, str(self.index_path))
+        self.dim = vectors.shape[1]
+        self.built_with = embedder_fingerprint(self.embedder)
+        self.index = build_populated_index(self.index_type, vectors, self.index_params, ids=ids)
+        self.index_params = effective_index_params(self.index, self.index_type, self.index_params)
 
-        with open(self.metadata_path, "w") as f:
-            json.dump(self.metadata, f, indent=4)
+        self._write_index()
+        self._save_metadata(self.metadata, ids)
+        self._save_lexical(ids, self.metadata)
+        self._write_manifest(ids)
+        self._reset_wal()
+        self._reset_incremental_state(ids)
 
-        print(f"\nFAISS cosine index saved → {self.index_path}")
+        print(f"\nFAISS cosine index ({self.index_type}) saved → {self.index_path}")
         print(f"Metadata saved → {self.metadata_path}\n")
 
-    def build(self, apis):
-        print(f"Embedding API functions (n={len(apis)})...")
-
-        for idx, tool_id in enumerate(tqdm(apis)):
-            api = apis[tool_id]
-            txt = generate_function_as_text(api)
-            self.add(tool_id, txt, api, idx)
+    def build(self, apis, batch_size=EMBED_BATCH_SIZE, num_workers=EMBED_NUM_WORKERS):
+        print(f"Embedding API functions (n={len(apis)}, batch_size={batch_size}, workers={num_workers})...")
+
+        # Load the lazily loaded model first so the tools/s figure measures embedding only.
+        start = time.perf_counter()
+        getattr(self.embedder, "model", None)
+        load_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if batch_size > 1:
+            self.add_batch(apis, batch_size=batch_size, num_workers=num_workers)
+        else:
+            for tool_id in tqdm(apis):
+                api = apis[tool_id]
+                txt = generate_function_as_text(api)
+                self.add(tool_id, txt, api)
+        elapsed = time.perf_counter() - start
+        rate = len(apis) / elapsed if elapsed > 0 else 0.0
+        cache = self.corpus_cache.stats()
+        print(f"Embedded {len(apis)} tools in {elapsed:.2f}s ({rate:.1f} tools/s; "
+              f"{cache['disk_hits']} from cache, {cache['misses']} encoded; model load {load_s:.2f}s)")
 
         print("Building FAISS index...")
         self.build_index()
 
     def load(self):
-        self.index = faiss.read_index(str(self.index_path))
-        with open(self.metadata_path, "r") as f:
-            self.metadata = json.load(f)
-
-        print("FAISS index + metadata loaded.")
+        with self._rw.write():
+            self._load()
+
+    def _load(self):
+        manifest = self._read_manifest()
+        # Build-time params come from the manifest; search-time params stay configurable per process.
+        search_params = {k: self.index_params[k] for k in SEARCH_PARAM_KEYS}
+        self.index_type = manifest["index_type"]
+        self.index_params = {**self.index_params, **manifest.get("index_params", {}), **search_params}
+
+        self.dim = manifest.get("dim", self.dim)
+        self.built_with = manifest.get("embedder")
+        self._validate_snapshot(manifest)
+
+        # Replaying the log mutates the index, so only map it read-only when there is nothing to replay.
+        has_wal = self.wal_path.exists() and self.wal_path.stat().st_size > 0
+        self.index = self._read_index(mmap=INDEX_MMAP and not has_wal)
+        apply_search_params(self.index, self.index_type, self.index_params)
+        self.metadata, base_ids, id_order = self._load_metadata()
+        self._id_mapped = manifest.get("id_mapped", False)
+        if not self._id_mapped:
+            # Indexes built before ID mapping address rows by position.
+            base_ids = np.arange(len(self.metadata), dtype=np.int64)
+        self._reset_incremental_state(base_ids, id_order if self._id_mapped else None)
+        self._load_lexical()
+        replayed = self._replay_wal()
+
+        print(f"FAISS index ({self.index_type}) + metadata loaded ({replayed} logged changes replayed).")
+
+    @property
+    def size(self):
+        return len(self._base_ids) - len(self._deleted) + len(self._overlay)
+
+    def _base_row(self, fid):
+        pos = np.searchsorted(self._sorted_ids, fid)
+        if pos < len(self._sorted_ids) and self._sorted_ids[pos] == fid:
+            return int(self._id_order[pos])
+        return None
+
+    def _contains(self, fid):
+        if fid in self._overlay:
+            return True
+        return fid not in self._deleted and self._base_row(fid) is not None
+
+    def record(self, fid):
+        with self._rw.read():
+            record = self._overlay.get(fid)
+            if record is not None:
+                return record
+            return self.metadata[self._base_row(fid)]
+
+    def _ensure_writable(self):
+        if self.index is None:
+            raise RuntimeError("Index not loaded. Call load() first.")
+        if not self._id_mapped:
+            raise RuntimeError("Index predates incremental updates; rebuild it with `python -m src.indexer`.")
+        if not self._index_writable:
+            self.index = self._read_index(mmap=False)
+            apply_search_params(self.index, self.index_type, self.index_params)
+
+    def _reset_wal(self):
+        self.wal_path.unlink(missing_ok=True)
+        self._wal_entries = 0
+
+    def _append_wal(self, entries):
+        with open(self.wal_path, "a") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._wal_entries += len(entries)
+
+    def _read_wal(self):
+        # Returns the complete entries. A torn final line from a crash mid-append is cut off the file
+        # here, before anything is appended after it and turns it into a corrupt line in the middle.
+        entries, intact = [], 0
+        with open(self.wal_path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                if line.strip():
+                    try:
+                        entries.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        break
+                intact += len(line)
+        if intact < self.wal_path.stat().st_size:
+            with open(self.wal_path, "r+b") as f:
+                f.truncate(intact)
+                f.flush()
+                os.fsync(f.fileno())
+        return entries
+
+    def _replay_wal(self):
+        if not self.wal_path.exists():
+            return 0
+        entries = self._read_wal()
+        for entry in entries:
+            if entry["op"] == "upsert":
+                if self._contains(tool_int_id(entry["record"]["tool_id"])):
+                    # compact() saves the index, metadata and manifest before removing the log; a crash in
+                    # between leaves upserts that are already in the snapshot. (The manifest check in load()
+                    # rejects a snapshot torn between its files.)
+                    continue
+                vec = np.frombuffer(base64.b64decode(entry["vector"]), dtype=np.float32)
+                self._apply_upsert([entry["record"]], vec[None, :])
+            elif entry["op"] == "restore":
+                self._apply_restore(entry["record"])
+            elif entry["op"] == "delete":
+                self._apply_delete(entry["tool_ids"])
+        self._wal_entries = len(entries)
+        return len(entries)
+
+    def _apply_upsert(self, records, vectors):
+        fids = np.array([tool_int_id(r["tool_id"]) for r in records], dtype=np.int64)
+        if not self.index.is_trained:
+            # Built from an empty catalog: size the IVF lists for the vectors it is trained on, as build does.
+            self._init_index(self.dim, n_train=len(vectors))
+            self.index.train(vectors)
+            apply_search_params(self.index, self.index_type, self.index_params)
+            self.index_params = effective_index_params(self.index, self.index_type, self.index_params)
+        self.index.add_with_ids(vectors, fids)
+        self.version += 1
+        for fid, record in zip(fids.tolist(), records):
+            self._deleted.discard(fid)
+            if self._base_row(fid) is None:
+                self._overlay[fid] = record
+            if self.lexical is not None:
+                self.lexical.add(fid, record)
+
+    def _apply_restore(self, record):
+        # The vector is still in the index under this id; un-hide it instead of adding a duplicate.
+        fid = tool_int_id(record["tool_id"])
+        self.version += 1
+        self._tombstones.discard(fid)
+        self._deleted.discard(fid)
+        if self._base_row(fid) is None:
+            self._overlay[fid] = record
+        if self.lexical is not None:
+            self.lexical.add(fid, record)
+
+    def _apply_delete(self, tool_ids):
+        fids = [tool_int_id(t) for t in tool_ids]
+        fids = [fid for fid in fids if self._contains(fid)]
+        if not fids:
+            return 0
+        self.version += 1
+        try:
+            self.index.remove_ids(np.array(fids, dtype=np.int64))
+        except RuntimeError:
+            # e.g. HNSW cannot remove vectors; hide them at search time until compaction rebuilds.
+            self._tombstones.update(fids)
+        for fid in fids:
+            self._overlay.pop(fid, None)
+            if self._base_row(fid) is not None:
+                self._deleted.add(fid)
+        return len(fids)
+
+    def upsert(self, tools):
+        with self._rw.read():
+            # tool_id is a content hash: same id means same content.
+            pending = [tool_id for tool_id in tools if not self._contains(tool_int_id(tool_id))]
+        # Embedding is the slow part, so it runs before the write lock and searches carry on meanwhile.
+        texts = {tool_id: generate_function_as_text(tools[tool_id]) for tool_id in pending}
+        vectors = dict(zip(pending, normalize(self._embed_corpus(list(texts.values()))))) if pending else {}
+
+        with self._rw.write():
+            return self._upsert(tools, pending, texts, vectors)
+
+    def _upsert(self, tools, pending, texts, vectors):
+        self._ensure_writable()
+
+        fresh, restored = [], []
+        for tool_id in pending:
+            fid = tool_int_id(tool_id)
+            if self._contains(fid):
+                continue  # upserted by another writer since the check above
+            (restored if fid in self._tombstones else fresh).append(tool_id)
+
+        entries = []
+        if fresh:
+            vecs = np.stack([vectors[tool_id] for tool_id in fresh])
+            records = [stored_row(tool_record(tool_id, texts[tool_id], tools[tool_id])) for tool_id in fresh]
+            self._apply_upsert(records, vecs)
+            entries.extend(
+                {"op": "upsert", "tool_id": r["tool_id"], "record": r,
+                 "vector": base64.b64encode(vec.tobytes()).decode("ascii")}
+                for r, vec in zip(records, vecs)
+            )
+
+        for tool_id in restored:
+            record = stored_row(tool_record(tool_id, texts[tool_id], tools[tool_id]))
+            self._apply_restore(record)
+            entries.append({"op": "restore", "tool_id": tool_id, "record": record})
+
+        if entries:
+            self._append_wal(entries)
+            self._maybe_compact()
+        return len(entries)
+
+    def delete(self, tool_ids):
+        with self._rw.write():
+            self._ensure_writable()
+            tool_ids = list(tool_ids)
+            removed = self._apply_delete(tool_ids)
+            if removed:
+                self._append_wal([{"op": "delete", "tool_ids": tool_ids}])
+                self._maybe_compact()
+            return removed
+
+    def sync(self, apis):
+        # Bring the loaded index in line with a full catalog (e.g. load_functions()) without re-embedding it.
+        wanted = {tool_int_id(tool_id): tool_id for tool_id in apis}
+        with self._rw.read():
+            live = [int(fid) for fid in self._base_ids if int(fid) not in self._deleted] + list(self._overlay)
+            stale = [self.record(fid)["tool_id"] for fid in live if fid not in wanted]
+        live = set(live)
+        added = self.upsert({tool_id: apis[tool_id] for fid, tool_id in wanted.items() if fid not in live})
+        removed = self.delete(stale) if stale else 0
+        return added, removed
+
+    def _maybe_compact(self):
+        if WAL_COMPACT_THRESHOLD and self._wal_entries >= WAL_COMPACT_THRESHOLD:
+            self.compact()
+
+    def _live_vectors(self, live_ids, records):
+        if is_lossy(self.index_params):
+            # Reconstructing through PCA / scalar quantization is lossy; re-embed instead of retraining on it.
+            texts = [generate_function_as_text(record) for record in records]
+            return normalize(self._embed_corpus(texts))
+        return np.stack([self.index.reconstruct(fid) for fid in live_ids])
+
+    def compact(self):
+        with self._rw.write():
+            self._compact()
+
+    def _compact(self):
+        self._ensure_writable()
+
+        live_ids = [int(fid) for fid in self._base_ids if int(fid) not in self._deleted] + list(self._overlay)
+        records = [self.record(fid) for fid in live_ids]
+        ids = np.array(live_ids, dtype=np.int64)
+
+        if self._tombstones:
+            vectors = self._live_vectors(live_ids, records) if live_ids else None
+            if vectors is not None:
+                self.index = build_populated_index(self.index_type, vectors, self.index_params, ids=ids)
+                self.index_params = effective_index_params(self.index, self.index_type, self.index_params)
+            else:
+                self._init_index(self.dim)
+                apply_search_params(self.index, self.index_type, self.index_params)
+
+        self._write_index()
+        self._save_metadata(records, ids)
+        self._save_lexical(ids, records)
+        self._write_manifest(ids)
+        self._reset_wal()
+
+        if isinstance(self.metadata, MetadataStore):
+            self.metadata.close()
+        self.metadata, base_ids, id_order = self._load_metadata()
+        self._reset_incremental_state(base_ids, id_order)
+        print(f"Compacted index → {len(records)} tools")
 
     def search(self, query):
         if self.index is None:
             raise RuntimeError("Index not loaded. Call load() first.")
+        with self._rw.read():
+            return self._search_queries([query])[0]
 
-        qvec = self.embedder.embed(query).astype("float32")
-        qvec = normalize(qvec[None, :])
-
-        scores, ids = self.index.search(qvec, INDEX_DB_RETRIEVAL_COUNT)
+    def embed_queries(self, queries):
+        qvecs = normalize(self.query_cache.embed(self.embedder, queries).astype("float32"))
+        if self.dim is not None and qvecs.shape[1] != self.dim:
+            raise ValueError(f"Query vectors have dim {qvecs.shape[1]} but the index was built with dim {self.dim}.")
+        return qvecs
 
-        scores = scores[0]
-        ids = ids[0]
+    def search_many(self, queries):
+        if self.index is None:
+            raise RuntimeError("Index not loaded. Call load() first.")
+        queries = list(queries)
+        if not queries:
+            return []
+        with self._rw.read():
+            return self._search_queries(queries)
+
+    def _search_queries(self, queries):
+        if self.lexical is None or not LEXICAL_ENABLED:
+            start = time.perf_counter()
+            results = self._search_vectors(self.embed_queries(queries))
+            self.search_stats.record("dense", len(queries), (time.perf_counter() - start) * 1000)
+            return results
+
+        results = [None] * len(queries)
+        pending = []
+        for row, query in enumerate(queries):
+            # A query naming a qualified api_name is answered from the lexical index without embedding it.
+            start = time.perf_counter()
+            exact = [fid for fid in self.lexical.exact_matches(query, LEXICAL_EXACT_MAX_TOOLS) if self._contains(fid)]
+            if exact:
+                results[row] = [SearchHit(1.0, fid, self) for fid in exact[:INDEX_DB_RETRIEVAL_COUNT]]
+                self.search_stats.record("fast_path", 1, (time.perf_counter() - start) * 1000)
+            else:
+                pending.append(row)
+        if not pending:
+            return results
+
+        start = time.perf_counter()
+        if not LEXICAL_FUSION_ENABLED:
+            dense = self._search_vectors(self.embed_queries([queries[row] for row in pending]))
+            for row, hits in zip(pending, dense):
+                results[row] = hits
+            self.search_stats.record("dense", len(pending), (time.perf_counter() - start) * 1000)
+            return results
+
+        k = INDEX_DB_RETRIEVAL_COUNT
+        dense = self._search_vectors(self.embed_queries([queries[row] for row in pending]), k=k, apply_std=False)
+        # The embed and FAISS calls are shared by the batch; attribute their time per query.
+        dense_ms = (time.perf_counter() - start) * 1000 / len(pending)
+        fused_rows, lexical_ms, unfused_ms = 0, 0.0, 0.0
+        for row, hits in zip(pending, dense):
+            lexical_start = time.perf_counter()
+            lexical = [(fid, score) for fid, score in self.lexical.search(queries[row], k) if self._contains(fid)]
+            # A bare-word api_name in the query ("subtract") counts as a top lexical match, not the answer.
+            named = [fid for fid in self.lexical.exact_matches(queries[row], LEXICAL_EXACT_MAX_TOOLS, qualified=False)
+                     if self._contains(fid)]
+            if named:
+                lexical = [(fid, 1.0) for fid in named] + [(fid, s) for fid, s in lexical if fid not in named]
+            ranked = fuse_scores(((hit.fid, hit.score) for hit in hits), lexical, LEXICAL_FUSION_WEIGHT)[:k]
+            results[row] = self._ranked_hits(ranked)
+            elapsed_ms = (time.perf_counter() - lexical_start) * 1000
+            if lexical:
+                fused_rows += 1
+                lexical_ms += elapsed_ms
+            else:
+                unfused_ms += elapsed_ms
+        self.search_stats.record("fused", fused_rows, dense_ms * fused_rows + lexical_ms, lexical_ms=lexical_ms)
+        dense_rows = len(pending) - fused_rows
+        self.search_stats.record("dense", dense_rows, dense_ms * dense_rows + unfused_ms)
+        return results
 
+    def _ranked_hits(self, ranked):
+        if not ranked:
+            return []
         if APPLY_STD:
-            mean = scores.mean()
-            std = scores.std()
-            threshold = mean - STD_COEF * std
-            mask = scores >= threshold
-            scores = scores[mask]
-            ids = ids[mask]
+            scores = np.array([[score for _, score in ranked]], dtype=np.float32)
+            keep = std_keep_mask(scores, np.ones_like(scores, dtype=bool), STD_COEF)[0]
+            ranked = [pair for pair, kept in zip(ranked, keep) if kept]
+        return [SearchHit(float(score), fid, self) for fid, score in ranked]
 
-        results = []
-        for score, idx in zip(scores, ids):
-            meta = self.metadata[idx]
-            results.append({
-                "score": float(score),
-                **meta
-            })
+    def search_vectors(self, qvecs, k=None, apply_std=None):
+        if self.index is None:
+            raise RuntimeError("Index not loaded. Call load() first.")
+        with self._rw.read():
+            return self._search_vectors(qvecs, k, apply_std)
 
-        return results
+    def _search_vectors(self, qvecs, k=None, apply_std=None):
+        k = INDEX_DB_RETRIEVAL_COUNT if k is None else k
+        apply_std = APPLY_STD if apply_std is None else apply_std
 
+        scores, ids = self.index.search(qvecs, k + len(self._tombstones))
+
+        # Approximate indexes pad with id -1 when fewer than k neighbours are reachable.
+        keep = ids >= 0
+        if self._tombstones:
+            keep &= ~np.isin(ids, list(self._tombstones))
+        keep &= np.cumsum(keep, axis=1) <= k
+
+        if apply_std:
+            keep = std_keep_mask(scores, keep, STD_COEF)
+
+        results = []
+        for row_scores, row_ids, row_keep in zip(scores, ids, keep):
+            results.append([
+                SearchHit(float(score), int(fid), self)
+                for score, fid in zip(row_scores[row_keep].tolist(), row_ids[row_keep].tolist())
+            ])
+        return results
 
 def main():
+    parser = argparse.ArgumentParser(description="Build or update the FAISS tool index.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="apply only added/removed tools to an existing index, then compact")
+    args = parser.parse_args()
+
     apis = load_functions()
 
     Path(INDEX_PATH).parent.mkdir(parents=True, exist_ok=True)
@@ -125,6 +722,13 @@ def main():
         index_path=INDEX_PATH,
         metadata_path=METADATA_PATH
     )
+    if args.incremental and Path(INDEX_PATH).exists():
+        indexer.load()
+        start = time.perf_counter()
+        added, removed = indexer.sync(apis)
+        indexer.compact()
+        print(f"Incremental update: +{added} / -{removed} tools in {time.perf_counter() - start:.2f}s")
+        return
     indexer.build(apis)
 
 
@@ -0,0 +1,189 @@
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+# Dotted / snake / path-like identifiers as they appear in queries ("torchvision.models.resnet50").
+IDENTIFIER_RE = re.compile(r"[A-Za-z0-9_][A-Za-z0-9_.\-/]*[A-Za-z0-9_]")
+# A dot, an underscore or a CamelCase boundary makes an identifier specific enough to name one api.
+QUALIFIED_RE = re.compile(r"[._]|[a-z][A-Z]")
+LEXICAL_FORMAT_VERSION = 1
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_DOC_FREQ = 0.5
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(str(text).lower())
+
+
+def normalize_api_name(api_name):
+    # "gcloud.alpha.bms.networks().update" and "...networks.update" name the same call.
+    return str(api_name).lower().replace("()", "").strip()
+
+
+def query_identifiers(query):
+    # Case is kept so CamelCase stays visible to is_qualified; lookups normalize each identifier.
+    return set(IDENTIFIER_RE.findall(str(query).replace("()", "")))
+
+
+def is_qualified(identifier):
+    # Bare words are not: several api_names ("subtract", "quantile", "writer") are plain English.
+    return bool(QUALIFIED_RE.search(identifier))
+
+
+def record_tokens(record):
+    return tokenize(record.get("name", "")) + tokenize(record.get("api_name", "")) + tokenize(
+        record.get("description", ""))
+
+
+class LexicalIndex:
+    # BM25 over name / api_name / description tokens plus an exact api_name lookup, keyed by FAISS id.
+    def __init__(self):
+        self.fids = []
+        self.doc_lens = []
+        self.postings = defaultdict(list)
+        self.exact = defaultdict(list)
+        self._total_len = 0
+        self._known = set()
+
+    @classmethod
+    def from_records(cls, fids, records):
+        index = cls()
+        for fid, record in zip(fids, records):
+            index.add(int(fid), record)
+        return index
+
+    def __len__(self):
+        return len(self.fids)
+
+    def add(self, fid, record):
+        if int(fid) in self._known:
+            return  # ids are content hashes; deleted tools are filtered by the caller, not removed here
+        self._known.add(int(fid))
+        row = len(self.fids)
+        tokens = record_tokens(record)
+        self.fids.append(int(fid))
+        self.doc_lens.append(len(tokens))
+        self._total_len += len(tokens)
+        for token, tf in Counter(tokens).items():
+            self.postings[token].append((row, tf))
+        api_name = normalize_api_name(record.get("api_name", ""))
+        if api_name:
+            self.exact[api_name].append(row)
+
+    def exact_matches(self, query, max_tools, qualified=True):
+        # qualified=True: api_names written as qualified identifiers, which may answer the query alone.
+        # qualified=False: bare-word api_names, only a hint to fuse with the ranked results.
+        # An api_name shared by many tools (e.g. "requests.get") does not identify a tool on its own.
+        rows = []
+        for ident in query_identifiers(query):
+            if is_qualified(ident) != qualified:
+                continue
+            matched = self.exact.get(normalize_api_name(ident))
+            if matched and len(matched) <= max_tools:
+                rows.extend(matched)
+        return [self.fids[row] for row in dict.fromkeys(rows)]
+
+    def search(self, query, k):
+        # Returns [(fid, score)] with scores scaled so the best match is 1.0.
+        if not self.fids:
+            return []
+        n_docs = len(self.fids)
+        avg_len = self._total_len / n_docs or 1.0
+        scores = defaultdict(float)
+        for token in set(tokenize(query)):
+            posting = self.postings.get(token)
+            # Tokens in most documents ("the", "api") carry almost no idf but cost a full posting scan.
+            if not posting or len(posting) > n_docs * MAX_DOC_FREQ:
+                continue
+            idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+            for row, tf in posting:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lens[row] / avg_len)
+                scores[row] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        if not scores:
+            return []
+        top = sorted(scores.items(), key=lambda item: -item[1])[:k]
+        best = top[0][1]
+        return [(self.fids[row], score / best) for row, score in top]
+
+    def save(self, path):
+        payload = {
+            "format_version": LEXICAL_FORMAT_VERSION,
+            "fids": self.fids,
+            "doc_lens": self.doc_lens,
+            "postings": {token: [x for pair in posting for x in pair] for token, posting in self.postings.items()},
+            "exact": self.exact,
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(payload, f, separators=(",", ":"), ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r") as f:
+            payload = json.load(f)
+        if payload.get("format_version") != LEXICAL_FORMAT_VERSION:
+            raise ValueError(f"Unsupported lexical index format in {path}")
+        index = cls()
+        index.fids = payload["fids"]
+        index.doc_lens = payload["doc_lens"]
+        index._total_len = sum(index.doc_lens)
+        index._known = set(index.fids)
+        for token, flat in payload["postings"].items():
+            index.postings[token] = list(zip(flat[0::2], flat[1::2]))
+        index.exact.update(payload["exact"])
+        return index
+
+
+def fuse_scores(dense, lexical, weight):
+    # dense / lexical: [(fid, score)]; a candidate missing from one side contributes 0 for it.
+    fused = defaultdict(float)
+    for fid, score in dense:
+        fused[fid] += score
+    for fid, score in lexical:
+        fused[fid] += weight * score
+    return sorted(fused.items(), key=lambda item: -item[1])
+
+
+class SearchPathStats:
+    # How often the lexical fast path answers a query, and the per-query latency of each path.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {"fast_path": 0, "fused": 0, "dense": 0}
+        self.total_ms = {"fast_path": 0.0, "fused": 0.0, "dense": 0.0}
+        self.lexical_ms = 0.0
+
+    def record(self, path, queries, elapsed_ms, lexical_ms=0.0):
+        # lexical_ms: the part of elapsed_ms spent on BM25 scoring and fusion, on top of the dense search.
+        if not queries:
+            return
+        with self._lock:
+            self.counts[path] += queries
+            self.total_ms[path] += elapsed_ms
+            self.lexical_ms += lexical_ms
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts)
+            mean_ms = {path: self.total_ms[path] / n if n else 0.0 for path, n in counts.items()}
+            embedded = counts["fused"] + counts["dense"]
+            embedded_ms = (self.total_ms["fused"] + self.total_ms["dense"]) / embedded if embedded else 0.0
+            fusion_ms = self.lexical_ms / counts["fused"] if counts["fused"] else 0.0
+        total = sum(counts.values())
+        # Versus running the same queries through embed + dense search at its observed mean latency.
+        saved_ms = max(embedded_ms - mean_ms["fast_path"], 0.0) * counts["fast_path"] if embedded else 0.0
+        return {
+            "queries": total,
+            **{f"{path}_queries": n for path, n in counts.items()},
+            "fast_path_rate": counts["fast_path"] / total if total else 0.0,
+            **{f"{path}_mean_ms": ms for path, ms in mean_ms.items()},
+            # Per fused query, what BM25 scoring and fusion added to the dense search.
+            "fusion_added_mean_ms": fusion_ms,
+            "estimated_saved_ms": saved_ms,
+        }
@@ -0,0 +1,158 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from src.environment import LLM_CACHE_PATH, LLM_CACHE_SIZE, LLM_CACHE_TTL_S
+
+
+class LLMCallCache:
+    # Response text of deterministic (temperature 0) LLM calls, keyed on model + prompt + temperature.
+    # In-memory LRU in front of an optional SQLite file, so repeats survive restarts and evaluation runs.
+    def __init__(self, max_size=LLM_CACHE_SIZE, path=LLM_CACHE_PATH, ttl_s=LLM_CACHE_TTL_S):
+        self.max_size = max_size
+        self.path = path or None
+        self.ttl_s = ttl_s
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.expirations = 0
+
+        self._db = None
+        if self.path:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_calls "
+                "(key TEXT PRIMARY KEY, model TEXT NOT NULL, response TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(model, prompt, temperature):
+        return hashlib.sha256(f"{model}\x1f{float(temperature)!r}\x1f{prompt}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def cacheable(temperature):
+        # Sampled calls are expected to vary between runs; replaying one answer would change behaviour.
+        return temperature is not None and float(temperature) == 0.0
+
+    def _expired(self, created_at):
+        return bool(self.ttl_s) and time.time() - created_at > self.ttl_s
+
+    def _remember(self, key, response, created_at):
+        if self.max_size <= 0:
+            return
+        self._entries[key] = (response, created_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def get(self, model, prompt, temperature):
+        if not self.cacheable(temperature):
+            with self._lock:
+                self.bypassed += 1
+            return None
+        key = self.make_key(model, prompt, temperature)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._expired(entry[1]):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+                self.expirations += 1
+            if self._db is not None:
+                row = self._db.execute("SELECT response, created_at FROM llm_calls WHERE key = ?", (key,)).fetchone()
+                if row is not None and not self._expired(row[1]):
+                    self._remember(key, row[0], row[1])
+                    self.disk_hits += 1
+                    return row[0]
+                if row is not None:
+                    self._db.execute("DELETE FROM llm_calls WHERE key = ?", (key,))
+                    self._db.commit()
+                    self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, model, prompt, temperature, response):
+        if not self.cacheable(temperature):
+            return
+        key = self.make_key(model, prompt, temperature)
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, response, created_at)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_calls (key, model, response, created_at) VALUES (?, ?, ?, ?)",
+                    (key, model, response, created_at),
+                )
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "expirations": self.expirations,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "persistent": self._db is not None,
+            }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+_SHARED = None
+_SHARED_LOCK = threading.Lock()
+
+
+def shared_llm_cache():
+    # One cache per process, shared by every LLM stage (and by repeated evaluation runs via the SQLite file).
+    global _SHARED
+    with _SHARED_LOCK:
+        if _SHARED is None:
+            _SHARED = LLMCallCache()
+        return _SHARED
+
+
+def _timeout_kwargs(timeout):
+    return {} if timeout is None else {"timeout": timeout}
+
+
+def complete(client, cache, model, prompt, temperature, parse, timeout=None):
+    # Only responses that parse are stored, so a malformed answer is retried instead of replayed.
+    cached = cache.get(model, prompt, temperature)
+    if cached is not None:
+        return parse(cached)
+    text = client.responses.create(model=model, input=prompt, temperature=temperature,
+                                   **_timeout_kwargs(timeout)).output_text
+    result = parse(text)
+    cache.put(model, prompt, temperature, text)
+    return result
+
+
+async def acomplete(client, cache, model, prompt, temperature, parse, timeout=None):
+    cached = cache.get(model, prompt, temperature)
+    if cached is not None:
+        return parse(cached)
+    resp = await client.responses.create(model=model, input=prompt, temperature=temperature,
+                                         **_timeout_kwargs(timeout))
+    result = parse(resp.output_text)
+    cache.put(model, prompt, temperature, resp.output_text)
+    return result
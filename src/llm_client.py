@@ -0,0 +1,278 @@
+import asyncio
+import os
+import random
+import threading
+import time
+
+from src.environment import (
+    LLM_CONNECT_TIMEOUT_S,
+    LLM_KEEPALIVE_EXPIRY_S,
+    LLM_MAX_CONNECTIONS,
+    LLM_MAX_KEEPALIVE,
+    LLM_MAX_RETRIES,
+    LLM_RATE_BURST,
+    LLM_RATE_LIMIT_RPS,
+    LLM_RETRY_BACKOFF_S,
+    LLM_RETRY_BUDGET_MIN,
+    LLM_RETRY_BUDGET_RATIO,
+    LLM_STAGE_TIMEOUTS_S,
+)
+
+
+class TokenBucket:
+    # Reserves a token per call and says how long the caller must wait for it; rate <= 0 means unlimited.
+    def __init__(self, rate=LLM_RATE_LIMIT_RPS, burst=LLM_RATE_BURST):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class RetryBudget:
+    # Every call deposits `ratio` retries (capped at min_retries), every retry withdraws one. During an
+    # outage retries stay a small fraction of traffic instead of multiplying the load on the API.
+    def __init__(self, ratio=LLM_RETRY_BUDGET_RATIO, min_retries=LLM_RETRY_BUDGET_MIN):
+        self.ratio = ratio
+        self.cap = float(max(min_retries, 1))
+        self._balance = self.cap
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._balance = min(self.cap, self._balance + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            if self._balance < 1:
+                return False
+            self._balance -= 1
+            return True
+
+
+class TransportStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {"calls": 0, "retries": 0, "budget_exhausted": 0, "failures": 0}
+        self.throttled_ms = 0.0
+
+    def add(self, key, n=1):
+        with self._lock:
+            self.counts[key] += n
+
+    def throttled(self, seconds):
+        with self._lock:
+            self.throttled_ms += seconds * 1000
+
+    def stats(self):
+        with self._lock:
+            return {**self.counts, "throttled_ms": self.throttled_ms}
+
+
+RATE_LIMITER = TokenBucket()
+RETRY_BUDGET = RetryBudget()
+TRANSPORT_STATS = TransportStats()
+
+_CLIENTS = {}
+_ASYNC_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def _retryable_errors():
+    import openai
+
+    # APITimeoutError is an APIConnectionError; 4xx other than 429 are not worth repeating.
+    return openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError
+
+
+def is_timeout(error):
+    import openai
+
+    return isinstance(error, (TimeoutError, asyncio.TimeoutError, openai.APITimeoutError))
+
+
+def _backoff(attempt):
+    # Full jitter: concurrent callers that failed together do not retry in lockstep.
+    return random.uniform(0, LLM_RETRY_BACKOFF_S * 2 ** attempt)
+
+
+def _shared_client(is_async):
+    # One client (and so one keep-alive connection pool) per process for sync calls, and one per event loop
+    # for async calls: an httpx.AsyncClient's connections belong to the loop that opened them.
+    with _CLIENTS_LOCK:
+        if is_async:
+            clients, key = _ASYNC_CLIENTS, asyncio.get_running_loop()
+        else:
+            clients, key = _CLIENTS, False
+        client = clients.get(key)
+        if client is None:
+            import httpx
+            from openai import AsyncOpenAI, OpenAI
+
+            limits = httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_KEEPALIVE,
+                                  keepalive_expiry=LLM_KEEPALIVE_EXPIRY_S)
+            timeout = httpx.Timeout(LLM_STAGE_TIMEOUTS_S["default"], connect=LLM_CONNECT_TIMEOUT_S)
+            # Retries are ours (jittered, budgeted), so the SDK's own are off.
+            if is_async:
+                client = AsyncOpenAI(max_retries=0, http_client=httpx.AsyncClient(limits=limits, timeout=timeout))
+                # A closed loop's client can no longer be used or closed; let it go with its loop.
+                for loop in [loop for loop in clients if loop.is_closed()]:
+                    del clients[loop]
+            else:
+                client = OpenAI(max_retries=0, http_client=httpx.Client(limits=limits, timeout=timeout))
+            clients[key] = client
+        return client
+
+
+class _Responses:
+    def __init__(self, owner):
+        self.owner = owner
+
+    def create(self, **kwargs):
+        return self.owner._call(kwargs)
+
+
+class _AsyncResponses(_Responses):
+    async def create(self, **kwargs):
+        return await self.owner._acall(kwargs)
+
+
+class PooledLLMClient:
+    # The `responses.create` surface the LLM stages use, over the shared pooled client with this stage's
+    # timeout, the process-wide rate limit and budgeted retries.
+    def __init__(self, stage, client, max_retries=LLM_MAX_RETRIES, limiter=None, budget=None, stats=None):
+        self.stage = stage
+        self.timeout = LLM_STAGE_TIMEOUTS_S.get(stage, LLM_STAGE_TIMEOUTS_S["default"])
+        self.client = client.with_options(timeout=self.timeout) if client is not None else None
+        self.max_retries = max_retries
+        self.limiter = limiter or RATE_LIMITER
+        self.budget = budget or RETRY_BUDGET
+        self.stats = stats or TRANSPORT_STATS
+        self.responses = _AsyncResponses(self) if self._is_async else _Responses(self)
+
+    _is_async = False
+
+    def _should_retry(self, error, attempt):
+        if attempt >= self.max_retries or not isinstance(error, _retryable_errors()):
+            return False
+        if not self.budget.withdraw():
+            self.stats.add("budget_exhausted")
+            return False
+        self.stats.add("retries")
+        return True
+
+    def _attempt_kwargs(self, kwargs, expires_at):
+        # A per-call `timeout` is the budget for the whole call, retries and throttling included.
+        if expires_at is None:
+            return kwargs
+        remaining = expires_at - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("LLM call ran out of its time budget")
+        return {**kwargs, "timeout": remaining}
+
+    @staticmethod
+    def _expires_at(kwargs):
+        timeout = kwargs.pop("timeout", None)
+        return time.monotonic() + timeout if timeout is not None else None
+
+    def _call(self, kwargs):
+        self.budget.deposit()
+        self.stats.add("calls")
+        expires_at = self._expires_at(kwargs)
+        attempt = 0
+        while True:
+            wait = self.limiter.reserve()
+            if wait:
+                self.stats.throttled(wait)
+                time.sleep(wait)
+            try:
+                return self.client.responses.create(**self._attempt_kwargs(kwargs, expires_at))
+            except Exception as e:
+                if not self._should_retry(e, attempt):
+                    self.stats.add("failures")
+                    raise
+            time.sleep(_backoff(attempt))
+            attempt += 1
+
+
+class AsyncPooledLLMClient(PooledLLMClient):
+    # Without an explicit client each call goes through the shared client of the loop running it, so one
+    # stage can serve several event loops (asyncio.run per query, a server restarting its loop).
+    _is_async = True
+    _loop_client = (None, None)
+
+    def __init__(self, stage, client=None, **kwargs):
+        self._fixed_client = client
+        super().__init__(stage, client, **kwargs)
+
+    @property
+    def client(self):
+        if self._fixed_client is not None:
+            return self._fixed_client
+        loop = asyncio.get_running_loop()
+        if self._loop_client[0] is not loop:
+            self._loop_client = (loop, _shared_client(is_async=True).with_options(timeout=self.timeout))
+        return self._loop_client[1]
+
+    @client.setter
+    def client(self, client):
+        self._fixed_client = client
+
+    async def _acall(self, kwargs):
+        self.budget.deposit()
+        self.stats.add("calls")
+        expires_at = self._expires_at(kwargs)
+        attempt = 0
+        while True:
+            wait = self.limiter.reserve()
+            if wait:
+                self.stats.throttled(wait)
+                await asyncio.sleep(wait)
+            try:
+                return await self.client.responses.create(**self._attempt_kwargs(kwargs, expires_at))
+            except Exception as e:
+                if not self._should_retry(e, attempt):
+                    self.stats.add("failures")
+                    raise
+            await asyncio.sleep(_backoff(attempt))
+            attempt += 1
+
+
+def make_openai_client(stage="default"):
+    # openai is imported on first use so processes that never call an LLM stage do not pay for it.
+    if not os.getenv("OPENAI_API_KEY"):
+        return None
+    return PooledLLMClient(stage, _shared_client(is_async=False))
+
+
+def make_async_openai_client(stage="default"):
+    if not os.getenv("OPENAI_API_KEY"):
+        return None
+    return AsyncPooledLLMClient(stage)
+
+
+class AsyncClientMixin:
+    # LLM stages create their async client on first use; it picks the running loop's connection pool per call.
+    llm_stage = "default"
+    _client = None
+    _async_client = None
+
+    def has_client(self, is_async=False):
+        # False without OPENAI_API_KEY: the stage would raise or pass its input through without an LLM call.
+        return (self.async_client if is_async else self._client) is not None
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            self._async_client = make_async_openai_client(self.llm_stage)
+        return self._async_client
@@ -0,0 +1,113 @@
+import json
+import mmap
+import os
+import struct
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+MAGIC = b"TSMETA03"
+# v2 files lack the precomputed id order; they are still readable.
+LEGACY_MAGICS = (b"TSMETA02",)
+HEADER = struct.Struct("<8sQ")
+
+# `text` is derivable from the other fields via generate_function_as_text; it is not stored.
+DROPPED_FIELDS = ("text",)
+
+
+def stored_row(record):
+    # A record as the store keeps it, and so as a reloaded index returns it.
+    return {k: v for k, v in record.items() if k not in DROPPED_FIELDS}
+
+
+def write_metadata_store(path, records, ids=None):
+    payloads = [
+        json.dumps(stored_row(rec), separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        for rec in records
+    ]
+    offsets = np.zeros(len(payloads) + 1, dtype="<u8")
+    if payloads:
+        offsets[1:] = np.cumsum([len(p) for p in payloads])
+    ids = np.arange(len(payloads), dtype="<i8") if ids is None else np.asarray(ids, dtype="<i8")
+    # Row order sorted by id, so loaders can binary-search ids without sorting them on every start.
+    order = np.argsort(ids, kind="stable").astype("<i8")
+
+    # Write-then-rename so readers that still map the old file keep a valid view.
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(payloads)))
+        f.write(ids.tobytes())
+        f.write(order.tobytes())
+        f.write(offsets.tobytes())
+        for payload in payloads:
+            f.write(payload)
+    os.replace(tmp_path, path)
+
+
+# Read-only, memory-mapped view over a write_metadata_store file; rows are decoded on access.
+class MetadataStore:
+    def __init__(self, path, row_cache_size=1024):
+        self.path = path
+        # Decoded rows are shared by every hit (and request) that references them; treat them as read-only.
+        self._row_cache = OrderedDict()
+        self._row_cache_size = row_cache_size
+        self._row_lock = threading.Lock()
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"Metadata store is empty or truncated: {path}")
+
+        magic, count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC and magic not in LEGACY_MAGICS:
+            self.close()
+            raise ValueError(f"Not a metadata store (bad magic {magic!r}): {path}")
+
+        self._count = count
+        pos = HEADER.size
+        self.ids = np.frombuffer(self._mm, dtype="<i8", count=count, offset=pos)
+        pos += self.ids.nbytes
+        self.id_order = None
+        if magic == MAGIC:
+            self.id_order = np.frombuffer(self._mm, dtype="<i8", count=count, offset=pos)
+            pos += self.id_order.nbytes
+        self._offsets = np.frombuffer(self._mm, dtype="<u8", count=count + 1, offset=pos)
+        self._data_start = pos + self._offsets.nbytes
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, idx):
+        idx = int(idx)
+        if idx < 0:
+            idx += self._count
+        if not 0 <= idx < self._count:
+            raise IndexError(f"metadata row {idx} out of range")
+        with self._row_lock:
+            row = self._row_cache.get(idx)
+            if row is not None:
+                self._row_cache.move_to_end(idx)
+                return row
+        start = self._data_start + int(self._offsets[idx])
+        end = self._data_start + int(self._offsets[idx + 1])
+        row = json.loads(self._mm[start:end])
+        if self._row_cache_size > 0:
+            with self._row_lock:
+                row = self._row_cache.setdefault(idx, row)
+                if len(self._row_cache) > self._row_cache_size:
+                    self._row_cache.popitem(last=False)
+        return row
+
+    def __iter__(self):
+        for idx in range(self._count):
+            yield self[idx]
+
+    def close(self):
+        # Drop numpy's views first; mmap refuses to close while buffers are exported.
+        self.ids = None
+        self.id_order = None
+        self._offsets = None
+        self._mm.close()
+        self._file.close()
@@ -0,0 +1,134 @@
+import inspect
+import re
+from pathlib import Path
+
+import numpy as np
+
+from src.environment import ONNX_CACHE_DIR, ONNX_THREADS
+
+ONNX_BACKENDS = ("onnx", "onnx-int8")
+ONNX_OPSET = 17
+
+
+def _pooling_mode(model):
+    pooling = next((m for m in model if type(m).__name__ == "Pooling"), None)
+    if pooling is None:
+        raise ValueError("ONNX export needs a sentence-transformers model with a Pooling module.")
+    config = pooling.get_config_dict()
+    mode = config.get("pooling_mode")
+    if mode is None:
+        # sentence-transformers < 3 stores one boolean per pooling mode.
+        if config.get("pooling_mode_cls_token"):
+            mode = "cls"
+        elif config.get("pooling_mode_mean_tokens"):
+            mode = "mean"
+    if mode not in ("mean", "cls"):
+        raise ValueError(f"ONNX export supports mean or cls pooling, not {mode!r}.")
+    return mode
+
+
+def export_onnx(model, path):
+    # Traces transformer + pooling (+ normalize) into one graph so the runtime returns final embeddings.
+    import torch
+
+    pooling = _pooling_mode(model)
+    normalize = any(type(m).__name__ == "Normalize" for m in model)
+    transformer = model[0].auto_model.eval()
+
+    input_names = ["input_ids", "attention_mask"]
+    if "token_type_ids" in inspect.signature(transformer.forward).parameters:
+        input_names.append("token_type_ids")
+
+    class SentenceEncoder(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.transformer = transformer
+
+        def forward(self, *inputs):
+            hidden = self.transformer(**dict(zip(input_names, inputs))).last_hidden_state
+            attention_mask = inputs[1]
+            if pooling == "cls":
+                emb = hidden[:, 0]
+            else:
+                mask = attention_mask.unsqueeze(-1).to(hidden.dtype)
+                emb = (hidden * mask).sum(1) / mask.sum(1).clamp(min=1e-9)
+            if normalize:
+                emb = torch.nn.functional.normalize(emb, p=2, dim=1)
+            return emb
+
+    dummy = model.tokenizer(["export"], return_tensors="pt", padding=True,
+                            return_token_type_ids="token_type_ids" in input_names)
+    axes = {0: "batch", 1: "tokens"}
+    # Newer torch defaults to the dynamo exporter; the TorchScript one handles HF models without extra deps.
+    legacy = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with torch.no_grad():
+        torch.onnx.export(
+            SentenceEncoder(),
+            tuple(dummy[name] for name in input_names),
+            str(path),
+            input_names=input_names,
+            output_names=["sentence_embedding"],
+            dynamic_axes={**{name: axes for name in input_names}, "sentence_embedding": {0: "batch"}},
+            opset_version=ONNX_OPSET,
+            **legacy,
+        )
+
+
+def quantize_onnx(src_path, dst_path):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(str(src_path), str(dst_path), weight_type=QuantType.QInt8)
+
+
+def onnx_model_paths(model_name, cache_dir=ONNX_CACHE_DIR):
+    slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", str(model_name)).strip("_")
+    base = Path(cache_dir) / slug
+    return base / "model.onnx", base / "model.int8.onnx", base / "tokenizer"
+
+
+class OnnxSentenceEncoder:
+    # Stands in for SentenceTransformer in Embedder: encode() and get_sentence_embedding_dimension().
+    def __init__(self, model_name, quantized=False, threads=ONNX_THREADS, cache_dir=ONNX_CACHE_DIR):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        fp32_path, int8_path, tokenizer_dir = onnx_model_paths(model_name, cache_dir)
+        if not fp32_path.exists() or not tokenizer_dir.exists():
+            # One-time export; later processes load the ONNX file and never import the torch model.
+            from sentence_transformers import SentenceTransformer
+
+            model = SentenceTransformer(model_name, device="cpu")
+            export_onnx(model, fp32_path)
+            model.tokenizer.save_pretrained(str(tokenizer_dir))
+            (tokenizer_dir / "max_seq_length").write_text(str(model.max_seq_length))
+        if quantized and not int8_path.exists():
+            quantize_onnx(fp32_path, int8_path)
+
+        options = ort.SessionOptions()
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(str(int8_path if quantized else fp32_path), options,
+                                            providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(str(tokenizer_dir))
+        self.max_seq_length = int((tokenizer_dir / "max_seq_length").read_text())
+        self._dim = None
+
+    def get_sentence_embedding_dimension(self):
+        if self._dim is None:
+            self._dim = int(self.encode([""]).shape[1])
+        return self._dim
+
+    def encode(self, texts, batch_size=32):
+        texts = list(texts)
+        out = []
+        for start in range(0, len(texts), batch_size):
+            batch = self.tokenizer(texts[start:start + batch_size], padding=True, truncation=True,
+                                   max_length=self.max_seq_length, return_tensors="np",
+                                   return_token_type_ids="token_type_ids" in self.input_names)
+            feeds = {name: batch[name].astype(np.int64) for name in self.input_names}
+            out.append(self.session.run(None, feeds)[0])
+        if not out:
+            return np.zeros((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+        return np.concatenate(out).astype(np.float32)
@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import OrderedDict
+
+import faiss
+import numpy as np
+
+from src.environment import PLAN_CACHE_SIZE, PLAN_CACHE_THRESHOLD, PLAN_CACHE_TTL_S
+
+
+class SemanticPlanCache:
+    # Recent plan_query results keyed by the query embedding: a new query within `threshold` cosine of a
+    # cached one (same count, same index version, not expired) gets the cached result back.
+    def __init__(self, max_size=PLAN_CACHE_SIZE, threshold=PLAN_CACHE_THRESHOLD, ttl_s=PLAN_CACHE_TTL_S):
+        self.max_size = max_size
+        self.threshold = threshold
+        self.ttl_s = ttl_s
+        self.index = None
+        self._entries = OrderedDict()  # id -> (result, count, version, stored_at), least recent first
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def _remove(self, entry_id):
+        del self._entries[entry_id]
+        self.index.remove_ids(np.array([entry_id], dtype=np.int64))
+
+    def get(self, qvec, count, version):
+        if not self.enabled:
+            return None
+        with self._lock:
+            if not self._entries:
+                self.misses += 1
+                return None
+            # A near neighbour with the wrong count/version can hide a usable one, so look past the first.
+            k = min(len(self._entries), 4)
+            scores, ids = self.index.search(np.asarray(qvec, dtype=np.float32)[None, :], k)
+            now = time.monotonic()
+            for score, entry_id in zip(scores[0], ids[0]):
+                if entry_id < 0 or score < self.threshold:
+                    break
+                result, entry_count, entry_version, stored_at = self._entries[int(entry_id)]
+                if self.ttl_s and now - stored_at > self.ttl_s:
+                    self._remove(int(entry_id))
+                    self.expirations += 1
+                    continue
+                if entry_count != count or entry_version != version:
+                    continue
+                self._entries.move_to_end(int(entry_id))
+                self.hits += 1
+                return result
+            self.misses += 1
+            return None
+
+    def put(self, qvec, count, version, result):
+        if not self.enabled:
+            return
+        qvec = np.asarray(qvec, dtype=np.float32)
+        with self._lock:
+            if self.index is None:
+                self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(qvec.shape[0]))
+            entry_id = self._next_id
+            self._next_id += 1
+            self.index.add_with_ids(qvec[None, :], np.array([entry_id], dtype=np.int64))
+            self._entries[entry_id] = (result, count, version, time.monotonic())
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "threshold": self.threshold,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
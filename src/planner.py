@@ -1,9 +1,10 @@
 import os
 
-from openai import OpenAI
-
-from src.environment import DEFAULT_PLANNER_MODEL
+from src.environment import DEFAULT_PLANNER_MODEL, PROMPT_TOKEN_BUDGET
+from src.llm_cache import acomplete, complete, shared_llm_cache
+from src.llm_client import AsyncClientMixin, make_openai_client
 from src.logger import get_logger
+from src.prompting import pack_candidates
 from src.utils import load_llm_response_as_json
 
 
@@ -43,27 +44,29 @@ class Planner:
             "steps": steps,
         }
 
+    async def aplan(self, query, candidates, max_candidates=1):
+        return self.plan(query, candidates, max_candidates=max_candidates)
+
+
+class LLMPlanner(AsyncClientMixin, Planner):
+    llm_stage = "planner"
 
-class LLMPlanner(Planner):
     def __init__(self):
         super().__init__()
         self.name = "llm_planner"
         self.model = os.getenv("LLM_PLANNER_MODEL", DEFAULT_PLANNER_MODEL)
-        self._client = OpenAI() if os.getenv("OPENAI_API_KEY") else None
+        self._client = make_openai_client(self.llm_stage)
+        # temperature 0.2 samples, so the cache only counts these calls as bypassed.
+        self.temperature = 0.2
+        self.llm_cache = shared_llm_cache()
+        self.prompt_token_budget = PROMPT_TOKEN_BUDGET
         self.logger = get_logger(self.name)
 
-    def _format_candidates(self, candidates, limit=10):
-        lines = []
-        for cand in candidates[:limit]:
-            req = cand.get("parameters", {}).get("required") or []
-            req_str = ", ".join([f"{p.get('name')}({p.get('type','?')})" for p in req])
-            lines.append(
-                f"- id:{cand.get('tool_id')} name:{cand.get('name')} api:{cand.get('api_name')} "
-                f"desc:{cand.get('description','')[:120]} req:[{req_str}]"
-            )
-        return "\n".join(lines)
+    def _pack(self, candidates, limit=10):
+        # Returns (candidates that made it into the prompt, their prompt lines).
+        return pack_candidates(candidates, self.prompt_token_budget, limit=limit)
 
-    def _build_prompt(self, query, candidates):
+    def _build_prompt(self, query, fragments):
         return (
             "You are a tool-calling planner. Given a user request and a list of candidate tools, "
             "produce a plan of tool invocations as given format below.\n"
@@ -72,21 +75,30 @@ class LLMPlanner(Planner):
             'If an argument is unknown, use the string "<fill>". Do not add explanations.\n\n'
             f"User request:\n{query}\n\n"
             "Candidate tools:\n"
-            f"{self._format_candidates(candidates)}\n"
+            + "".join(f"- {fragment}\n" for fragment in fragments)
         )
 
-    def plan(self, query, candidates, max_candidates=10):
+    def plan(self, query, candidates, max_candidates=10, timeout=None):
         if not self._client:
             raise RuntimeError("LLM planner missing client or OPENAI_API_KEY not set.")
 
-        prompt = self._build_prompt(query, candidates[:max_candidates])
-        resp = self._client.responses.create(model=self.model,
-                                             input=prompt,
-                                             temperature=0.2,
+        considered, fragments = self._pack(candidates[:max_candidates])
+        prompt = self._build_prompt(query, fragments)
+        return complete(self._client, self.llm_cache, self.model, prompt, self.temperature,
+                        lambda text: self._finish_plan(text, query, considered), timeout=timeout)
+
+    async def aplan(self, query, candidates, max_candidates=10):
+        if not self.async_client:
+            raise RuntimeError("LLM planner missing client or OPENAI_API_KEY not set.")
+
+        considered, fragments = self._pack(candidates[:max_candidates])
+        prompt = self._build_prompt(query, fragments)
+        return await acomplete(self.async_client, self.llm_cache, self.model, prompt, self.temperature,
+                               lambda text: self._finish_plan(text, query, considered))
 
-                                             )
-        plan = load_llm_response_as_json(resp.output_text)
+    def _finish_plan(self, output_text, query, candidates):
+        plan = load_llm_response_as_json(output_text)
         plan["query"] = query
         plan["strategy"] = self.name
-        plan["candidates_considered"] = [c.get("tool_id") for c in candidates[:max_candidates]]
+        plan["candidates_considered"] = [c.get("tool_id") for c in candidates]
         return plan
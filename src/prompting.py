@@ -0,0 +1,79 @@
+import math
+from functools import lru_cache
+
+from src.environment import PROMPT_TOKEN_BUDGET, PROMPT_TOKENIZER_ENCODING
+
+DESCRIPTION_CHARS = 120
+# The "0. " / "- " prefix and newline each prompt adds around a fragment.
+LINE_OVERHEAD_TOKENS = 2
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    # tiktoken is optional, and its encodings are downloaded on first use; without either, estimate.
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(PROMPT_TOKENIZER_ENCODING)
+    except Exception:
+        return None
+
+
+def tokenizer_name():
+    # Recorded next to stored token counts, so counts made by a different tokenizer are not trusted.
+    return PROMPT_TOKENIZER_ENCODING if _encoding() is not None else "chars/4"
+
+
+def count_tokens(text):
+    encoding = _encoding()
+    if encoding is None:
+        return math.ceil(len(text) / 4)
+    return len(encoding.encode(text))
+
+
+def prompt_fragment(tool):
+    # The per-candidate line shared by the rerank and planner prompts.
+    required = (tool.get("parameters") or {}).get("required") or []
+    req_str = ", ".join(f"{p.get('name')}({p.get('type', '?')})" for p in required)
+    return (
+        f"id:{tool.get('tool_id')} name:{tool.get('name')} api:{tool.get('api_name')} "
+        f"desc:{(tool.get('description') or '')[:DESCRIPTION_CHARS]} req:[{req_str}]"
+    )
+
+
+def with_prompt_fragment(record):
+    # Computed once per tool when the index is built and stored in its metadata row.
+    fragment = prompt_fragment(record)
+    return {**record, "prompt_fragment": fragment, "prompt_tokens": count_tokens(fragment),
+            "prompt_tokenizer": tokenizer_name()}
+
+
+def _fragment(candidate):
+    fragment = candidate.get("prompt_fragment")
+    if fragment is None:
+        # Rows from indexes built before fragments were stored.
+        fragment = prompt_fragment(candidate)
+        return fragment, count_tokens(fragment)
+    tokens = candidate.get("prompt_tokens")
+    if tokens is None or candidate.get("prompt_tokenizer") != tokenizer_name():
+        # Counted at build time by another tokenizer (e.g. tiktoken on the build host but not here).
+        tokens = count_tokens(fragment)
+    return fragment, tokens
+
+
+def pack_candidates(candidates, token_budget=PROMPT_TOKEN_BUDGET, limit=None):
+    # Candidates arrive best first (retrieval score, or rerank order for the planner). Each is taken
+    # while it fits the budget; one that does not is skipped so a shorter, lower-ranked one can still go
+    # in. The best candidate is always kept. Returns (kept candidates, their fragments).
+    kept, fragments, used = [], [], 0
+    for cand in candidates:
+        if limit is not None and len(kept) >= limit:
+            break
+        fragment, tokens = _fragment(cand)
+        tokens += LINE_OVERHEAD_TOKENS
+        if kept and token_budget > 0 and used + tokens > token_budget:
+            continue
+        kept.append(cand)
+        fragments.append(fragment)
+        used += tokens
+    return kept, fragments
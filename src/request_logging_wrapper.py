@@ -22,6 +22,23 @@ def wrap_client_with_request_logging(client, logger=None):
         )
         return results
 
+    original_search_many = client.indexer.search_many
+
+    @functools.wraps(original_search_many)
+    def search_many_with_logging(queries, *args, **kwargs):
+        rid = kwargs.pop("request_id", None)
+        results = original_search_many(queries, *args, **kwargs)
+        for query, hits in zip(queries, results):
+            log.info(
+                "retrieval",
+                extra={
+                    "request_id": rid,
+                    "query": query,
+                    "candidates": [c.get("tool_id") for c in hits],
+                },
+            )
+        return results
+
     original_rerank = client.reranker.rerank
 
     @functools.wraps(original_rerank)
@@ -63,6 +80,9 @@ def wrap_client_with_request_logging(client, logger=None):
     @functools.wraps(original_plan_query)
     def plan_query_with_logging(query, *args, request_id=None, **kwargs):
         client.indexer.search = lambda q, *a, **k: search_with_logging(q, *a, request_id=request_id, **k)
+        client.indexer.search_many = (
+            lambda qs, *a, **k: search_many_with_logging(qs, *a, request_id=request_id, **k)
+        )
         client.reranker.rerank = (
             lambda q, cands, top_n=5, *a, **k: rerank_with_logging(
                 q, cands, top_n=top_n, *a, request_id=request_id, **k
@@ -87,6 +107,7 @@ def wrap_client_with_request_logging(client, logger=None):
             return result
         finally:
             client.indexer.search = original_search
+            client.indexer.search_many = original_search_many
             client.reranker.rerank = original_rerank
             client.planner.plan = original_plan
 
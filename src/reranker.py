@@ -2,9 +2,10 @@ import os
 from dataclasses import dataclass
 from typing import Any, Dict, List
 
-from openai import OpenAI
-
-from src.environment import DEFAULT_RERANK_MODEL
+from src.environment import DEFAULT_RERANK_MODEL, PROMPT_TOKEN_BUDGET
+from src.llm_cache import acomplete, complete, shared_llm_cache
+from src.llm_client import AsyncClientMixin, is_timeout, make_openai_client
+from src.prompting import pack_candidates
 from src.utils import load_llm_response_as_json
 
 
@@ -18,21 +19,23 @@ class Reranker:
     def rerank(self, query, candidates, top_n=5):
         return RerankResult(candidates=candidates[:top_n], notes="identity")
 
+    async def arerank(self, query, candidates, top_n=5):
+        return self.rerank(query, candidates, top_n=top_n)
+
+
+class OpenAILLMReranker(AsyncClientMixin, Reranker):
+    llm_stage = "rerank"
 
-class OpenAILLMReranker(Reranker):
     def __init__(self, model=None):
         self.model = model or os.getenv("LLM_RERANK_MODEL", DEFAULT_RERANK_MODEL)
-        self._client = OpenAI() if os.getenv("OPENAI_API_KEY") else None
+        self._client = make_openai_client(self.llm_stage)
+        self.llm_cache = shared_llm_cache()
+        self.prompt_token_budget = PROMPT_TOKEN_BUDGET
 
     def _build_prompt(self, query, candidates):
-        lines = []
-        for i, c in enumerate(candidates):
-            req = c.get("parameters", {}).get("required") or []
-            req_str = ", ".join([f"{p.get('name')}({p.get('type','?')})" for p in req])
-            lines.append(
-                f"{i}. id:{c.get('tool_id')} name:{c.get('name')} api:{c.get('api_name')} "
-                f"desc:{c.get('description','')[:120]} req:[{req_str}]"
-            )
+        # Candidates left out of the prompt keep their retrieval order after the ranked ones.
+        _, fragments = pack_candidates(candidates, self.prompt_token_budget)
+        lines = [f"{i}. {fragment}" for i, fragment in enumerate(fragments)]
         return (
             'You are a tool reranker. Given a user request and a list of candidate tools, '
             'return the best tools ordered from most relevant to least. '
@@ -42,7 +45,7 @@ class OpenAILLMReranker(Reranker):
             'Candidates:\n' + "\n".join(lines) + '\n'
         )
 
-    def rerank(self, query, candidates, top_n=5):
+    def rerank(self, query, candidates, top_n=5, timeout=None):
         if not candidates:
             return RerankResult(candidates=[], notes="no_candidates")
         if not self._client:
@@ -50,18 +53,36 @@ class OpenAILLMReranker(Reranker):
 
         prompt = self._build_prompt(query, candidates)
         try:
-            resp = self._client.responses.create(
-                model=self.model,
-                input=prompt,
-                temperature=0.0,
-            )
-            data = load_llm_response_as_json(resp.output_text)
-            ranked_ids = data.get("ranked_ids", [])
-            by_id = {c.get("tool_id"): c for c in candidates}
-            ordered = [by_id[tid] for tid in ranked_ids if tid in by_id]
-            for c in candidates:
-                if c.get("tool_id") not in ranked_ids:
-                    ordered.append(c)
-            return RerankResult(candidates=ordered[:top_n], notes="llm_rerank")
+            return complete(self._client, self.llm_cache, self.model, prompt, 0.0,
+                            lambda text: self._ranked(text, candidates, top_n), timeout=timeout)
         except Exception as e:
-            return RerankResult(candidates=candidates[:top_n], notes=f"rerank_fallback:{e}")
+            return self._fallback(candidates, top_n, e)
+
+    async def arerank(self, query, candidates, top_n=5):
+        if not candidates:
+            return RerankResult(candidates=[], notes="no_candidates")
+        if not self.async_client:
+            return Reranker.rerank(self, query, candidates, top_n)
+
+        prompt = self._build_prompt(query, candidates)
+        try:
+            return await acomplete(self.async_client, self.llm_cache, self.model, prompt, 0.0,
+                                   lambda text: self._ranked(text, candidates, top_n))
+        except Exception as e:
+            return self._fallback(candidates, top_n, e)
+
+    @staticmethod
+    def _fallback(candidates, top_n, error):
+        # The retrieval order, tagged so callers can tell a timed-out call from a failed one.
+        kind = "timeout" if is_timeout(error) else "error"
+        return RerankResult(candidates=candidates[:top_n], notes=f"rerank_fallback:{kind}:{error}")
+
+    def _ranked(self, output_text, candidates, top_n):
+        data = load_llm_response_as_json(output_text)
+        ranked_ids = data.get("ranked_ids", [])
+        by_id = {c.get("tool_id"): c for c in candidates}
+        ordered = [by_id[tid] for tid in ranked_ids if tid in by_id]
+        for c in candidates:
+            if c.get("tool_id") not in ranked_ids:
+                ordered.append(c)
+        return RerankResult(candidates=ordered[:top_n], notes="llm_rerank")
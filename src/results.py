@@ -0,0 +1,108 @@
+import heapq
+from collections.abc import Mapping
+
+from src.utils import generate_function_as_text
+
+
+# Fields the index keeps per tool for its own use (row id, precomputed prompt line and its token count);
+# they travel between shards but are not part of a candidate in a response. `id` was the positional row
+# number, which means nothing in the ID-mapped index.
+INTERNAL_FIELDS = frozenset(("id", "prompt_fragment", "prompt_tokens", "prompt_tokenizer"))
+
+
+class SearchHit(Mapping):
+    # Read-only view of one search result: the score plus a reference to the shared tool record,
+    # resolved from `source.record(fid)` on first field access instead of being copied per hit.
+    __slots__ = ("score", "fid", "_source", "_record")
+
+    def __init__(self, score, fid, source):
+        self.score = score
+        self.fid = fid
+        self._source = source
+        self._record = None
+
+    def _fields(self):
+        if self._record is None:
+            self._record = self._source.record(self.fid)
+        return self._record
+
+    def __getitem__(self, key):
+        if key == "score":
+            return self.score
+        return self._fields()[key]
+
+    def __iter__(self):
+        yield "score"
+        for key in self._fields():
+            if key != "score":
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def to_dict(self):
+        return {"score": self.score, **self._fields()}
+
+    def __repr__(self):
+        return f"SearchHit(score={self.score:.4f}, fid={self.fid})"
+
+
+class MergedHit(Mapping):
+    # One tool retrieved by one or more query segments: the best-scoring hit plus the segments that hit it.
+    __slots__ = ("hit", "segments")
+
+    def __init__(self, hit, segment):
+        self.hit = hit
+        self.segments = [segment]
+
+    @property
+    def score(self):
+        return self.hit["score"]
+
+    def __getitem__(self, key):
+        if key == "segments":
+            return self.segments
+        return self.hit[key]
+
+    def __iter__(self):
+        yield from self.hit
+        yield "segments"
+
+    def __len__(self):
+        return len(self.hit) + 1
+
+    def to_dict(self):
+        return {**self.hit, "segments": list(self.segments)}
+
+    def __repr__(self):
+        return f"MergedHit({self.hit!r}, segments={self.segments})"
+
+
+def merge_segment_hits(hits_per_segment, limit=None):
+    # k-way merge of the per-segment, score-sorted hit lists; the first (best) hit per tool_id wins.
+    merged = {}
+    streams = [[(-hit["score"], segment, hit) for hit in hits] for segment, hits in enumerate(hits_per_segment)]
+    for _, segment, hit in heapq.merge(*streams, key=lambda item: item[:2]):
+        entry = merged.get(hit["tool_id"])
+        if entry is not None:
+            if segment not in entry.segments:
+                entry.segments.append(segment)
+        elif limit is None or len(merged) < limit:
+            merged[hit["tool_id"]] = MergedHit(hit, segment)
+    return list(merged.values())
+
+
+def materialize(obj):
+    # Turn SearchHits nested anywhere in a response into plain dicts, right before serialization.
+    if isinstance(obj, (SearchHit, MergedHit)):
+        out = {k: v for k, v in obj.to_dict().items() if k not in INTERNAL_FIELDS}
+        # The metadata store does not keep `text` (it is derived from the API fields); rebuild it so
+        # candidates keep the field they always had.
+        if "text" not in out and "tool_id" in out:
+            out["text"] = generate_function_as_text(out)
+        return out
+    if isinstance(obj, dict):
+        return {k: materialize(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [materialize(v) for v in obj]
+    return obj
@@ -0,0 +1,57 @@
+import threading
+from contextlib import contextmanager
+
+
+class ReadWriteLock:
+    # Any number of readers, or one writer. A waiting writer holds back new readers so a steady search load
+    # cannot starve it. Both sides are re-entrant per thread and the writer may also read; a reader must not
+    # try to become the writer.
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = None
+        self._writes = 0
+        self._waiting_writers = 0
+        self._local = threading.local()
+
+    @contextmanager
+    def read(self):
+        me = threading.get_ident()
+        depth = getattr(self._local, "reads", 0)
+        if not depth and self._writer != me:
+            with self._cond:
+                while self._writer is not None or self._waiting_writers:
+                    self._cond.wait()
+                self._readers += 1
+        self._local.reads = depth + 1
+        try:
+            yield
+        finally:
+            self._local.reads = depth
+            if not depth and self._writer != me:
+                with self._cond:
+                    self._readers -= 1
+                    if not self._readers:
+                        self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer != me:
+                self._waiting_writers += 1
+                try:
+                    while self._writer is not None or self._readers:
+                        self._cond.wait()
+                finally:
+                    self._waiting_writers -= 1
+                self._writer = me
+            self._writes += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writes -= 1
+                if not self._writes:
+                    self._writer = None
+                    self._cond.notify_all()
@@ -0,0 +1,259 @@
+import argparse
+import heapq
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from multiprocessing.connection import Client, Listener
+from pathlib import Path
+
+import numpy as np
+
+from src.embedder import Embedder
+from src.embedding_cache import EmbeddingCache
+from src.environment import (
+    APPLY_STD,
+    INDEX_DB_RETRIEVAL_COUNT,
+    SHARD_ADDRESSES,
+    SHARD_AUTHKEY,
+    SHARD_DIR,
+    STD_COEF,
+)
+from src.indexer import Indexer, check_embedder_compatible
+from src.lexical_index import SearchPathStats
+from src.logger import get_logger
+from src.utils import load_functions, normalize, std_keep_mask, tool_int_id
+
+
+def shard_paths(base_dir, shard_id):
+    shard_dir = Path(base_dir) / f"shard_{shard_id}"
+    return shard_dir / "faiss.index", shard_dir / "metadata.bin"
+
+
+def parse_address(address):
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def build_shards(apis, num_shards, base_dir=SHARD_DIR):
+    embedder = Embedder()
+    parts = [{} for _ in range(num_shards)]
+    for tool_id, api in apis.items():
+        parts[tool_int_id(tool_id) % num_shards][tool_id] = api
+
+    for shard_id, part in enumerate(parts):
+        index_path, metadata_path = shard_paths(base_dir, shard_id)
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        print(f"[shard {shard_id}] {len(part)} tools")
+        Indexer(index_path=index_path, metadata_path=metadata_path, embedder=embedder).build(part)
+
+
+class _VectorOnlyEmbedder:
+    # Shards receive query vectors from the coordinator and never load the embedding model.
+    model_name = ""
+
+    def embed(self, text):
+        raise RuntimeError("Shard processes search by vector; embed queries on the coordinator.")
+
+    embed_batch = embed
+
+
+def require_authkey(authkey):
+    # multiprocessing.connection unpickles every message: whoever holds the key can run code on the shard.
+    if not authkey:
+        raise ValueError("SHARD_AUTHKEY is not set; shard servers and clients need a shared secret key.")
+    return authkey
+
+
+class ShardServer:
+    def __init__(self, indexer, address, authkey=SHARD_AUTHKEY):
+        self.indexer = indexer
+        self.listener = Listener(address, authkey=require_authkey(authkey))
+        self.address = self.listener.address
+        self.logger = get_logger("shard")
+
+    def serve_forever(self):
+        self.logger.info("Shard serving %s tools on %s:%s", self.indexer.size, *self.address)
+        while True:
+            try:
+                conn = self.listener.accept()
+            except OSError:
+                return  # listener closed
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        with conn:
+            while True:
+                try:
+                    op, payload = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    conn.send(("ok", self._dispatch(op, payload)))
+                except Exception as e:
+                    self.logger.exception("Shard request failed: %s", op)
+                    conn.send(("error", str(e)))
+
+    def _dispatch(self, op, payload):
+        if op == "search":
+            qvecs, k = payload
+            hits = self.indexer.search_vectors(qvecs, k=k, apply_std=False)
+            return [[hit.to_dict() for hit in row] for row in hits]
+        if op == "ping":
+            return {"size": self.indexer.size, "embedder": self.indexer.built_with, "version": self.indexer.version}
+        raise ValueError(f"Unknown shard op: {op}")
+
+    def close(self):
+        self.listener.close()
+
+
+def serve_shard(base_dir, shard_id, address, authkey=SHARD_AUTHKEY):
+    index_path, metadata_path = shard_paths(base_dir, shard_id)
+    indexer = Indexer(index_path=index_path, metadata_path=metadata_path, embedder=_VectorOnlyEmbedder())
+    indexer.load()
+    ShardServer(indexer, address, authkey).serve_forever()
+
+
+class ShardClient:
+    def __init__(self, address, authkey=SHARD_AUTHKEY):
+        self.address = address
+        self.authkey = require_authkey(authkey)
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def call(self, op, payload=None):
+        with self._lock:
+            if self._conn is None:
+                self._conn = Client(self.address, authkey=self.authkey)
+            try:
+                self._conn.send((op, payload))
+                status, result = self._conn.recv()
+            except (EOFError, OSError):
+                self._conn = None  # reconnect on the next call
+                raise
+        if status != "ok":
+            raise RuntimeError(f"Shard {self.address[0]}:{self.address[1]} failed: {result}")
+        return result
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class ShardedIndexer:
+    def __init__(self, addresses=None, authkey=SHARD_AUTHKEY, embedder=None):
+        addresses = addresses or SHARD_ADDRESSES
+        if not addresses:
+            raise ValueError("ShardedIndexer needs at least one shard address (SHARD_ADDRESSES).")
+        self.shards = [ShardClient(parse_address(a) if isinstance(a, str) else a, authkey) for a in addresses]
+        self.embedder = embedder or Embedder()
+        self.query_cache = EmbeddingCache()
+        self.search_stats = SearchPathStats()
+        self._pool = ThreadPoolExecutor(max_workers=len(self.shards), thread_name_prefix="shard")
+        self.size = 0
+        self.version = None
+
+    def load(self):
+        shards = self._scatter("ping", None)
+        for shard in shards:
+            check_embedder_compatible(shard.get("embedder"), self.embedder)
+        self.size = sum(shard["size"] for shard in shards)
+        # As seen at load time; a shard changed behind a running client is not picked up until it reloads.
+        self.version = tuple(shard.get("version") for shard in shards)
+        print(f"Connected to {len(self.shards)} shards ({self.size} tools).")
+
+    def _scatter(self, op, payload):
+        futures = [self._pool.submit(shard.call, op, payload) for shard in self.shards]
+        return [f.result() for f in futures]
+
+    def embed_queries(self, queries):
+        return normalize(self.query_cache.embed(self.embedder, queries).astype("float32"))
+
+    def search(self, query):
+        return self._search_queries([query])[0]
+
+    def search_many(self, queries):
+        queries = list(queries)
+        if not queries:
+            return []
+        return self._search_queries(queries)
+
+    def _search_queries(self, queries):
+        # Shards only hold vectors, so every query takes the dense path.
+        start = time.perf_counter()
+        results = self.search_vectors(self.embed_queries(queries))
+        self.search_stats.record("dense", len(queries), (time.perf_counter() - start) * 1000)
+        return results
+
+    def search_vectors(self, qvecs, k=None, apply_std=None):
+        k = INDEX_DB_RETRIEVAL_COUNT if k is None else k
+        apply_std = APPLY_STD if apply_std is None else apply_std
+
+        # Each shard returns its own top-k (unfiltered); merge the score-sorted lists, then threshold once.
+        per_shard = self._scatter("search", (np.ascontiguousarray(qvecs, dtype=np.float32), k))
+        results = []
+        for row in range(len(qvecs)):
+            merged = list(islice(heapq.merge(*(hits[row] for hits in per_shard), key=lambda h: -h["score"]), k))
+            if apply_std and merged:
+                scores = np.array([[h["score"] for h in merged]], dtype=np.float32)
+                keep = std_keep_mask(scores, np.ones_like(scores, dtype=bool), STD_COEF)[0]
+                merged = [h for h, kept in zip(merged, keep) if kept]
+            results.append(merged)
+        return results
+
+    def close(self):
+        for shard in self.shards:
+            shard.close()
+        self._pool.shutdown(wait=False)
+
+
+def launch_local_shards(num_shards, base_dir=SHARD_DIR, host="127.0.0.1", base_port=7001):
+    require_authkey(SHARD_AUTHKEY)  # fail here rather than in every spawned shard
+    ctx = multiprocessing.get_context("spawn")
+    procs, addresses = [], []
+    for shard_id in range(num_shards):
+        address = (host, base_port + shard_id)
+        proc = ctx.Process(target=serve_shard, args=(base_dir, shard_id, address), daemon=True)
+        proc.start()
+        procs.append(proc)
+        addresses.append(f"{host}:{base_port + shard_id}")
+    return procs, addresses
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded FAISS index: build shards, serve one, or launch all locally.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="split load_functions() across N shard indexes")
+    build.add_argument("--shards", type=int, required=True)
+    build.add_argument("--dir", default=SHARD_DIR)
+
+    serve = sub.add_parser("serve", help="serve one shard over a socket")
+    serve.add_argument("--shard-id", type=int, required=True)
+    # Loopback by default; bind other interfaces only on a trusted network (see docs/setup.md).
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, required=True)
+    serve.add_argument("--dir", default=SHARD_DIR)
+
+    launch = sub.add_parser("launch", help="serve every shard as a local process")
+    launch.add_argument("--shards", type=int, required=True)
+    launch.add_argument("--base-port", type=int, default=7001)
+    launch.add_argument("--dir", default=SHARD_DIR)
+
+    args = parser.parse_args()
+    if args.command == "build":
+        build_shards(load_functions(), args.shards, args.dir)
+    elif args.command == "serve":
+        serve_shard(args.dir, args.shard_id, (args.host, args.port))
+    else:
+        procs, addresses = launch_local_shards(args.shards, args.dir, base_port=args.base_port)
+        print(f"SHARD_ADDRESSES={','.join(addresses)}")
+        for proc in procs:
+            proc.join()
+
+
+if __name__ == "__main__":
+    main()
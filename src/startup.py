@@ -0,0 +1,77 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from src.environment import INDEX_PATH, METADATA_PATH, WARMUP_QUERIES
+from src.logger import get_logger
+
+
+class AgentStartup:
+    # Builds the ToolSelectorClient off the request path and tracks liveness vs readiness.
+    def __init__(self, index_path=INDEX_PATH, metadata_path=METADATA_PATH, warmup_queries=None, use_async=False):
+        self.index_path = index_path
+        self.metadata_path = metadata_path
+        self.warmup_queries = WARMUP_QUERIES if warmup_queries is None else warmup_queries
+        self.use_async = use_async
+        self.logger = get_logger("startup")
+        self.agent = None
+        self.phase = "pending"
+        self.error = None
+        self.breakdown_ms = {}
+        self._ready = threading.Event()
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    @contextmanager
+    def _timed(self, phase):
+        self.phase = phase
+        start = time.perf_counter()
+        yield
+        self.breakdown_ms[f"{phase}_ms"] = (time.perf_counter() - start) * 1000
+
+    def run(self):
+        start = time.perf_counter()
+        try:
+            with self._timed("imports"):
+                # faiss, numpy and the pipeline modules; deferred so the web worker binds its port first.
+                from src.client import AsyncToolSelectorClient, ToolSelectorClient
+
+            with self._timed("client"):
+                client_class = AsyncToolSelectorClient if self.use_async else ToolSelectorClient
+                agent = client_class(index_path=self.index_path, metadata_path=self.metadata_path)
+            self.breakdown_ms.update(agent.startup_ms)
+
+            with self._timed("embedding_model"):
+                agent.embedder.model
+
+            with self._timed("warmup"):
+                # Retrieval only: runs the model and FAISS once without spending LLM calls on warm-up.
+                if self.warmup_queries:
+                    agent.indexer.search_many(self.warmup_queries)
+        except Exception as e:
+            self.logger.exception("Startup failed during %s", self.phase)
+            self.error = f"{self.phase}: {type(e).__name__}: {e}"
+            self.phase = "failed"
+            return None
+
+        self.breakdown_ms["total_ms"] = (time.perf_counter() - start) * 1000
+        self.agent = agent
+        self.phase = "ready"
+        self._ready.set()
+        self.logger.info(
+            "Cold start %.0f ms: %s",
+            self.breakdown_ms["total_ms"],
+            ", ".join(f"{k}={v:.0f}" for k, v in self.breakdown_ms.items() if k != "total_ms"),
+        )
+        return agent
+
+    def status(self):
+        return {
+            "ready": self.ready,
+            "phase": self.phase,
+            "error": self.error,
+            "breakdown_ms": dict(self.breakdown_ms),
+            "warmup_queries": len(self.warmup_queries),
+        }
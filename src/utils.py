@@ -1,25 +1,77 @@
 import ast
 import hashlib
 import json
+import os
 import re
-from collections import defaultdict
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import numpy as np
 
-from src.environment import DATASET_PATHS
+from src.environment import DATASET_CACHE_DIR, DATASET_LOAD_WORKERS, DATASET_PATHS
+
+# Bump when parsing/normalization changes so cached function tables are rebuilt.
+DATASET_CACHE_VERSION = 1
+_JSON_CHUNK = 1 << 20
+
+
+def _iter_json_array(f):
+    # Decodes one array element at a time from fixed-size chunks instead of loading the whole file.
+    decoder = json.JSONDecoder()
+    buf, pos, eof = "", 0, False
+
+    def read_more():
+        # Drops what has been consumed and appends the next chunk; False at end of file.
+        nonlocal buf, pos, eof
+        chunk = f.read(_JSON_CHUNK)
+        buf, pos, eof = buf[pos:] + chunk, 0, not chunk
+        return not eof
+
+    def skip(chars):
+        # Moves past `chars`, reading on as needed; False if the file ends first.
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in chars:
+                pos += 1
+            if pos < len(buf):
+                return True
+            if not read_more():
+                return False
+
+    if not skip(" \t\r\n") or buf[pos] != "[":
+        raise ValueError("expected a JSON array")
+    pos += 1
+    while True:
+        if not skip(" \t\r\n,") or buf[pos] == "]":
+            return
+        try:
+            rec, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if not read_more():
+                raise
+            continue
+        if not eof and (end == len(buf) or buf[end] not in " \t\r\n,]"):
+            # Only a delimiter ends an element: a number cut at the chunk edge ("123" + "45", "-1." + "5")
+            # decodes as a shorter one, so read on and decode it again.
+            read_more()
+            continue
+        yield rec
+        pos = end
 
 
 def read_records(path):
-    p = Path(path)
-    text = p.read_text()
-    stripped = text.lstrip()
-    if stripped.startswith("["):
-        data = json.loads(text)
-        for rec in data:
-            yield rec
-    else:
-        with p.open("r") as f:
+    with Path(path).open("r") as f:
+        first = ""
+        while True:
+            ch = f.read(1)
+            if not ch or not ch.isspace():
+                first = ch
+                break
+        f.seek(0)
+        if first == "[":
+            yield from _iter_json_array(f)
+        else:
             for line in f:
                 if line.strip():
                     yield json.loads(line)
@@ -30,6 +82,11 @@ def hash_dict(d):
     return hashlib.sha256(encoded).hexdigest()
 
 
+def tool_int_id(tool_id):
+    # Stable 60-bit FAISS id for a tool_id (the hash_dict content hash); fits a positive int64.
+    return int(hashlib.sha256(str(tool_id).encode()).hexdigest()[:15], 16)
+
+
 def _iter_records(path):
     yield from read_records(path)
 
@@ -47,19 +104,72 @@ def _extract_functions_from_record(rec):
         yield fn
 
 
-def load_functions():
-    funcs = defaultdict(dict)
-    for path in DATASET_PATHS:
-        for record in _iter_records(path):
-            for fn in _extract_functions_from_record(record):
-                hashed_value = hash_dict(fn)
-                funcs[hashed_value]={
-                    "name": fn.get("name", ""),
-                    "api_name": fn.get("api_name") or fn.get("api_call") or "",
-                    "parameters": normalize_parameters(fn.get("parameters")),
-                    "description": fn.get("description", ""),
-                }
+def _parse_dataset(path):
+    funcs = {}
+    for record in _iter_records(path):
+        for fn in _extract_functions_from_record(record):
+            hashed_value = hash_dict(fn)
+            funcs[hashed_value] = {
+                "name": fn.get("name", ""),
+                "api_name": fn.get("api_name") or fn.get("api_call") or "",
+                "parameters": normalize_parameters(fn.get("parameters")),
+                "description": fn.get("description", ""),
+            }
+    return funcs
+
+
+def _dataset_cache_path(path, cache_dir):
+    stat = Path(path).stat()
+    key = f"{DATASET_CACHE_VERSION}|{Path(path).resolve()}|{stat.st_size}|{stat.st_mtime_ns}"
+    return Path(cache_dir) / f"{hashlib.sha256(key.encode()).hexdigest()[:32]}.json"
+
+
+def _read_dataset_cache(cache_path):
+    try:
+        with open(cache_path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
 
+
+def _write_dataset_cache(cache_path, funcs):
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = f"{cache_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(funcs, f, separators=(",", ":"), ensure_ascii=False)
+    os.replace(tmp_path, cache_path)
+
+
+def load_functions(paths=None, cache_dir=None, workers=None):
+    paths = list(DATASET_PATHS if paths is None else paths)
+    cache_dir = DATASET_CACHE_DIR if cache_dir is None else cache_dir
+    workers = DATASET_LOAD_WORKERS if workers is None else workers
+
+    # Each file's normalized table is cached under its size + mtime, so unchanged files skip parsing.
+    tables = {}
+    cache_paths = {}
+    if cache_dir:
+        for path in paths:
+            cache_paths[path] = _dataset_cache_path(path, cache_dir)
+            cached = _read_dataset_cache(cache_paths[path])
+            if cached is not None:
+                tables[path] = cached
+
+    pending = [path for path in dict.fromkeys(paths) if path not in tables]
+    if len(pending) > 1 and workers > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as pool:
+            parsed = list(pool.map(_parse_dataset, pending))
+    else:
+        parsed = [_parse_dataset(path) for path in pending]
+    for path, funcs in zip(pending, parsed):
+        tables[path] = funcs
+        if cache_dir:
+            _write_dataset_cache(cache_paths[path], funcs)
+
+    # Later paths win on duplicate ids, as when the files were read one after another.
+    funcs = {}
+    for path in paths:
+        funcs.update(tables[path])
     return funcs
 
 
@@ -96,6 +206,29 @@ def normalize(vecs):
     return vecs / norms
 
 
+def std_keep_mask(scores, keep, coef):
+    # Per row: keep scores >= mean - coef * std, where the stats only count entries already in `keep`.
+    counts = np.maximum(keep.sum(axis=1, keepdims=True), 1)
+    mean = np.where(keep, scores, 0.0).sum(axis=1, keepdims=True) / counts
+    std = np.sqrt(np.where(keep, (scores - mean) ** 2, 0.0).sum(axis=1, keepdims=True) / counts)
+    return keep & (scores >= mean - coef * std)
+
+
+def rss_mb():
+    # Current resident set size; falls back to the peak where /proc is unavailable.
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
 def load_llm_response_as_json(text: str) -> dict:
     if not text:
         raise ValueError("Empty LLM response")
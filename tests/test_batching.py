@@ -0,0 +1,65 @@
+import asyncio
+import unittest
+
+from src.batching import SearchBatcher
+
+
+class RecordingSearch:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    def __call__(self, queries):
+        self.calls.append(list(queries))
+        if self.fail:
+            raise RuntimeError("index unavailable")
+        return [[{"tool_id": f"{q}-tool"}] for q in queries]
+
+
+class TestSearchBatcher(unittest.TestCase):
+    def test_concurrent_requests_share_one_search(self):
+        search = RecordingSearch()
+        batcher = SearchBatcher(search, window_ms=20, max_queries=64)
+
+        async def run():
+            return await asyncio.gather(
+                batcher.search_many(["a", "b"]),
+                batcher.search_many(["c"]),
+                batcher.search_many([]),
+            )
+
+        first, second, empty = asyncio.run(run())
+        self.assertEqual(search.calls, [["a", "b", "c"]])
+        self.assertEqual([h[0]["tool_id"] for h in first], ["a-tool", "b-tool"])
+        self.assertEqual([h[0]["tool_id"] for h in second], ["c-tool"])
+        self.assertEqual(empty, [])
+        stats = batcher.stats()
+        self.assertEqual((stats["batches"], stats["requests"], stats["queries"]), (1, 2, 3))
+        self.assertGreater(stats["max_queue_delay_ms"], 0)
+
+    def test_max_queries_flushes_without_waiting_for_the_window(self):
+        search = RecordingSearch()
+        batcher = SearchBatcher(search, window_ms=10_000, max_queries=2)
+
+        async def run():
+            return await asyncio.wait_for(
+                asyncio.gather(batcher.search_many(["a"]), batcher.search_many(["b"]), batcher.search_many(["c", "d"])),
+                timeout=5,
+            )
+
+        asyncio.run(run())
+        self.assertEqual(search.calls, [["a", "b"], ["c", "d"]])
+        self.assertEqual(batcher.stats()["max_batch_queries"], 2)
+
+    def test_search_errors_reach_every_waiting_request(self):
+        batcher = SearchBatcher(RecordingSearch(fail=True), window_ms=5)
+
+        async def run():
+            return await asyncio.gather(batcher.search_many(["a"]), batcher.search_many(["b"]), return_exceptions=True)
+
+        results = asyncio.run(run())
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+
+
+if __name__ == "__main__":
+    unittest.main()
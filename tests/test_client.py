@@ -0,0 +1,342 @@
+import asyncio
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from src import client
+from src.context_segmenter import DeterministicSegmenter, LLMBasedSegmenter
+from src.plan_cache import SemanticPlanCache
+from src.planner import LLMPlanner, Planner
+from src.reranker import OpenAILLMReranker, RerankResult, Reranker
+
+
+class FakeIndexer:
+    embedder = None
+
+    def __init__(self, index_path, metadata_path):
+        self.search_threads = []
+
+    def load(self):
+        pass
+
+    def search_many(self, queries):
+        self.search_threads.append(threading.current_thread().name)
+        return [[{"score": 1.0 - i / 10, "tool_id": f"{q}-tool"}] for i, q in enumerate(queries)]
+
+
+class SlowLLMStages:
+    # Stands in for the segmenter / reranker / planner with an awaitable network delay.
+    def __init__(self, delay):
+        self.delay = delay
+
+    async def asegment(self, query):
+        await asyncio.sleep(self.delay)
+        return query.split(" and ")
+
+    async def arerank(self, query, candidates, top_n=5):
+        await asyncio.sleep(self.delay)
+        return RerankResult(candidates=candidates[:top_n], notes="fake")
+
+    async def aplan(self, query, candidates, max_candidates=5):
+        await asyncio.sleep(self.delay)
+        return {"query": query, "steps": [{"tool_id": c["tool_id"]} for c in candidates[:max_candidates]]}
+
+
+class SlowLLMSegmenter:
+    def __init__(self, indexer, segments, delay=0.05):
+        self.indexer = indexer
+        self.segments = segments
+        self.delay = delay
+        self.searched_before_reply = None
+
+    def segment(self, query):
+        time.sleep(self.delay)
+        self.searched_before_reply = list(self.indexer.searched)
+        return self.segments
+
+    async def asegment(self, query):
+        await asyncio.sleep(self.delay)
+        self.searched_before_reply = list(self.indexer.searched)
+        return self.segments
+
+
+class RecordingIndexer(FakeIndexer):
+    def __init__(self, index_path, metadata_path):
+        super().__init__(index_path, metadata_path)
+        self.searched = []
+
+    def search_many(self, queries):
+        self.searched.append(list(queries))
+        return super().search_many(queries)
+
+
+class TestSpeculativeRetrieval(unittest.TestCase):
+    QUERY = "book a flight and rent a car"
+
+    def make_agent(self, cls):
+        with patch.object(client, "Indexer", RecordingIndexer):
+            agent = cls(index_path="idx", metadata_path="meta")
+        agent.speculative = True
+        agent.context_segments = SlowLLMSegmenter(agent.indexer, ["book a flight", "find  a hotel"])
+        self.addCleanup(agent.close)
+        return agent
+
+    def check(self, agent, candidates):
+        speculative = [self.QUERY, "book a flight", "rent a car"]
+        # Raw query + deterministic segments were searched while the LLM call was in flight.
+        self.assertEqual(agent.context_segments.searched_before_reply, [speculative])
+        self.assertEqual(agent.indexer.searched, [speculative, ["find  a hotel"]])
+        # LLM segments keep indices 0 and 1; speculative-only queries follow.
+        by_tool = {c["tool_id"]: c["segments"] for c in candidates}
+        self.assertEqual(by_tool["book a flight-tool"], [0])
+        self.assertEqual(by_tool["find  a hotel-tool"], [1])
+        self.assertEqual(by_tool["rent a car-tool"], [3])
+        self.assertEqual(agent.speculation_stats.stats()["reused_segments"], 1)
+
+    def test_sync_client_searches_only_new_segments(self):
+        agent = self.make_agent(client.ToolSelectorClient)
+        candidates, _ = agent.retrieve(self.QUERY)
+        self.check(agent, candidates)
+
+    def test_async_client_searches_only_new_segments(self):
+        agent = self.make_agent(client.AsyncToolSelectorClient)
+        candidates, _ = asyncio.run(agent.retrieve(self.QUERY))
+        self.check(agent, candidates)
+
+
+class EmbeddingIndexer(RecordingIndexer):
+    version = 1
+
+    def embed_queries(self, queries):
+        # Case-insensitive "paraphrase" detection is enough to exercise the cache.
+        vecs = np.array([[float(len(q)), 1.0] for q in (q.lower().strip() for q in queries)], dtype=np.float32)
+        return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+
+class TestPlanCache(unittest.TestCase):
+    def make_agent(self, cls=client.ToolSelectorClient):
+        with patch.object(client, "Indexer", EmbeddingIndexer):
+            agent = cls(index_path="idx", metadata_path="meta")
+        # Deterministic stages regardless of the USE_LLM_* flags in the environment.
+        agent.context_segments, agent.reranker, agent.planner = DeterministicSegmenter(), Reranker(), Planner()
+        agent.speculative = False
+        agent.plan_cache = SemanticPlanCache(max_size=8, threshold=0.9999, ttl_s=0)
+        self.addCleanup(agent.close)
+        return agent
+
+    def test_repeat_query_is_served_from_cache_until_the_index_changes(self):
+        agent = self.make_agent()
+        first = agent.plan_query("Book a flight", count=2)
+        again = agent.plan_query("book a flight ", count=2)
+        self.assertFalse(first["cached"])
+        self.assertTrue(again["cached"])
+        self.assertEqual(again["query"], "book a flight ")
+        self.assertEqual(again["cached_query"], "Book a flight")
+        self.assertEqual(again["plan"]["query"], "book a flight ")
+        self.assertEqual(first["plan"]["query"], "Book a flight")
+        self.assertEqual({**again["plan"], "query": first["plan"]["query"]}, first["plan"])
+        self.assertEqual(len(agent.indexer.searched), 1)
+
+        agent.indexer.version = 2
+        self.assertFalse(agent.plan_query("book a flight", count=2)["cached"])
+        self.assertEqual(len(agent.indexer.searched), 2)
+
+    def test_async_client_uses_the_same_cache(self):
+        agent = self.make_agent(client.AsyncToolSelectorClient)
+
+        async def run():
+            return await agent.plan_query("send an email"), await agent.plan_query("Send an email")
+
+        first, again = asyncio.run(run())
+        self.assertEqual((first["cached"], again["cached"]), (False, True))
+        self.assertEqual((again["query"], again["plan"]["query"]), ("Send an email", "Send an email"))
+
+
+class TestAsyncToolSelectorClient(unittest.TestCase):
+    def setUp(self):
+        with patch.object(client, "Indexer", FakeIndexer):
+            self.agent = client.AsyncToolSelectorClient(index_path="idx", metadata_path="meta")
+        stages = SlowLLMStages(delay=0.05)
+        self.agent.context_segments = self.agent.reranker = self.agent.planner = stages
+
+    def tearDown(self):
+        self.agent.close()
+
+    def test_plan_query_runs_search_off_the_event_loop(self):
+        result = asyncio.run(self.agent.plan_query("book a flight and rent a car", count=2))
+        self.assertEqual([s["tool_id"] for s in result["plan"]["steps"]], ["book a flight-tool", "rent a car-tool"])
+        self.assertEqual([c["segments"] for c in result["candidates"]], [[0], [1]])
+        self.assertTrue(all(name.startswith("search") for name in self.agent.indexer.search_threads))
+
+    def test_concurrent_requests_overlap_llm_waits(self):
+        async def run_many(n):
+            return await asyncio.gather(*(self.agent.plan_query(f"query {i}") for i in range(n)))
+
+        start = time.perf_counter()
+        results = asyncio.run(run_many(8))
+        elapsed = time.perf_counter() - start
+        self.assertEqual(len(results), 8)
+        # Three 50 ms stages per request; serialized, eight requests would take over a second.
+        self.assertLess(elapsed, 0.6)
+
+    def test_timing_variant_reports_stages(self):
+        result = asyncio.run(self.agent.plan_query_with_timing("send an email"))
+        self.assertGreaterEqual(result["timings_ms"]["segment_in_llm_ms"], 40)
+        self.assertGreaterEqual(result["timings_ms"]["total_ms"], result["timings_ms"]["plan_in_llm_ms"])
+
+
+class FlakyLLMStages:
+    # LLM-flavoured stages (they carry llm_stage) that are slow or fail on demand.
+    llm_stage = "fake"
+
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self.timeouts = []
+
+    def has_client(self, is_async=False):
+        return True
+
+    def _call(self, timeout=None):
+        self.calls += 1
+        self.timeouts.append(timeout)
+        if self.fail:
+            raise RuntimeError("LLM client not configured")
+        if timeout is not None and self.delay > timeout:
+            raise TimeoutError("slice exceeded")
+
+    def segment(self, query, timeout=None):
+        self._call(timeout)
+        return ["llm segment"]
+
+    def rerank(self, query, candidates, top_n=5, timeout=None):
+        self._call(timeout)
+        return RerankResult(candidates=candidates[::-1][:top_n], notes="llm_rerank")
+
+    def plan(self, query, candidates, max_candidates=5, timeout=None):
+        self._call(timeout)
+        return {"strategy": "llm_planner", "steps": []}
+
+    async def aplan(self, query, candidates, max_candidates=5):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return {"strategy": "llm_planner", "steps": []}
+
+
+class TimingOutResponses:
+    def create(self, **kwargs):
+        raise TimeoutError(f"no answer within {kwargs.get('timeout')}s")
+
+
+class TimingOutLLMClient:
+    responses = TimingOutResponses()
+
+
+class TimingOutAsyncResponses:
+    async def create(self, **kwargs):
+        raise asyncio.TimeoutError("transport timeout")
+
+
+class TimingOutAsyncLLMClient:
+    responses = TimingOutAsyncResponses()
+
+
+class TestDeadlineDegradation(unittest.TestCase):
+    def make_agent(self, cls=client.ToolSelectorClient):
+        with patch.object(client, "Indexer", EmbeddingIndexer):
+            agent = cls(index_path="idx", metadata_path="meta")
+        agent.context_segments, agent.reranker, agent.planner = DeterministicSegmenter(), Reranker(), Planner()
+        agent.speculative = False
+        agent.logger.disabled = True
+        self.addCleanup(agent.close)
+        return agent
+
+    def test_stages_get_a_slice_of_the_remaining_deadline(self):
+        agent = self.make_agent()
+        agent.reranker = FlakyLLMStages()
+        result = agent.plan_query("book a flight", deadline_ms=1000)
+        self.assertEqual(result["degraded"], {})
+        self.assertLessEqual(agent.reranker.timeouts[0], 0.5)
+        self.assertEqual(result["plan"]["strategy"], "deterministic_topk")
+
+    def test_slow_or_failing_llm_stages_fall_back(self):
+        agent = self.make_agent()
+        agent.reranker = FlakyLLMStages(delay=5.0)
+        agent.planner = FlakyLLMStages(fail=True)
+        result = agent.plan_query("book a flight", count=2, deadline_ms=1000)
+        self.assertEqual(result["degraded"], {"rerank": "timeout", "planner": "error"})
+        self.assertEqual(result["plan"]["strategy"], "deterministic_topk")
+        self.assertEqual(agent.degradation()["degraded"], {"rerank": {"timeout": 1}, "planner": {"error": 1}})
+
+    def test_llm_stages_without_a_client_are_not_degraded(self):
+        for cls in (client.ToolSelectorClient, client.AsyncToolSelectorClient):
+            agent = self.make_agent(cls)
+            with patch.dict("os.environ", {"OPENAI_API_KEY": ""}):
+                agent.context_segments, agent.reranker, agent.planner = (
+                    LLMBasedSegmenter(), OpenAILLMReranker(), LLMPlanner())
+                results = []
+                for _ in range(6):
+                    result = agent.plan_query("book a flight", deadline_ms=1000)
+                    results.append(asyncio.run(result) if asyncio.iscoroutine(result) else result)
+            self.assertEqual([r["degraded"] for r in results], [{}] * 6, cls.__name__)
+            self.assertEqual(results[0]["plan"]["strategy"], "deterministic_topk")
+            self.assertEqual(agent.degradation()["degraded"], {})
+            breakers = agent.degradation()["breakers"]
+            self.assertEqual({b["consecutive_failures"] for b in breakers.values()}, {0}, cls.__name__)
+
+    def test_reranker_timeout_is_reported_as_a_timeout(self):
+        agent = self.make_agent()
+        with patch.dict("os.environ", {"OPENAI_API_KEY": ""}):
+            agent.reranker = OpenAILLMReranker()
+        agent.reranker._client = TimingOutLLMClient()
+        result = agent.plan_query("book a flight", deadline_ms=1000)
+        self.assertEqual(result["degraded"], {"rerank": "timeout"})
+        # Called directly, without a deadline, the reranker still answers with the retrieval order.
+        fallback = agent.reranker.rerank("book a flight", [{"tool_id": "a"}])
+        self.assertTrue(fallback.notes.startswith("rerank_fallback:timeout:"))
+
+    def test_async_reranker_timeout_is_reported_as_a_timeout(self):
+        agent = self.make_agent(client.AsyncToolSelectorClient)
+        with patch.dict("os.environ", {"OPENAI_API_KEY": ""}):
+            agent.reranker = OpenAILLMReranker()
+        agent.reranker._async_client = TimingOutAsyncLLMClient()
+        result = asyncio.run(agent.plan_query("book a flight", deadline_ms=1000))
+        self.assertEqual(result["degraded"], {"rerank": "timeout"})
+        self.assertEqual(agent.degradation()["degraded"], {"rerank": {"timeout": 1}})
+
+    def test_exhausted_deadline_skips_the_llm_call(self):
+        agent = self.make_agent()
+        agent.context_segments = FlakyLLMStages()
+        degraded = {}
+        candidates, _ = agent.retrieve("book a flight and rent a car", client.Deadline(0.001), degraded)
+        self.assertEqual(degraded, {"segmenter": "deadline"})
+        self.assertEqual(agent.context_segments.calls, 0)
+        self.assertEqual(len(candidates), 2)
+
+    def test_open_breaker_short_circuits_and_degraded_plans_are_not_cached(self):
+        agent = self.make_agent()
+        agent.plan_cache = SemanticPlanCache(max_size=8, threshold=0.9999, ttl_s=0)
+        agent.planner = FlakyLLMStages(fail=True)
+        agent.breakers["planner"] = client.CircuitBreaker(failure_threshold=2, reset_s=60)
+        reasons = [agent.plan_query("book a flight")["degraded"]["planner"] for _ in range(3)]
+        self.assertEqual(reasons, ["error", "error", "circuit_open"])
+        self.assertEqual(agent.planner.calls, 2)
+        self.assertEqual(agent.degradation()["breakers"]["planner"]["state"], "open")
+        self.assertEqual(agent.plan_cache.stats()["size"], 0)
+
+    def test_async_client_cancels_a_stage_at_its_slice(self):
+        agent = self.make_agent(client.AsyncToolSelectorClient)
+        agent.planner = FlakyLLMStages(delay=5.0)
+        start = time.perf_counter()
+        result = asyncio.run(agent.plan_query("book a flight", deadline_ms=300))
+        self.assertLess(time.perf_counter() - start, 1.0)
+        self.assertEqual(result["degraded"], {"planner": "timeout"})
+        self.assertEqual(result["plan"]["strategy"], "deterministic_topk")
+
+
+if __name__ == "__main__":
+    unittest.main()
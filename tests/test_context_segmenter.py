@@ -52,7 +52,7 @@ class TestDeterministicSegmenter(unittest.TestCase):
 class TestLLMBasedSegmenter(unittest.TestCase):
     def test_segment_raises_without_client(self):
         seg = LLMBasedSegmenter()
-        seg.client = None
+        seg._client = None
 
         with self.assertRaises(RuntimeError):
             seg.segment("anything")
@@ -61,7 +61,7 @@ class TestLLMBasedSegmenter(unittest.TestCase):
         response = FakeResponse(output_json={"segments": ["a", "b"]})
         client = FakeClient(response)
         seg = LLMBasedSegmenter()
-        seg.client = client
+        seg._client = client
 
         segments = seg.segment("do things")
         self.assertEqual(segments, ["a", "b"])
@@ -71,7 +71,7 @@ class TestLLMBasedSegmenter(unittest.TestCase):
         response = FakeResponse(output_json=ValueError("no json"), output_text='{"segments": ["x"]}')
         client = FakeClient(response)
         seg = LLMBasedSegmenter()
-        seg.client = client
+        seg._client = client
 
         segments = seg.segment("another task")
         self.assertEqual(segments, ["x"])
@@ -0,0 +1,46 @@
+import time
+import unittest
+
+from src.deadline import CircuitBreaker, Deadline
+
+
+class TestDeadline(unittest.TestCase):
+    def test_no_budget_means_no_deadline(self):
+        self.assertIsNone(Deadline(0).remaining_s())
+        self.assertIsNone(Deadline(0).slice_s(0.5))
+
+    def test_slice_is_a_share_of_what_is_left(self):
+        deadline = Deadline(1000)
+        self.assertLessEqual(deadline.slice_s(0.25), 0.25)
+        self.assertGreater(deadline.slice_s(0.25), 0.2)
+        deadline.expires_at = time.monotonic() - 1
+        self.assertEqual(deadline.remaining_s(), 0.0)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_opens_after_consecutive_failures_and_recovers_after_a_trial(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_s=60)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.stats(), {"state": "open", "consecutive_failures": 2, "opens": 1})
+
+        # Cool-down over: exactly one trial call is let through.
+        breaker.opened_at -= 60
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+
+        breaker.opened_at -= 60
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.stats()["state"], "closed")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import importlib
+import sys
+import unittest
+
+import numpy as np
+
+
+class FakeModel:
+    def encode(self, texts, batch_size=32):
+        return np.array([[float(len(t)), 1.0] for t in texts], dtype=np.float32)
+
+    def get_sentence_embedding_dimension(self):
+        return 2
+
+
+class TestModelRegistry(unittest.TestCase):
+    def setUp(self):
+        # Other tests replace src.embedder with a stub module; load the real one.
+        sys.modules.pop("src.embedder", None)
+        self.embedder_module = importlib.import_module("src.embedder")
+        self.loads = []
+
+        def fake_load(model_name, backend):
+            self.loads.append((model_name, backend))
+            return FakeModel()
+
+        self.embedder_module._load_model = fake_load
+        self.embedder_module._MODELS.clear()
+
+    def tearDown(self):
+        self.embedder_module._MODELS.clear()
+        sys.modules.pop("src.embedder", None)
+
+    def test_model_loads_lazily_once_per_path_and_backend(self):
+        Embedder = self.embedder_module.Embedder
+        first = Embedder("mini", backend="torch")
+        second = Embedder("mini", backend="torch")
+        self.assertEqual(self.loads, [])
+
+        self.assertEqual(first.embed("abc").tolist(), [3.0, 1.0])
+        self.assertEqual(second.embed_batch(["a", "abcd"]).tolist(), [[1.0, 1.0], [4.0, 1.0]])
+        self.assertIs(first.model, second.model)
+        self.assertEqual(self.loads, [("mini", "torch")])
+
+        other = Embedder("mini", backend="onnx")
+        self.assertEqual(other.model_name, "mini#onnx")
+        other.embed("x")
+        self.assertEqual(self.loads, [("mini", "torch"), ("mini", "onnx")])
+        self.assertEqual(sorted(self.embedder_module.loaded_models()), [("mini", "onnx"), ("mini", "torch")])
+
+    def test_unknown_backend_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.embedder_module.Embedder("mini", backend="tensorrt")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from src.embedding_cache import CorpusEmbeddingCache, EmbeddingCache
+
+
+class CountingEncoder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[float(len(t)), 1.0] for t in texts], dtype=np.float32)
+
+
+class TestEmbeddingCache(unittest.TestCase):
+    def test_hits_skip_encoder_and_normalize_whitespace(self):
+        cache = EmbeddingCache(max_size=8, path="")
+        encode = CountingEncoder()
+
+        first = cache.get_many(["book a flight", "rent  a car ", "book a flight"], "m", encode)
+        second = cache.get_many([" book   a flight"], "m", encode)
+
+        self.assertEqual(encode.calls, [["book a flight", "rent  a car "]])
+        np.testing.assert_allclose(second[0], first[0])
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 2))
+
+    def test_model_name_is_part_of_the_key(self):
+        cache = EmbeddingCache(max_size=8, path="")
+        encode = CountingEncoder()
+        cache.get_many(["q"], "model-a", encode)
+        cache.get_many(["q"], "model-b", encode)
+        self.assertEqual(len(encode.calls), 2)
+
+    def test_lru_evicts_least_recently_used(self):
+        cache = EmbeddingCache(max_size=2, path="")
+        encode = CountingEncoder()
+        cache.get_many(["a", "b"], "m", encode)
+        cache.get_many(["a"], "m", encode)
+        cache.get_many(["c"], "m", encode)
+        cache.get_many(["a", "b"], "m", encode)
+
+        self.assertEqual(encode.calls[-1], ["b"])
+        self.assertEqual(cache.stats()["evictions"], 2)
+
+    def test_disk_tier_survives_restart(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = str(Path(tmpdir) / "cache.sqlite")
+            encode = CountingEncoder()
+            cache = EmbeddingCache(max_size=4, path=path)
+            expected = cache.get_many(["persist me"], "m", encode)
+            cache.close()
+
+            restarted = EmbeddingCache(max_size=4, path=path)
+            got = restarted.get_many(["persist me"], "m", encode)
+            restarted.close()
+
+        self.assertEqual(len(encode.calls), 1)
+        np.testing.assert_allclose(got, expected)
+        self.assertEqual(restarted.stats()["disk_hits"], 1)
+
+    def test_corpus_cache_opens_its_file_on_first_use(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "corpus.sqlite"
+            cache = CorpusEmbeddingCache(str(path))
+            self.assertIsNone(cache._db)
+            self.assertFalse(path.exists())
+
+            cache.get_many(["tool a"], "m", CountingEncoder())
+            self.assertIsNotNone(cache._db)
+            self.assertTrue(path.exists())
+            cache.close()
+
+    def test_corpus_cache_keys_on_exact_text_and_model(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = str(Path(tmpdir) / "corpus.sqlite")
+            encode = CountingEncoder()
+            cache = CorpusEmbeddingCache(path)
+            cache.get_many(["tool a", "tool b"], "m", encode)
+            cache.close()
+
+            rebuilt = CorpusEmbeddingCache(path)
+            rebuilt.get_many(["tool a", "tool  b", "tool b"], "m", encode)
+            rebuilt.get_many(["tool a"], "other-model", encode)
+            rebuilt.close()
+
+        self.assertEqual(encode.calls[1:], [["tool  b"], ["tool a"]])
+        self.assertEqual(rebuilt.stats()["disk_hits"], 2)
+        self.assertEqual(rebuilt.stats()["size"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+
+import numpy as np
+
+from src import index_types
+
+
+def _unit_vectors(n, dim, seed=0):
+    rng = np.random.default_rng(seed)
+    vecs = rng.normal(size=(n, dim)).astype("float32")
+    return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+
+class TestIndexTypes(unittest.TestCase):
+    def test_resolve_rejects_unknown_type(self):
+        with self.assertRaises(ValueError):
+            index_types.resolve_index_config("annoy")
+
+    def test_each_type_finds_exact_self_match(self):
+        vectors = _unit_vectors(300, 32)
+        for name in index_types.INDEX_TYPES:
+            index_type, params = index_types.resolve_index_config(name, {"nlist": 8, "nprobe": 8, "pq_m": 8})
+            index = index_types.build_populated_index(index_type, vectors, params)
+            _, ids = index.search(vectors[:5], 1)
+            self.assertEqual(ids[:, 0].tolist(), [0, 1, 2, 3, 4], name)
+
+    def test_ivf_params_shrink_for_small_catalogs(self):
+        vectors = _unit_vectors(40, 16)
+        index_type, params = index_types.resolve_index_config("ivf_pq", {"nlist": 256, "pq_m": 4, "pq_nbits": 8})
+        index = index_types.build_populated_index(index_type, vectors, params)
+        effective = index_types.effective_index_params(index, index_type, params)
+        self.assertEqual(effective["nlist"], 40)
+        self.assertLessEqual(2 ** effective["pq_nbits"], 40)
+
+    def test_pca_and_scalar_quant_shrink_index_and_transform_queries(self):
+        vectors = _unit_vectors(500, 64)
+        _, flat_params = index_types.resolve_index_config("flat")
+        _, small_params = index_types.resolve_index_config("flat", {"pca_dim": 32, "scalar_quant": "sq8"})
+        flat = index_types.build_populated_index("flat", vectors, flat_params)
+        small = index_types.build_populated_index("flat", vectors, small_params, ids=np.arange(500) + 10)
+
+        self.assertLess(index_types.index_nbytes(small), index_types.index_nbytes(flat) / 2)
+        # Raw 64-d queries go in; the index applies the PCA chain itself.
+        _, ids = small.search(vectors[:5], 1)
+        self.assertEqual(ids[:, 0].tolist(), [10, 11, 12, 13, 14])
+        self.assertTrue(index_types.is_lossy(small_params))
+        self.assertFalse(index_types.is_lossy(flat_params))
+
+    def test_rejects_invalid_compression_settings(self):
+        with self.assertRaises(ValueError):
+            index_types.resolve_index_config("ivf_pq", {"scalar_quant": "sq8"})
+        with self.assertRaises(ValueError):
+            index_types.resolve_index_config("flat", {"scalar_quant": "int3"})
+        _, params = index_types.resolve_index_config("flat", {"pca_dim": 64})
+        with self.assertRaises(ValueError):
+            index_types.create_index("flat", 64, params)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,11 +1,14 @@
 import importlib
 import json
+import pickle
 import sys
 import tempfile
+import threading
 import types
 import unittest
 from pathlib import Path
 
+import faiss as real_faiss
 import numpy as np
 
 
@@ -16,46 +19,89 @@ class DummyEmbedder:
     def embed(self, text):
         return np.array(self.vectors.get(text, [1.0, 0.0]), dtype=np.float32)
 
+    def embed_batch(self, texts, batch_size=32, num_workers=1):
+        self.batch_calls = getattr(self, "batch_calls", 0) + 1
+        return np.stack([self.embed(t) for t in texts])
+
+
+class RecordingEmbedder:
+    model_name = "recording"
+
+    def __init__(self):
+        self.encoded = []
+        self.workers = []
+
+    def embed_batch(self, texts, batch_size=32, num_workers=1):
+        self.encoded.extend(texts)
+        self.workers.append(num_workers)
+        return np.array([[float(len(t)), 1.0] for t in texts], dtype=np.float32)
+
 
 class DummyIndex:
+    is_trained = True
+
     def __init__(self, dim):
         self.dim = dim
         self.vectors = []
+        self.ids = []
+
+    @property
+    def ntotal(self):
+        return len(self.vectors)
 
     def add(self, vecs):
+        self.add_with_ids(vecs, range(len(self.ids), len(self.ids) + len(vecs)))
+
+    def add_with_ids(self, vecs, ids):
         self.vectors.extend(list(vecs))
+        self.ids.extend(int(i) for i in ids)
 
-    def search(self, qvec, k):
-        scores = []
-        ids = []
-        q = qvec[0]
-        for i, v in enumerate(self.vectors):
-            scores.append(float(np.dot(q, v)))
-            ids.append(i)
-        order = np.argsort(scores)[::-1][:k]
-        return np.array([[scores[i] for i in order]], dtype=np.float32), np.array([[ids[i] for i in order]], dtype=np.int64)
+    def remove_ids(self, ids):
+        drop = {int(i) for i in ids}
+        keep = [n for n, i in enumerate(self.ids) if i not in drop]
+        removed = len(self.ids) - len(keep)
+        self.vectors = [self.vectors[n] for n in keep]
+        self.ids = [self.ids[n] for n in keep]
+        return removed
 
+    def reconstruct(self, fid):
+        return self.vectors[self.ids.index(int(fid))]
 
-_INDEX_STORE = {}
+    def search(self, qvecs, k):
+        all_scores = np.full((len(qvecs), k), -np.inf, dtype=np.float32)
+        all_ids = np.full((len(qvecs), k), -1, dtype=np.int64)
+        for row, q in enumerate(qvecs):
+            scores = [float(np.dot(q, v)) for v in self.vectors]
+            order = np.argsort(scores)[::-1][:k]
+            all_scores[row, :len(order)] = [scores[i] for i in order]
+            all_ids[row, :len(order)] = [self.ids[i] for i in order]
+        return all_scores, all_ids
 
 
-def install_stubs(dummy_vectors):
+class NoRemoveIndex(DummyIndex):
+    def remove_ids(self, ids):
+        raise RuntimeError("remove_ids not implemented for this type of index")
+
+
+def install_stubs(dummy_vectors, index_cls=DummyIndex):
     sys.modules.pop("src.embedder", None)
+    sys.modules.pop("src.index_types", None)
     sys.modules.pop("faiss", None)
     embedder_mod = types.ModuleType("src.embedder")
     embedder_mod.Embedder = lambda: DummyEmbedder(dummy_vectors)
     sys.modules["src.embedder"] = embedder_mod
 
     faiss_mod = types.ModuleType("faiss")
-    faiss_mod.IndexFlatIP = DummyIndex
+    faiss_mod.IndexFlatIP = index_cls
+    faiss_mod.IndexIDMap2 = lambda index: index
 
     def write_index(idx, path):
-        _INDEX_STORE[path] = idx
-        Path(path).touch()
-        return None
+        with open(path, "wb") as f:
+            pickle.dump(idx, f)
 
     def read_index(path):
-        return _INDEX_STORE.get(path, DummyIndex(0))
+        with open(path, "rb") as f:
+            return pickle.load(f)
 
     faiss_mod.write_index = write_index
     faiss_mod.read_index = read_index
@@ -81,8 +127,8 @@ class TestIndexer(unittest.TestCase):
             idx = Indexer(index_path=index_path, metadata_path=meta_path)
             idx.embedder = DummyEmbedder(dummy_vectors)
 
-            idx.add("a", "tool_a", {"name": "A"}, 0)
-            idx.add("b", "tool_b", {"name": "B"}, 1)
+            idx.add("a", "tool_a", {"name": "A"})
+            idx.add("b", "tool_b", {"name": "B"})
             idx.build_index()
 
             idx.load()
@@ -91,6 +137,449 @@ class TestIndexer(unittest.TestCase):
             self.assertEqual(results[0]["tool_id"], "a")
             self.assertGreaterEqual(results[0]["score"], results[-1]["score"])
 
+    def test_build_batched_matches_per_item(self):
+        install_stubs({})
+        sys.modules.pop("src.indexer", None)
+        indexer_module = importlib.import_module("src.indexer")
+        Indexer = indexer_module.Indexer
+        apis = {
+            "a": {"name": "A", "api_name": "a.do", "description": "first", "parameters": {}},
+            "b": {"name": "B", "api_name": "b.do", "description": "second", "parameters": {}},
+        }
+        texts = {indexer_module.generate_function_as_text(apis["a"]): [1.0, 0.0],
+                 indexer_module.generate_function_as_text(apis["b"]): [0.0, 1.0]}
+        indexer_module.tqdm = lambda it: it
+        with tempfile.TemporaryDirectory() as tmpdir:
+            batched = Indexer(index_path=f"{tmpdir}/b.index", metadata_path=f"{tmpdir}/b.json")
+            batched.embedder = DummyEmbedder(texts)
+            batched.build(apis, batch_size=64)
+
+            per_item = Indexer(index_path=f"{tmpdir}/p.index", metadata_path=f"{tmpdir}/p.json")
+            per_item.embedder = DummyEmbedder(texts)
+            per_item.build(apis, batch_size=1)
+
+        self.assertEqual(batched.embedder.batch_calls, 1)
+        self.assertEqual(batched.metadata, per_item.metadata)
+        np.testing.assert_allclose(np.stack(batched.vectors), np.stack(per_item.vectors))
+
+    def test_build_loads_the_model_before_timing_embedding(self):
+        install_stubs({})
+        sys.modules.pop("src.indexer", None)
+        indexer_module = importlib.import_module("src.indexer")
+        events = []
+
+        class LazyModelEmbedder(RecordingEmbedder):
+            @property
+            def model(self):
+                events.append("load")
+
+            def embed_batch(self, texts, batch_size=32, num_workers=1):
+                events.append("embed")
+                return super().embed_batch(texts, batch_size, num_workers)
+
+        apis = {"a": {"name": "A", "api_name": "a.do", "description": "first", "parameters": {}}}
+        with tempfile.TemporaryDirectory() as tmpdir:
+            idx = indexer_module.Indexer(index_path=f"{tmpdir}/i.index", metadata_path=f"{tmpdir}/m.json")
+            idx.embedder = LazyModelEmbedder()
+            idx.build(apis, batch_size=64)
+
+        self.assertEqual(events, ["load", "embed"])
+
+    def test_rebuild_only_embeds_changed_tools(self):
+        install_stubs({})
+        sys.modules.pop("src.indexer", None)
+        indexer_module = importlib.import_module("src.indexer")
+        Indexer = indexer_module.Indexer
+        apis = {
+            "a": {"name": "A", "api_name": "a.do", "description": "first", "parameters": {}},
+            "b": {"name": "B", "api_name": "b.do", "description": "second", "parameters": {}},
+        }
+        with tempfile.TemporaryDirectory() as tmpdir:
+            first = Indexer(index_path=f"{tmpdir}/t.index", metadata_path=f"{tmpdir}/t.json")
+            first.embedder = RecordingEmbedder()
+            first.build(apis, batch_size=64)
+
+            changed = {**apis, "b": {**apis["b"], "description": "second, revised"},
+                       "c": {"name": "C", "api_name": "c.do", "description": "third", "parameters": {}}}
+            second = Indexer(index_path=f"{tmpdir}/t.index", metadata_path=f"{tmpdir}/t.json")
+            second.embedder = RecordingEmbedder()
+            second.build(changed, batch_size=64)
+
+        self.assertEqual(len(first.embedder.encoded), 2)
+        self.assertEqual(second.embedder.encoded, [indexer_module.generate_function_as_text(changed["b"]),
+                                                   indexer_module.generate_function_as_text(changed["c"])])
+        np.testing.assert_allclose(second.vectors[0], first.vectors[0])
+        self.assertEqual([m["tool_id"] for m in second.metadata], ["a", "b", "c"])
+
+    def test_per_item_build_does_not_start_worker_pools(self):
+        install_stubs({})
+        sys.modules.pop("src.indexer", None)
+        Indexer = importlib.import_module("src.indexer").Indexer
+        apis = {t: {"name": t, "api_name": f"{t}.do", "description": "", "parameters": {}} for t in "abc"}
+        with tempfile.TemporaryDirectory() as tmpdir:
+            idx = Indexer(index_path=f"{tmpdir}/t.index", metadata_path=f"{tmpdir}/t.json")
+            idx.embedder = RecordingEmbedder()
+            idx.build(apis, batch_size=1, num_workers=4)
+        self.assertEqual(idx.embedder.workers, [1, 1, 1])
+
+    def test_binary_metadata_store_round_trip(self):
+        dummy_vectors = {"tool_a": [1.0, 0.0], "tool_b": [0.0, 1.0], "query": [0.0, 1.0]}
+        install_stubs(dummy_vectors)
+        sys.modules.pop("src.indexer", None)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            indexer_module = importlib.import_module("src.indexer")
+            indexer_module.APPLY_STD = False
+            Indexer = indexer_module.Indexer
+
+            idx = Indexer(index_path=f"{tmpdir}/faiss.index", metadata_path=f"{tmpdir}/metadata.bin")
+            idx.embedder = DummyEmbedder(dummy_vectors)
+            idx.add("a", "tool_a", {"name": "A"})
+            idx.add("b", "tool_b", {"name": "B"})
+            idx.build_index()
+
+            idx.load()
+            idx.embedder = DummyEmbedder(dummy_vectors)
+            results = idx.search("query")
+            self.assertEqual(len(idx.metadata), 2)
+            self.assertEqual(results[0]["tool_id"], "b")
+            self.assertNotIn("text", results[0])
+            self.assertEqual(results[0]["prompt_fragment"], "id:b name:B api:None desc: req:[]")
+            self.assertGreater(results[0]["prompt_tokens"], 0)
+            idx.metadata.close()
+
+    def _incremental_fixture(self, tmpdir, index_cls=DummyIndex):
+        apis = {
+            "a": {"name": "A", "api_name": "a.do", "description": "first", "parameters": {}},
+            "b": {"name": "B", "api_name": "b.do", "description": "second", "parameters": {}},
+            "c": {"name": "C", "api_name": "c.do", "description": "third", "parameters": {}},
+        }
+        install_stubs({}, index_cls=index_cls)
+        sys.modules.pop("src.indexer", None)
+        indexer_module = importlib.import_module("src.indexer")
+        indexer_module.APPLY_STD = False
+        indexer_module.WAL_COMPACT_THRESHOLD = 0
+        text = indexer_module.generate_function_as_text
+        vectors = {
+            text(apis["a"]): [1.0, 0.0],
+            text(apis["b"]): [0.0, 1.0],
+            text(apis["c"]): [0.7, 0.7],
+            "query": [0.6, 0.8],
+        }
+
+        def make():
+            idx = indexer_module.Indexer(index_path=f"{tmpdir}/faiss.index", metadata_path=f"{tmpdir}/metadata.bin")
+            idx.embedder = DummyEmbedder(vectors)
+            return idx
+
+        built = make()
+        built.build({"a": apis["a"], "b": apis["b"]}, batch_size=64)
+        return indexer_module, apis, make
+
+    def test_upsert_and_delete_survive_reload_via_wal(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            indexer_module, apis, make = self._incremental_fixture(tmpdir)
+            idx = make()
+            idx.load()
+
+            self.assertEqual(idx.upsert({"c": apis["c"], "a": apis["a"]}), 1)
+            # An upserted tool has the same fields as a built one, and no positional id.
+            built, upserted = (idx.record(indexer_module.tool_int_id(t)) for t in ("a", "c"))
+            self.assertEqual(set(upserted), set(built))
+            self.assertNotIn("id", built)
+            self.assertEqual(idx.delete(["b", "missing"]), 1)
+            self.assertEqual([r["tool_id"] for r in idx.search("query")], ["c", "a"])
+            self.assertTrue(Path(f"{tmpdir}/faiss.wal").exists())
+
+            reloaded = make()
+            reloaded.load()
+            self.assertEqual(reloaded.size, 2)
+            self.assertEqual([r["tool_id"] for r in reloaded.search("query")], ["c", "a"])
+
+            reloaded.compact()
+            self.assertFalse(Path(f"{tmpdir}/faiss.wal").exists())
+            compacted = make()
+            compacted.load()
+            self.assertEqual(len(compacted.metadata), 2)
+            self.assertEqual([r["tool_id"] for r in compacted.search("query")], ["c", "a"])
+            compacted.metadata.close()
+            reloaded.metadata.close()
+            idx.metadata.close()
+
+    def test_legacy_json_metadata_is_converted_on_load(self):
+        dummy_vectors = {"tool_a": [1.0, 0.0], "tool_b": [0.0, 1.0], "query": [0.0, 1.0]}
+        install_stubs(dummy_vectors)
+        sys.modules.pop("src.indexer", None)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            indexer_module = importlib.import_module("src.indexer")
+            indexer_module.APPLY_STD = False
+            Indexer = indexer_module.Indexer
+
+            old = Indexer(index_path=f"{tmpdir}/faiss.index", metadata_path=f"{tmpdir}/metadata.json")
+            old.embedder = DummyEmbedder(dummy_vectors)
+            old.add("a", "tool_a", {"name": "A"})
+            old.add("b", "tool_b", {"name": "B"})
+            old.build_index()
+            # A manifest from before snapshot validation: no per-file entries.
+            manifest_path = Path(f"{tmpdir}/faiss.manifest.json")
+            manifest = json.loads(manifest_path.read_text())
+            del manifest["files"], manifest["format_version"]
+            manifest_path.write_text(json.dumps(manifest))
+
+            idx = Indexer(index_path=f"{tmpdir}/faiss.index", metadata_path=f"{tmpdir}/metadata.bin")
+            idx.embedder = DummyEmbedder(dummy_vectors)
+            idx.load()
+            self.assertTrue(Path(f"{tmpdir}/metadata.bin").exists())
+            self.assertEqual(idx.search("query")[0]["tool_id"], "b")
+            idx.metadata.close()
+
+            Path(f"{tmpdir}/metadata.json").unlink()
+            Path(f"{tmpdir}/metadata.bin").unlink()
+            with self.assertRaisesRegex(FileNotFoundError, "rebuild the index"):
+                Indexer(index_path=f"{tmpdir}/faiss.index", metadata_path=f"{tmpdir}/metadata.bin").load()
+
+    def test_torn_wal_line_is_truncated_before_the_next_append(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            indexer_module, apis, make = self._incremental_fixture(tmpdir)
+            idx = make()
+            idx.load()
+            idx.upsert({"c": apis["c"]})
+            wal = Path(f"{tmpdir}/faiss.wal")
+            with open(wal, "a") as f:
+                f.write('{"op": "delete", "tool_ids": ["a"')  # crash mid-append
+
+            restarted = make()
+            restarted.load()
+            self.assertEqual(restarted.size, 3)
+            self.assertTrue(wal.read_bytes().endswith(b"\n"))
+            restarted.delete(["b"])
+
+            again = make()
+            again.load()
+            self.assertEqual(again.size, 2)
+            self.assertEqual(sorted(r["tool_id"] for r in again.search("query")), ["a", "c"])
+            for i in (idx, restarted, again):
+                i.metadata.close()
+
+    def test_replay_after_interrupted_compaction_does_not_duplicate_vectors(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            indexer_module, apis, make = self._incremental_fixture(tmpdir)
+            idx = make()
+            idx.load()
+            idx.upsert({"c": apis["c"]})
+            wal = Path(f"{tmpdir}/faiss.wal").read_bytes()
+            idx.compact()
+            # Crash after the index was written, before the log was removed.
+            Path(f"{tmpdir}/faiss.wal").write_bytes(wal)
+
+            restarted = make()
+            restarted.load()
+            self.assertEqual(restarted.size, 3)
+            self.assertEqual(len(restarted.index.ids), 3)
+            for i in (idx, restarted):
+                i.metadata.close()
+
+    def test_searches_run_alongside_upserts_and_compaction(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            indexer_module, apis, make = self._incremental_fixture(tmpdir)
+            indexer_module.WAL_COMPACT_THRESHOLD = 3
+            idx = make()
+            idx.load()
+            extra = {f"t{i}": {"name": f"T{i}", "api_name": f"t{i}.run", "description": f"tool {i}", "parameters": {}}
+                     for i in range(40)}
+            errors, stop = [], threading.Event()
+
+            def search_loop():
+                while not stop.is_set():
+                    try:
+                        for hits in idx.search_many(["query", "tool"]):
+                            self.assertTrue(all(hit["tool_id"] for hit in hits))
+                    except Exception as e:
+                        errors.append(e)
+                        return
+
+            threads = [threading.Thread(target=search_loop) for _ in range(3)]
+            for t in threads:
+                t.start()
+            try:
+                for tool_id, api in extra.items():
+                    idx.upsert({tool_id: api})
+            finally:
+                stop.set()
+                for t in threads:
+                    t.join()
+            self.assertEqual(errors, [])
+            self.assertEqual(idx.size, 42)
+            idx.metadata.close()
+
+    def test_ivf_index_built_empty_sizes_its_lists_on_first_upsert(self):
+        install_stubs({})
+        # Re-importing faiss would wrap its SWIG classes twice; put the module imported above back instead.
+        sys.modules["faiss"] = real_faiss
+        for name in ("src.index_types", "src.indexer"):
+            sys.modules.pop(name, None)
+        indexer_module = importlib.import_module("src.indexer")
+
+        rng = np.random.default_rng(0)
+        apis = {f"t{i}": {"name": f"T{i}", "api_name": f"t{i}.run", "description": f"tool {i}", "parameters": {}}
+                for i in range(5)}
+        vectors = {indexer_module.generate_function_as_text(api): rng.normal(size=8).tolist() for api in apis.values()}
+        with tempfile.TemporaryDirectory() as tmpdir:
+            def make():
+                return indexer_module.Indexer(index_path=f"{tmpdir}/faiss.index", metadata_path=f"{tmpdir}/metadata.bin",
+                                              dim=8, index_type="ivf_flat", index_params={"nlist": 256},
+                                              embedder=DummyEmbedder(vectors))
+
+            make().build({})
+            idx = make()
+            idx.load()
+            idx.upsert(apis)
+            self.assertEqual(real_faiss.extract_index_ivf(idx.index).nlist, 5)
+            idx.compact()
+            manifest = json.loads(Path(f"{tmpdir}/faiss.manifest.json").read_text())
+            self.assertEqual(manifest["index_params"]["nlist"], 5)
+            idx.metadata.close()
+
+    def test_delete_tombstones_when_index_cannot_remove(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            indexer_module, apis, make = self._incremental_fixture(tmpdir, index_cls=NoRemoveIndex)
+            idx = make()
+            idx.load()
+
+            idx.delete(["b"])
+            self.assertEqual([r["tool_id"] for r in idx.search("query")], ["a"])
+            idx.upsert({"b": apis["b"]})
+            self.assertEqual(idx.index.ntotal, 2)
+            self.assertEqual([r["tool_id"] for r in idx.search("query")], ["b", "a"])
+
+            idx.delete(["b"])
+            idx.compact()
+            self.assertEqual(idx.index.ntotal, 1)
+            self.assertEqual([r["tool_id"] for r in idx.search("query")], ["a"])
+            idx.metadata.close()
+
+    def test_search_many_matches_single_searches(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            indexer_module, apis, make = self._incremental_fixture(tmpdir)
+            indexer_module.APPLY_STD = True
+            idx = make()
+            idx.load()
+            idx.upsert({"c": apis["c"]})
+            idx.embedder.vectors["other"] = [1.0, 0.0]
+
+            batch_calls = idx.embedder.batch_calls
+            batched = idx.search_many(["query", "other"])
+            self.assertEqual(idx.embedder.batch_calls, batch_calls + 1)
+            self.assertEqual(batched, [idx.search("query"), idx.search("other")])
+            self.assertEqual([r["tool_id"] for r in batched[1]], ["a", "c"])
+            self.assertEqual(idx.search_many([]), [])
+            idx.metadata.close()
+
+    def test_lexical_fast_path_skips_embedding(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            indexer_module, apis, make = self._incremental_fixture(tmpdir)
+            indexer_module.LEXICAL_FUSION_ENABLED = True
+            idx = make()
+            idx.load()
+            self.assertTrue(Path(f"{tmpdir}/faiss.lexical.json").exists())
+            idx.upsert({"c": apis["c"]})
+            idx.delete(["a"])
+
+            batch_calls = idx.embedder.batch_calls
+            self.assertEqual([r["tool_id"] for r in idx.search("please call c.do")], ["c"])
+            self.assertNotIn("a", [r["tool_id"] for r in idx.search("then a.do")])  # deleted: no fast path
+            self.assertEqual(idx.embedder.batch_calls, batch_calls + 1)  # only "then a.do" was embedded
+
+            idx.embedder.vectors["the second tool"] = [0.5, 0.7]  # dense alone ranks c above b
+            fused = idx.search_many(["query", "the second tool"])
+            self.assertEqual([r["tool_id"] for r in fused[0]], ["c", "b"])
+            self.assertEqual(fused[1][0]["tool_id"], "b")
+            stats = idx.search_stats.stats()
+            self.assertEqual((stats["fast_path_queries"], stats["fused_queries"], stats["dense_queries"]), (1, 1, 2))
+            self.assertGreater(stats["fusion_added_mean_ms"], 0.0)
+            idx.metadata.close()
+
+    def test_fusion_is_off_by_default(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            indexer_module, apis, make = self._incremental_fixture(tmpdir)
+            self.assertFalse(indexer_module.LEXICAL_FUSION_ENABLED)
+            idx = make()
+            idx.load()
+            idx.lexical.search = lambda query, k: self.fail("BM25 scored with fusion off")
+            self.assertEqual([r["tool_id"] for r in idx.search("please call b.do")], ["b"])  # fast path still on
+            self.assertEqual([r["tool_id"] for r in idx.search("query")], ["b", "a"])
+            stats = idx.search_stats.stats()
+            self.assertEqual((stats["fast_path_queries"], stats["fused_queries"], stats["dense_queries"]), (1, 0, 1))
+            idx.metadata.close()
+
+    def test_bare_word_api_name_is_fused_not_short_circuited(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            indexer_module, apis, make = self._incremental_fixture(tmpdir)
+            idx = make()
+            idx.load()
+            indexer_module.LEXICAL_FUSION_ENABLED = True
+            subtract = {"name": "Subtract", "api_name": "subtract", "description": "difference", "parameters": {}}
+            idx.embedder.vectors[indexer_module.generate_function_as_text(subtract)] = [0.6, -0.8]
+            idx.upsert({"d": subtract})
+
+            query = "Subtract 5 from 10 and then send the result by email"
+            idx.embedder.vectors[query] = [0.0, 1.0]
+            batch_calls = idx.embedder.batch_calls
+            hits = [r["tool_id"] for r in idx.search(query)]
+            self.assertEqual(idx.embedder.batch_calls, batch_calls + 1)
+            self.assertIn("d", hits)
+            self.assertIn("b", hits)
+            self.assertEqual(idx.search_stats.stats()["fast_path_queries"], 0)
+            idx.metadata.close()
+
+    def test_load_rejects_index_built_with_other_embed_backend(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            indexer_module, apis, make = self._incremental_fixture(tmpdir)
+            self.assertIsNone(json.loads(Path(f"{tmpdir}/faiss.manifest.json").read_text())["embedder"])
+
+            built = make()
+            built.embedder.model_name, built.embedder.backend = "mini", "torch"
+            built.build({"a": apis["a"]}, batch_size=64)
+            manifest = json.loads(Path(f"{tmpdir}/faiss.manifest.json").read_text())
+            self.assertEqual(manifest["embedder"], {"model": "mini", "backend": "torch"})
+
+            same = make()
+            same.embedder.model_name, same.embedder.backend = "mini", "torch"
+            same.load()
+            same.metadata.close()
+
+            other = make()
+            other.embedder.model_name, other.embedder.backend = "mini#onnx-int8", "onnx-int8"
+            with self.assertRaises(ValueError):
+                other.load()
+
+    def test_snapshot_manifest_is_validated_on_load(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            indexer_module, apis, make = self._incremental_fixture(tmpdir)
+            manifest = json.loads(Path(f"{tmpdir}/faiss.manifest.json").read_text())
+            self.assertEqual(manifest["format_version"], indexer_module.SNAPSHOT_FORMAT_VERSION)
+            self.assertEqual(manifest["count"], 2)
+            self.assertEqual(manifest["dataset_hash"], indexer_module.dataset_hash(
+                [indexer_module.tool_int_id("b"), indexer_module.tool_int_id("a")]))
+            self.assertEqual(sorted(manifest["files"]), ["index", "lexical", "metadata"])
+            self.assertEqual(manifest["files"]["metadata"]["sha256"],
+                             indexer_module.file_sha256(Path(f"{tmpdir}/metadata.bin")))
+
+            # Same size, different bytes: only the opt-in checksum pass notices.
+            lexical = Path(f"{tmpdir}/faiss.lexical.json")
+            lexical.write_text(lexical.read_text().replace('"format_version":1', '"format_version":2'))
+            idx = make()
+            with self.assertRaises(ValueError):
+                idx._validate_snapshot(manifest, verify_checksums=True)
+            idx._validate_snapshot(manifest, verify_checksums=False)
+
+            lexical.write_text("{}")
+            with self.assertRaises(ValueError):
+                make().load()
+
+            manifest["format_version"] = indexer_module.SNAPSHOT_FORMAT_VERSION + 1
+            with self.assertRaises(ValueError):
+                idx._validate_snapshot(manifest)
+
     def test_build_index_handles_empty_vectors(self):
         dummy_vectors = {}
         install_stubs(dummy_vectors)
@@ -0,0 +1,78 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.lexical_index import LexicalIndex, SearchPathStats, fuse_scores, query_identifiers
+
+RECORDS = [
+    {"name": "Torchvision", "api_name": "torchvision.models.resnet50", "description": "Pretrained ResNet-50 image model"},
+    {"name": "alpha", "api_name": "gcloud.alpha.bms.networks().update", "description": "Update a Bare Metal network"},
+    {"name": "RapidAPI", "api_name": "requests.get", "description": "Weather forecast lookup"},
+    {"name": "RapidAPI", "api_name": "requests.get", "description": "Historical events search"},
+    {"name": "Payments", "api_name": "payments.transfer", "description": "Transfer funds between accounts"},
+]
+
+
+class TestLexicalIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = LexicalIndex.from_records([10, 20, 30, 40, 50], RECORDS)
+
+    def test_query_identifiers_strip_call_parens(self):
+        self.assertIn("gcloud.alpha.bms.networks.update", query_identifiers("Call gcloud.alpha.bms.networks().update now."))
+
+    def test_exact_match_on_specific_api_name(self):
+        self.assertEqual(self.index.exact_matches("call torchvision.models.resnet50", max_tools=3), [10])
+        self.assertEqual(self.index.exact_matches("use gcloud.alpha.bms.networks().update", max_tools=3), [20])
+        self.assertEqual(self.index.exact_matches("a resnet for images", max_tools=3), [])
+
+    def test_bare_word_api_name_is_only_a_hint(self):
+        index = LexicalIndex.from_records([60, 70], [
+            {"name": "Subtract", "api_name": "subtract", "description": "Subtract two numbers"},
+            {"name": "DataFrame", "api_name": "pandas.DataFrame", "description": "Tabular data"},
+        ])
+        query = "Subtract 5 from 10 and then send the result by email"
+        self.assertEqual(index.exact_matches(query, max_tools=3), [])
+        self.assertEqual(index.exact_matches(query, max_tools=3, qualified=False), [60])
+        self.assertEqual(index.exact_matches("load it into a pandas.DataFrame", max_tools=3), [70])
+
+    def test_shared_api_name_is_not_an_exact_match(self):
+        self.assertEqual(self.index.exact_matches("requests.get the forecast", max_tools=1), [])
+        self.assertEqual(self.index.exact_matches("requests.get the forecast", max_tools=2), [30, 40])
+
+    def test_bm25_ranks_matching_description_first(self):
+        hits = self.index.search("transfer funds to another account", k=3)
+        self.assertEqual(hits[0], (50, 1.0))
+        self.assertEqual(self.index.search("zzz", k=3), [])
+
+    def test_add_ignores_known_ids(self):
+        self.index.add(50, RECORDS[4])
+        self.assertEqual(len(self.index), 5)
+
+    def test_save_and_load_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "faiss.lexical.json"
+            self.index.save(path)
+            loaded = LexicalIndex.load(path)
+        self.assertEqual(loaded.search("weather forecast", k=2), self.index.search("weather forecast", k=2))
+        self.assertEqual(loaded.exact_matches("payments.transfer", max_tools=3), [50])
+
+    def test_fuse_scores_adds_weighted_lexical(self):
+        fused = fuse_scores([(1, 0.8), (2, 0.7)], [(2, 1.0), (3, 0.5)], weight=0.3)
+        self.assertEqual([fid for fid, _ in fused], [2, 1, 3])
+        self.assertAlmostEqual(dict(fused)[3], 0.15)
+
+    def test_search_path_stats(self):
+        stats = SearchPathStats()
+        stats.record("dense", 2, 20.0)
+        stats.record("fast_path", 2, 1.0)
+        snapshot = stats.stats()
+        self.assertEqual(snapshot["queries"], 4)
+        self.assertEqual(snapshot["fast_path_rate"], 0.5)
+        self.assertAlmostEqual(snapshot["estimated_saved_ms"], 19.0)
+
+        stats.record("fused", 2, 30.0, lexical_ms=8.0)
+        self.assertAlmostEqual(stats.stats()["fusion_added_mean_ms"], 4.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from src import llm_cache
+from src.llm_cache import LLMCallCache, complete
+
+
+class FakeClient:
+    def __init__(self, *outputs):
+        self.outputs = list(outputs)
+        self.calls = []
+        outer = self
+
+        class Responses:
+            def create(self, **kwargs):
+                outer.calls.append(kwargs)
+                return type("Response", (), {"output_text": outer.outputs.pop(0)})()
+
+        self.responses = Responses()
+
+
+class TestLLMCallCache(unittest.TestCase):
+    def test_repeat_prompt_skips_the_api(self):
+        cache = LLMCallCache(max_size=8, path="", ttl_s=0)
+        client = FakeClient('{"segments": ["a"]}')
+        first = complete(client, cache, "m", "split this", 0.0, json.loads)
+        second = complete(client, cache, "m", "split this", 0.0, json.loads)
+        self.assertEqual(first, second)
+        self.assertEqual(len(client.calls), 1)
+        self.assertEqual((cache.stats()["hits"], cache.stats()["misses"]), (1, 1))
+
+    def test_model_and_temperature_are_part_of_the_key(self):
+        cache = LLMCallCache(max_size=8, path="", ttl_s=0)
+        cache.put("m", "p", 0.0, "x")
+        self.assertIsNone(cache.get("other", "p", 0.0))
+        self.assertNotEqual(LLMCallCache.make_key("m", "p", 0.0), LLMCallCache.make_key("m", "p", 0.5))
+
+    def test_sampled_calls_bypass_the_cache(self):
+        cache = LLMCallCache(max_size=8, path="", ttl_s=0)
+        client = FakeClient('{"steps": [1]}', '{"steps": [2]}')
+        first = complete(client, cache, "m", "plan", 0.2, json.loads)
+        second = complete(client, cache, "m", "plan", 0.2, json.loads)
+        self.assertNotEqual(first, second)
+        self.assertEqual(cache.stats()["bypassed"], 2)
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def test_unparseable_response_is_not_stored(self):
+        cache = LLMCallCache(max_size=8, path="", ttl_s=0)
+        client = FakeClient("not json", '{"ok": true}')
+        with self.assertRaises(ValueError):
+            complete(client, cache, "m", "p", 0.0, json.loads)
+        self.assertEqual(complete(client, cache, "m", "p", 0.0, json.loads), {"ok": True})
+        self.assertEqual(len(client.calls), 2)
+
+    def test_disk_tier_survives_restart_and_expires(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = str(Path(tmpdir) / "llm.sqlite")
+            with patch.object(llm_cache.time, "time", return_value=1000.0):
+                cache = LLMCallCache(max_size=8, path=path, ttl_s=60)
+                cache.put("m", "p", 0.0, "answer")
+                cache.close()
+
+            with patch.object(llm_cache.time, "time", return_value=1030.0):
+                restarted = LLMCallCache(max_size=8, path=path, ttl_s=60)
+                self.assertEqual(restarted.get("m", "p", 0.0), "answer")
+                self.assertEqual(restarted.stats()["disk_hits"], 1)
+                restarted.close()
+
+            with patch.object(llm_cache.time, "time", return_value=1061.0):
+                later = LLMCallCache(max_size=8, path=path, ttl_s=60)
+                self.assertIsNone(later.get("m", "p", 0.0))
+                self.assertEqual(later.stats()["expirations"], 1)
+                later.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
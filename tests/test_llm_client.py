@@ -0,0 +1,124 @@
+import asyncio
+import threading
+import unittest
+from unittest.mock import patch
+
+import openai
+
+from src import llm_client
+from src.llm_client import AsyncPooledLLMClient, PooledLLMClient, RetryBudget, TokenBucket, TransportStats
+from timing.mock_openai_server import serve
+
+
+def connection_error():
+    return openai.APIConnectionError(request=None)
+
+
+class FlakyOpenAI:
+    # Fails the first `failures` calls with `error`, then answers; with_options mimics the SDK copy.
+    def __init__(self, failures, error=connection_error, is_async=False):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+        self.timeout = None
+        outer = self
+
+        def create(**kwargs):
+            outer.calls += 1
+            if outer.calls <= outer.failures:
+                raise outer.error()
+            return type("Response", (), {"output_text": "ok"})()
+
+        async def acreate(**kwargs):
+            return create(**kwargs)
+
+        self.responses = type("Responses", (), {"create": staticmethod(acreate if is_async else create)})()
+
+    def with_options(self, timeout):
+        self.timeout = timeout
+        return self
+
+
+def pooled(client, cls=PooledLLMClient, max_retries=2, budget=None, limiter=None):
+    return cls("rerank", client, max_retries=max_retries, limiter=limiter or TokenBucket(rate=0),
+               budget=budget or RetryBudget(ratio=0.1, min_retries=10), stats=TransportStats())
+
+
+@patch.object(llm_client, "_backoff", lambda attempt: 0)
+class TestPooledLLMClient(unittest.TestCase):
+    def test_retries_transient_errors_with_stage_timeout(self):
+        client = FlakyOpenAI(failures=2)
+        wrapped = pooled(client)
+        self.assertEqual(wrapped.responses.create(model="m", input="p").output_text, "ok")
+        self.assertEqual(client.calls, 3)
+        self.assertEqual(client.timeout, llm_client.LLM_STAGE_TIMEOUTS_S["rerank"])
+        self.assertEqual(wrapped.stats.stats()["retries"], 2)
+
+    def test_gives_up_after_max_retries_and_on_non_retryable_errors(self):
+        with self.assertRaises(openai.APIConnectionError):
+            pooled(FlakyOpenAI(failures=5), max_retries=1).responses.create(model="m", input="p")
+
+        client = FlakyOpenAI(failures=1, error=lambda: ValueError("bad request"))
+        with self.assertRaises(ValueError):
+            pooled(client).responses.create(model="m", input="p")
+        self.assertEqual(client.calls, 1)
+
+    def test_retry_budget_caps_retries_across_calls(self):
+        budget = RetryBudget(ratio=0.0, min_retries=1)
+        client = FlakyOpenAI(failures=100)
+        wrapped = pooled(client, max_retries=3, budget=budget)
+        for _ in range(3):
+            with self.assertRaises(openai.APIConnectionError):
+                wrapped.responses.create(model="m", input="p")
+        # One budgeted retry in total, then every call fails fast.
+        self.assertEqual(client.calls, 4)
+        self.assertEqual(wrapped.stats.stats()["budget_exhausted"], 3)
+
+    def test_call_timeout_bounds_retries(self):
+        client = FlakyOpenAI(failures=100)
+        with patch.object(llm_client, "_backoff", lambda attempt: 0.05):
+            with self.assertRaises(TimeoutError):
+                pooled(client, max_retries=10).responses.create(model="m", input="p", timeout=0.08)
+        self.assertEqual(client.calls, 2)
+
+    def test_async_client_retries_too(self):
+        client = FlakyOpenAI(failures=1, is_async=True)
+        wrapped = pooled(client, cls=AsyncPooledLLMClient)
+        response = asyncio.run(wrapped.responses.create(model="m", input="p"))
+        self.assertEqual((response.output_text, client.calls), ("ok", 2))
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_burst_then_paced_by_rate(self):
+        with patch.object(llm_client.time, "monotonic", return_value=10.0):
+            bucket = TokenBucket(rate=2.0, burst=2)
+            waits = [bucket.reserve() for _ in range(4)]
+        self.assertEqual(waits, [0.0, 0.0, 0.5, 1.0])
+        self.assertEqual(TokenBucket(rate=0).reserve(), 0.0)
+
+
+class TestSharedAsyncClient(unittest.TestCase):
+    def setUp(self):
+        server = serve(port=0, latency_ms=0, jitter_ms=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    def test_async_client_works_across_event_loops(self):
+        # run_and_print calls asyncio.run per query; pooled connections must not outlive their loop.
+        env = {"OPENAI_API_KEY": "test", "OPENAI_BASE_URL": self.base_url}
+        with patch.dict("os.environ", env), patch.dict(llm_client._ASYNC_CLIENTS, clear=True):
+            client = llm_client.make_async_openai_client("rerank")
+
+            async def ask():
+                return (await client.responses.create(model="m", input="rank these")).output_text
+
+            for _ in range(3):
+                self.assertTrue(asyncio.run(ask()))
+            # Clients of closed loops are dropped when the next loop makes its own.
+            self.assertEqual(len(llm_client._ASYNC_CLIENTS), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
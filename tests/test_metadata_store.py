@@ -0,0 +1,57 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.metadata_store import MetadataStore, write_metadata_store
+
+
+class TestMetadataStore(unittest.TestCase):
+    def test_round_trip_drops_text_and_decodes_rows(self):
+        records = [
+            {"id": 0, "tool_id": "a", "text": "a::a.do", "name": "Ä", "parameters": {"required": [{"name": "x"}]}},
+            {"id": 1, "tool_id": "b", "text": "b::b.do", "name": "B", "parameters": {"required": []}},
+        ]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "metadata.bin"
+            write_metadata_store(path, records)
+            store = MetadataStore(path)
+            try:
+                self.assertEqual(len(store), 2)
+                self.assertEqual(store[1]["tool_id"], "b")
+                self.assertEqual(store[-2]["name"], "Ä")
+                self.assertNotIn("text", store[0])
+                self.assertEqual([r["id"] for r in store], [0, 1])
+                with self.assertRaises(IndexError):
+                    store[2]
+            finally:
+                store.close()
+
+    def test_precomputed_id_order(self):
+        records = [{"tool_id": t} for t in ("c", "a", "b")]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "metadata.bin"
+            write_metadata_store(path, records, ids=[30, 10, 20])
+            store = MetadataStore(path)
+            self.assertEqual(store.id_order.tolist(), [1, 2, 0])
+            self.assertEqual(store[int(store.id_order[0])]["tool_id"], "a")
+            store.close()
+
+    def test_empty_store(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "metadata.bin"
+            write_metadata_store(path, [])
+            store = MetadataStore(path)
+            self.assertEqual(len(store), 0)
+            self.assertEqual(list(store), [])
+            store.close()
+
+    def test_rejects_foreign_file(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "metadata.bin"
+            path.write_bytes(b"[{\"id\": 0}]" + b" " * 32)
+            with self.assertRaises(ValueError):
+                MetadataStore(path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from src import plan_cache
+from src.plan_cache import SemanticPlanCache
+
+
+def unit(*values):
+    vec = np.array(values, dtype=np.float32)
+    return vec / np.linalg.norm(vec)
+
+
+class TestSemanticPlanCache(unittest.TestCase):
+    def test_near_duplicate_query_hits_within_threshold(self):
+        cache = SemanticPlanCache(max_size=4, threshold=0.95, ttl_s=0)
+        cache.put(unit(1, 0, 0), 5, 1, {"query": "book a flight"})
+
+        self.assertEqual(cache.get(unit(1, 0.1, 0), 5, 1), {"query": "book a flight"})
+        self.assertIsNone(cache.get(unit(1, 1, 0), 5, 1))  # cosine ~0.71
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_count_and_index_version_must_match(self):
+        cache = SemanticPlanCache(max_size=4, threshold=0.9, ttl_s=0)
+        cache.put(unit(1, 0), 5, 1, {"query": "v1"})
+        cache.put(unit(1, 0.01), 5, 2, {"query": "v2"})
+
+        self.assertEqual(cache.get(unit(1, 0), 5, 2), {"query": "v2"})
+        self.assertIsNone(cache.get(unit(1, 0), 3, 2))
+        self.assertIsNone(cache.get(unit(1, 0), 5, 3))
+
+    def test_lru_eviction_and_ttl(self):
+        cache = SemanticPlanCache(max_size=2, threshold=0.99, ttl_s=60)
+        with patch.object(plan_cache.time, "monotonic", return_value=100.0):
+            cache.put(unit(1, 0, 0), 5, 1, {"query": "a"})
+            cache.put(unit(0, 1, 0), 5, 1, {"query": "b"})
+            cache.get(unit(1, 0, 0), 5, 1)
+            cache.put(unit(0, 0, 1), 5, 1, {"query": "c"})  # evicts "b", the least recently used
+            self.assertIsNone(cache.get(unit(0, 1, 0), 5, 1))
+            self.assertEqual(cache.get(unit(1, 0, 0), 5, 1), {"query": "a"})
+        with patch.object(plan_cache.time, "monotonic", return_value=161.0):
+            self.assertIsNone(cache.get(unit(1, 0, 0), 5, 1))
+        stats = cache.stats()
+        self.assertEqual((stats["size"], stats["evictions"], stats["expirations"]), (1, 1, 1))
+
+    def test_disabled_cache_stores_nothing(self):
+        cache = SemanticPlanCache(max_size=0)
+        cache.put(unit(1, 0), 5, 1, {"query": "a"})
+        self.assertIsNone(cache.get(unit(1, 0), 5, 1))
+        self.assertEqual(cache.stats()["size"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import json
+import unittest
+
+from src import prompting
+from src.planner import LLMPlanner
+
+
+def tool(tool_id, description="", required=()):
+    return {
+        "tool_id": tool_id,
+        "name": tool_id.upper(),
+        "api_name": f"{tool_id}.do",
+        "description": description,
+        "parameters": {"required": [{"name": n, "type": "string"} for n in required]},
+    }
+
+
+class FakeClient:
+    def __init__(self, output_text):
+        self.prompts = []
+        outer = self
+
+        class Responses:
+            def create(self, **kwargs):
+                outer.prompts.append(kwargs["input"])
+                return type("Response", (), {"output_text": output_text})()
+
+        self.responses = Responses()
+
+
+class TestPrompting(unittest.TestCase):
+    def test_fragment_truncates_description_and_lists_required_params(self):
+        fragment = prompting.prompt_fragment(tool("a", "x" * 200, required=["city"]))
+        self.assertEqual(fragment, f"id:a name:A api:a.do desc:{'x' * 120} req:[city(string)]")
+
+        record = prompting.with_prompt_fragment(tool("a"))
+        self.assertEqual(record["prompt_tokens"], prompting.count_tokens(record["prompt_fragment"]))
+        self.assertEqual(record["prompt_tokenizer"], prompting.tokenizer_name())
+
+    def test_counts_from_another_tokenizer_are_recomputed(self):
+        record = prompting.with_prompt_fragment(tool("a"))
+        expected = record["prompt_tokens"]
+        same = {**record, "prompt_tokens": 999}
+        self.assertEqual(prompting._fragment(same)[1], 999)
+        for stale in ({**same, "prompt_tokenizer": "cl100k_base-elsewhere"}, {**same, "prompt_tokenizer": None}):
+            self.assertEqual(prompting._fragment(stale)[1], expected)
+
+    def test_pack_keeps_rank_order_within_the_budget(self):
+        long_tool = prompting.with_prompt_fragment(tool("b", "y" * 120))
+        candidates = [prompting.with_prompt_fragment(tool("a")), long_tool, tool("c")]
+        small = prompting.count_tokens(prompting.prompt_fragment(tool("a"))) + prompting.LINE_OVERHEAD_TOKENS
+        budget = 2 * small + 1
+
+        kept, fragments = prompting.pack_candidates(candidates, token_budget=budget)
+        # b does not fit, the shorter c (no stored fragment) still does.
+        self.assertEqual([c["tool_id"] for c in kept], ["a", "c"])
+        self.assertTrue(fragments[1].startswith("id:c "))
+
+        kept, _ = prompting.pack_candidates(candidates, token_budget=1)
+        self.assertEqual([c["tool_id"] for c in kept], ["a"])
+        kept, _ = prompting.pack_candidates(candidates, token_budget=0, limit=2)
+        self.assertEqual([c["tool_id"] for c in kept], ["a", "b"])
+
+    def test_llm_planner_prompts_with_packed_candidates(self):
+        planner = LLMPlanner()
+        planner._client = FakeClient(json.dumps({"steps": []}))
+        planner.prompt_token_budget = 1
+        plan = planner.plan("do it", [tool("a"), tool("b")])
+        self.assertEqual(plan["candidates_considered"], ["a"])
+        self.assertIn("- id:a name:A", planner._client.prompts[0])
+        self.assertNotIn("id:b", planner._client.prompts[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
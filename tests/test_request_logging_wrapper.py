@@ -22,6 +22,10 @@ class DummyIndexer:
         self.calls.append(query)
         return [{"tool_id": "a"}, {"tool_id": "b"}]
 
+    def search_many(self, queries, *args, **kwargs):
+        self.calls.extend(queries)
+        return [[{"tool_id": "a"}, {"tool_id": "b"}] for _ in queries]
+
 
 class DummyReranker:
     def __init__(self):
@@ -82,6 +86,29 @@ class TestRequestLoggingWrapper(unittest.TestCase):
         self.assertEqual(client.reranker.rerank.__name__, original_rerank.__name__)
         self.assertEqual(client.planner.plan.__name__, original_plan.__name__)
 
+    def test_wrapper_logs_each_query_of_search_many(self):
+        client = DummyClient()
+        client.plan_query = lambda query, *a, **k: {
+            "query": query,
+            "plan": {"steps": []},
+            "candidates": [c for hits in client.indexer.search_many(query.split("|")) for c in hits],
+        }
+
+        records = []
+        logger = logging.getLogger("request_logger_many_test")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.handlers.clear()
+        logger.addHandler(ListHandler(records))
+
+        wrapped = wrap_client_with_request_logging(client, logger=logger)
+        wrapped.plan_query("first|second", request_id="req-2")
+
+        retrievals = [r for r in records if r.msg == "retrieval"]
+        self.assertEqual([r.query for r in retrievals], ["first", "second"])
+        self.assertTrue(all(r.request_id == "req-2" for r in retrievals))
+        self.assertEqual(client.indexer.search_many.__name__, "search_many")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,8 +1,23 @@
+import asyncio
+import json
 import unittest
 
 from src import reranker
 
 
+class FakeAsyncClient:
+    def __init__(self, output_text):
+        self.calls = []
+        outer = self
+
+        class Responses:
+            async def create(self, **kwargs):
+                outer.calls.append(kwargs)
+                return type("Response", (), {"output_text": output_text})()
+
+        self.responses = Responses()
+
+
 class TestReranker(unittest.TestCase):
     def test_identity_reranker_truncates(self):
         r = reranker.Reranker()
@@ -19,6 +34,15 @@ class TestReranker(unittest.TestCase):
         self.assertEqual([c["tool_id"] for c in res.candidates], ["x"])
         self.assertIn("identity", res.notes or "identity")
 
+    def test_async_rerank_orders_by_llm_ids(self):
+        r = reranker.OpenAILLMReranker(model="dummy")
+        r._async_client = FakeAsyncClient(json.dumps({"ranked_ids": ["y"]}))
+        candidates = [{"tool_id": "x"}, {"tool_id": "y"}, {"tool_id": "z"}]
+        res = asyncio.run(r.arerank("query", candidates, top_n=2))
+        self.assertEqual([c["tool_id"] for c in res.candidates], ["y", "x"])
+        self.assertEqual(res.notes, "llm_rerank")
+        self.assertEqual(r._async_client.calls[0]["model"], "dummy")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,92 @@
+import json
+import unittest
+
+from src.results import SearchHit, materialize, merge_segment_hits
+from src.utils import generate_function_as_text
+
+
+class RecordSource:
+    def __init__(self, records):
+        self.records = records
+        self.lookups = 0
+
+    def record(self, fid):
+        self.lookups += 1
+        return self.records[fid]
+
+
+class TestSearchHit(unittest.TestCase):
+    def test_fields_resolve_lazily_and_once(self):
+        shared = {"tool_id": "t1", "name": "Tool", "parameters": {"required": []}}
+        source = RecordSource({7: shared})
+        hit = SearchHit(0.5, 7, source)
+        self.assertEqual(source.lookups, 0)
+
+        self.assertEqual(hit["score"], 0.5)
+        self.assertEqual(source.lookups, 0)
+        self.assertEqual(hit.get("tool_id"), "t1")
+        self.assertEqual(hit.get("missing", "dflt"), "dflt")
+        self.assertIs(hit["parameters"], shared["parameters"])
+        self.assertEqual(source.lookups, 1)
+
+    def test_behaves_like_the_old_result_dict(self):
+        record = {"tool_id": "t1", "name": "Tool"}
+        hit = SearchHit(0.25, 1, RecordSource({1: record}))
+        expected = {"score": 0.25, "tool_id": "t1", "name": "Tool"}
+        self.assertEqual(dict(hit), expected)
+        self.assertEqual(hit, expected)
+        self.assertEqual(len(hit), 3)
+        self.assertEqual(list(hit.to_dict()), ["score", "tool_id", "name"])
+
+    def test_materialize_makes_response_json_serializable(self):
+        hit = SearchHit(0.9, 1, RecordSource({1: {"tool_id": "t1"}}))
+        payload = {"query": "q", "candidates": [hit], "plan": {"steps": [{"tool_id": "t1"}]}}
+        out = materialize(payload)
+        text = generate_function_as_text({})
+        self.assertEqual(json.loads(json.dumps(out))["candidates"], [{"score": 0.9, "tool_id": "t1", "text": text}])
+
+    def test_materialize_leaves_out_internal_fields(self):
+        record = {"id": 1, "tool_id": "t1", "prompt_fragment": "id:t1", "prompt_tokens": 3, "prompt_tokenizer": "x"}
+        hit = SearchHit(0.9, 1, RecordSource({1: record}))
+        text = generate_function_as_text({})
+        self.assertEqual(materialize([hit]), [{"score": 0.9, "tool_id": "t1", "text": text}])
+        self.assertEqual(materialize(merge_segment_hits([[hit]])),
+                         [{"score": 0.9, "tool_id": "t1", "segments": [0], "text": text}])
+        # Shards still ship the whole record to the coordinator.
+        self.assertEqual(hit.to_dict()["prompt_tokens"], 3)
+
+
+    def test_materialize_restores_text_dropped_by_the_metadata_store(self):
+        api = {"name": "Flights", "api_name": "flights.book", "description": "Book a flight", "parameters": {}}
+        stored = {"tool_id": "t1", **api}
+        self.assertEqual(materialize([SearchHit(0.9, 1, RecordSource({1: stored}))])[0]["text"],
+                         generate_function_as_text(api))
+        # A record that still carries its text is returned as is.
+        kept = {"tool_id": "t1", "text": "as built", **api}
+        self.assertEqual(materialize([SearchHit(0.9, 1, RecordSource({1: kept}))])[0]["text"], "as built")
+
+
+class TestMergeSegmentHits(unittest.TestCase):
+    def test_keeps_best_score_per_tool_and_records_segments(self):
+        source = RecordSource({1: {"tool_id": "a"}, 2: {"tool_id": "b"}, 3: {"tool_id": "c"}})
+        segments = [
+            [SearchHit(0.9, 1, source), SearchHit(0.5, 2, source)],
+            [SearchHit(0.8, 2, source), SearchHit(0.7, 1, source), SearchHit(0.1, 3, source)],
+        ]
+        merged = merge_segment_hits(segments)
+        self.assertEqual([(m["tool_id"], m["score"], m["segments"]) for m in merged],
+                         [("a", 0.9, [0, 1]), ("b", 0.8, [1, 0]), ("c", 0.1, [1])])
+        self.assertEqual(materialize(merged)[1],
+                         {"score": 0.8, "tool_id": "b", "segments": [1, 0], "text": generate_function_as_text({})})
+
+    def test_limit_caps_unique_tools(self):
+        segments = [[{"score": 0.9, "tool_id": "a"}, {"score": 0.3, "tool_id": "c"}],
+                    [{"score": 0.6, "tool_id": "b"}, {"score": 0.2, "tool_id": "a"}]]
+        merged = merge_segment_hits(segments, limit=2)
+        self.assertEqual([m["tool_id"] for m in merged], ["a", "b"])
+        self.assertEqual(merged[0]["segments"], [0, 1])
+        self.assertEqual(merge_segment_hits([]), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
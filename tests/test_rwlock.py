@@ -0,0 +1,67 @@
+import threading
+import time
+import unittest
+
+from src.rwlock import ReadWriteLock
+
+
+class TestReadWriteLock(unittest.TestCase):
+    def test_readers_share_and_writer_waits_for_them(self):
+        lock = ReadWriteLock()
+        events = []
+
+        def read():
+            with lock.read():
+                events.append("second reader")
+
+        with lock.read():
+            reader = threading.Thread(target=read)
+            reader.start()
+            reader.join(1)
+            self.assertEqual(events, ["second reader"])
+
+    def test_writer_excludes_readers_and_may_reenter(self):
+        lock = ReadWriteLock()
+        events = []
+
+        def read():
+            with lock.read():
+                events.append("read")
+
+        with lock.write():
+            with lock.write(), lock.read():
+                events.append("nested")
+            reader = threading.Thread(target=read)
+            reader.start()
+            time.sleep(0.05)
+            events.append("write done")
+        reader.join(1)
+        self.assertEqual(events, ["nested", "write done", "read"])
+
+    def test_waiting_writer_holds_back_new_readers(self):
+        lock = ReadWriteLock()
+        events = []
+
+        def write():
+            with lock.write():
+                events.append("write")
+
+        def read():
+            with lock.read():
+                events.append("late read")
+
+        with lock.read():
+            writer = threading.Thread(target=write)
+            writer.start()
+            time.sleep(0.05)
+            late = threading.Thread(target=read)
+            late.start()
+            time.sleep(0.05)
+            self.assertEqual(events, [])
+        writer.join(1)
+        late.join(1)
+        self.assertEqual(events, ["write", "late read"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import importlib
+import sys
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+
+from tests.test_indexer_unit import DummyEmbedder, install_stubs
+
+
+class FakeShardIndexer:
+    def __init__(self, tools):
+        self.tools = tools
+        self.size = len(tools)
+        self.built_with = None
+        self.version = 1
+
+    def search_vectors(self, qvecs, k=None, apply_std=None):
+        rows = []
+        for q in qvecs:
+            hits = [{"score": float(np.dot(q, vec)), "tool_id": tid} for tid, vec in self.tools.items()]
+            rows.append(sorted(hits, key=lambda h: -h["score"])[:k])
+        return [[FakeHit(h) for h in row] for row in rows]
+
+
+class FakeHit(dict):
+    def to_dict(self):
+        return dict(self)
+
+
+class TestSharding(unittest.TestCase):
+    def setUp(self):
+        install_stubs({})
+        for name in ("src.indexer", "src.sharding"):
+            sys.modules.pop(name, None)
+        self.sharding = importlib.import_module("src.sharding")
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            server.close()
+
+    def start_shard(self, tools):
+        server = self.sharding.ShardServer(FakeShardIndexer(tools), ("127.0.0.1", 0), authkey=b"test")
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.servers.append(server)
+        return server.address
+
+    def test_scatter_gather_merges_shard_results(self):
+        addresses = [
+            self.start_shard({"a": [1.0, 0.0], "c": [0.0, 1.0]}),
+            self.start_shard({"b": [0.8, 0.6]}),
+        ]
+        vectors = {"q1": [1.0, 0.0], "q2": [0.0, 1.0]}
+        sharded = self.sharding.ShardedIndexer(addresses, authkey=b"test", embedder=DummyEmbedder(vectors))
+        sharded.load()
+        self.assertEqual(sharded.size, 3)
+
+        results = sharded.search_vectors(np.array([[1.0, 0.0], [0.0, 1.0]], dtype=np.float32), k=2, apply_std=False)
+        self.assertEqual([h["tool_id"] for h in results[0]], ["a", "b"])
+        self.assertEqual([h["tool_id"] for h in results[1]], ["c", "b"])
+
+        by_query = sharded.search_many(["q1", "q2"])
+        self.assertEqual(by_query[0][0]["tool_id"], "a")
+        self.assertEqual(by_query[1][0]["tool_id"], "c")
+        sharded.close()
+
+    def test_shard_error_is_reported(self):
+        address = self.start_shard({"a": [1.0, 0.0]})
+        client = self.sharding.ShardClient(address, authkey=b"test")
+        with self.assertRaises(RuntimeError):
+            client.call("unknown")
+        self.assertEqual(client.call("ping")["size"], 1)
+        client.close()
+
+    def test_missing_authkey_is_refused(self):
+        with self.assertRaises(ValueError):
+            self.sharding.ShardServer(FakeShardIndexer({}), ("127.0.0.1", 0), authkey=b"")
+        with self.assertRaises(ValueError):
+            self.sharding.ShardClient(("127.0.0.1", 1), authkey=b"")
+
+    def test_build_shards_partitions_by_tool_id(self):
+        apis = {f"tool_{i}": {"name": f"T{i}", "api_name": f"t{i}", "description": "", "parameters": {}}
+                for i in range(6)}
+        built = []
+        self.sharding.Embedder = lambda: DummyEmbedder({})
+
+        class RecordingIndexer:
+            def __init__(self, index_path, metadata_path, embedder):
+                self.index_path = index_path
+
+            def build(self, part):
+                built.append((self.index_path, sorted(part)))
+
+        self.sharding.Indexer = RecordingIndexer
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self.sharding.build_shards(apis, 2, tmpdir)
+        self.assertEqual(len(built), 2)
+        self.assertEqual(sorted(t for _, part in built for t in part), sorted(apis))
+        for shard_id, (path, part) in enumerate(built):
+            self.assertEqual(path.parent.name, f"shard_{shard_id}")
+            for tool_id in part:
+                self.assertEqual(self.sharding.tool_int_id(tool_id) % 2, shard_id)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import sys
+import types
+import unittest
+
+from src.startup import AgentStartup
+
+
+class FakeIndexer:
+    def __init__(self):
+        self.searched = []
+
+    def search_many(self, queries):
+        self.searched.append(list(queries))
+        return [[] for _ in queries]
+
+
+class FakeEmbedder:
+    def __init__(self):
+        self.loaded = False
+
+    @property
+    def model(self):
+        self.loaded = True
+        return object()
+
+
+class FakeClient:
+    fail = False
+
+    def __init__(self, index_path, metadata_path):
+        if self.fail:
+            raise FileNotFoundError(index_path)
+        self.indexer = FakeIndexer()
+        self.embedder = FakeEmbedder()
+        self.startup_ms = {"index_load_ms": 1.0, "pipeline_stages_ms": 0.5}
+
+
+class TestAgentStartup(unittest.TestCase):
+    def setUp(self):
+        self._saved = sys.modules.get("src.client")
+        stub = types.ModuleType("src.client")
+        stub.ToolSelectorClient = FakeClient
+        stub.AsyncToolSelectorClient = type("FakeAsyncClient", (FakeClient,), {})
+        sys.modules["src.client"] = stub
+        FakeClient.fail = False
+
+    def tearDown(self):
+        if self._saved is not None:
+            sys.modules["src.client"] = self._saved
+        else:
+            sys.modules.pop("src.client", None)
+
+    def test_run_loads_warms_and_reports_breakdown(self):
+        startup = AgentStartup("idx", "meta", warmup_queries=["book a flight", "send an email"])
+        self.assertFalse(startup.ready)
+        self.assertEqual(startup.status()["phase"], "pending")
+
+        agent = startup.run()
+        self.assertTrue(startup.ready)
+        self.assertIs(type(agent), FakeClient)
+        self.assertIs(startup.agent, agent)
+        self.assertTrue(agent.embedder.loaded)
+        self.assertEqual(agent.indexer.searched, [["book a flight", "send an email"]])
+        breakdown = startup.status()["breakdown_ms"]
+        for key in ("imports_ms", "client_ms", "index_load_ms", "embedding_model_ms", "warmup_ms", "total_ms"):
+            self.assertIn(key, breakdown)
+
+    def test_failure_is_reported_not_ready(self):
+        FakeClient.fail = True
+        startup = AgentStartup("missing.index", "meta", warmup_queries=[])
+        startup.logger.disabled = True
+        try:
+            self.assertIsNone(startup.run())
+        finally:
+            startup.logger.disabled = False
+        status = startup.status()
+        self.assertFalse(status["ready"])
+        self.assertEqual(status["phase"], "failed")
+        self.assertIn("client: FileNotFoundError", status["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
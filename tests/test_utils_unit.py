@@ -30,6 +30,12 @@ class TestUtils(unittest.TestCase):
         h2 = utils.hash_dict(json.loads(json.dumps(payload)))
         self.assertEqual(h1, h2)
 
+    def test_tool_int_id_is_stable_positive_int64(self):
+        tool_id = utils.hash_dict({"name": "fn"})
+        self.assertEqual(utils.tool_int_id(tool_id), utils.tool_int_id(tool_id))
+        self.assertNotEqual(utils.tool_int_id(tool_id), utils.tool_int_id(tool_id + "x"))
+        self.assertTrue(0 <= utils.tool_int_id(tool_id) < 2 ** 63)
+
     def test_read_records_supports_json_array(self):
         data = [{"x": 1}, {"y": 2}]
         with tempfile.NamedTemporaryFile("w+", delete=False) as f:
@@ -96,7 +102,7 @@ class TestUtils(unittest.TestCase):
         try:
             original_paths = utils.DATASET_PATHS
             utils.DATASET_PATHS = [path]
-            funcs = utils.load_functions()
+            funcs = utils.load_functions(cache_dir="")
             self.assertIn(alpha_hash, funcs)
             self.assertIn(beta_hash, funcs)
             self.assertEqual(funcs[alpha_hash]["api_name"], "alpha.do")
@@ -105,6 +111,67 @@ class TestUtils(unittest.TestCase):
             utils.DATASET_PATHS = original_paths
             Path(path).unlink(missing_ok=True)
 
+    def test_read_records_streams_json_array(self):
+        records = [{"i": i, "text": "x" * 50} for i in range(200)]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "data.json"
+            path.write_text("  \n" + json.dumps(records, indent=1))
+            original_chunk = utils._JSON_CHUNK
+            utils._JSON_CHUNK = 64  # force records to straddle chunk boundaries
+            try:
+                self.assertEqual(list(utils.read_records(path)), records)
+            finally:
+                utils._JSON_CHUNK = original_chunk
+            path.write_text("[]")
+            self.assertEqual(list(utils.read_records(path)), [])
+
+    def test_json_array_survives_tiny_chunks(self):
+        cases = [
+            (" " * 10 + "\n\t[1, 2]", [1, 2]),
+            ("[12345, 6789, true, null]", [12345, 6789, True, None]),
+            ('[ "ab\\"cd" ,{"k": [1, 2]}, -1.5e3 ]', ['ab"cd', {"k": [1, 2]}, -1500.0]),
+            ("[123", [123]),
+        ]
+        original_chunk = utils._JSON_CHUNK
+        try:
+            for chunk in (1, 2, 3):
+                utils._JSON_CHUNK = chunk
+                for text, expected in cases:
+                    with tempfile.TemporaryFile("w+") as f:
+                        f.write(text)
+                        f.seek(0)
+                        self.assertEqual(list(utils._iter_json_array(f)), expected, (chunk, text))
+        finally:
+            utils._JSON_CHUNK = original_chunk
+
+    def test_load_functions_caches_per_file_and_keeps_path_order(self):
+        fn_a = {"name": "a", "api_name": "a.run", "parameters": {}, "description": "first"}
+        fn_b = {"name": "b", "api_name": "b.run", "parameters": {}, "description": "second"}
+        with tempfile.TemporaryDirectory() as tmp:
+            first, second = Path(tmp) / "first.jsonl", Path(tmp) / "second.json"
+            first.write_text(json.dumps({"function": fn_a}) + "\n")
+            second.write_text(json.dumps([{"function": fn_a}, {"function": fn_b}]))
+            cache_dir = Path(tmp) / "cache"
+
+            funcs = utils.load_functions([first, second], cache_dir=cache_dir, workers=2)
+            self.assertEqual([f["name"] for f in funcs.values()], ["a", "b"])
+            self.assertEqual(len(list(cache_dir.glob("*.json"))), 2)
+
+            original_parse = utils._parse_dataset
+            parsed = []
+            utils._parse_dataset = lambda path: parsed.append(path) or original_parse(path)
+            try:
+                self.assertEqual(utils.load_functions([first, second], cache_dir=cache_dir, workers=1), funcs)
+                self.assertEqual(parsed, [])
+
+                # A changed file is re-parsed; the untouched one still comes from the cache.
+                second.write_text(json.dumps([{"function": fn_b}, {"function": fn_b}, {"function": fn_b}]))
+                funcs = utils.load_functions([first, second], cache_dir=cache_dir, workers=1)
+                self.assertEqual(parsed, [second])
+                self.assertEqual([f["name"] for f in funcs.values()], ["a", "b"])
+            finally:
+                utils._parse_dataset = original_parse
+
     def test_normalize_vectors(self):
         vecs = np.array([[3.0, 4.0], [0.0, 5.0]])
         normed = utils.normalize(vecs)
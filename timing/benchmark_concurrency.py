@@ -0,0 +1,132 @@
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from evaluation.compare_index_types import load_queries  # noqa: E402
+from src import client as client_module  # noqa: E402
+from src.client import AsyncToolSelectorClient, ToolSelectorClient  # noqa: E402
+from src.llm_cache import LLMCallCache  # noqa: E402
+from src.llm_client import TRANSPORT_STATS  # noqa: E402
+from timing.mock_openai_server import serve  # noqa: E402
+
+
+async def run_load(handle, queries, concurrency):
+    # Same shape as the backend: every request is a coroutine on one event loop.
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(query):
+        async with semaphore:
+            t0 = time.perf_counter()
+            await handle(query)
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(q) for q in queries))
+    wall_s = time.perf_counter() - t0
+    return {
+        "wall_s": wall_s,
+        "req_per_s": len(queries) / wall_s if wall_s > 0 else 0.0,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+    }
+
+
+def use_llm_cache(agent, cache):
+    # Each path gets its own cache, so answers fetched by one path are never replayed to the other.
+    for stage in (agent.context_segments, agent.reranker, agent.planner):
+        if hasattr(stage, "llm_cache"):
+            stage.llm_cache = cache
+
+
+def new_llm_cache(enabled):
+    # In-memory only (never the LLM_CACHE_PATH file); max_size=0 turns every lookup into a miss.
+    return LLMCallCache(max_size=1024 if enabled else 0, path="")
+
+
+async def run_path(agent, handle, queries, args):
+    cache = new_llm_cache(args.llm_cache)
+    use_llm_cache(agent, cache)
+    before = TRANSPORT_STATS.stats()
+    row = await run_load(handle, queries, args.concurrency)
+    after = TRANSPORT_STATS.stats()
+    row["llm_cache"] = cache.stats()
+    row["llm_transport"] = {key: after[key] - before[key] for key in after}
+    return row
+
+
+async def main_async(args, pool):
+    agent = AsyncToolSelectorClient()
+    blocking_agent = ToolSelectorClient()  # shares the registry's embedding model; the index is mmapped
+    queries = [pool[i % len(pool)] for i in range(args.requests)]
+
+    async def blocking(query):
+        # The pre-async backend: the synchronous pipeline called directly inside the handler.
+        return blocking_agent.plan_query(query, count=args.count)
+
+    async def non_blocking(query):
+        return await agent.plan_query(query, count=args.count)
+
+    # Warm the model, FAISS and the HTTP connection pools without seeding either path's LLM cache.
+    use_llm_cache(agent, new_llm_cache(False))
+    await non_blocking(pool[0])
+    rows = [("sync", await run_path(blocking_agent, blocking, queries, args)),
+            ("async", await run_path(agent, non_blocking, queries, args))]
+    agent.close()
+    blocking_agent.close()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent throughput of the sync vs async query pipeline.")
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--count", type=int, default=5)
+    parser.add_argument("--mock-latency-ms", type=float, default=None,
+                        help="serve LLM calls from an in-process mock API with this latency (offline runs)")
+    parser.add_argument("--llm-cache", action="store_true",
+                        help="cache LLM answers within each path (off by default, so every call is a round trip)")
+    args = parser.parse_args()
+
+    if args.mock_latency_ms is not None:
+        server = serve(port=0, latency_ms=args.mock_latency_ms, jitter_ms=args.mock_latency_ms / 10)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}/v1"
+        if not os.getenv("OPENAI_API_KEY"):
+            os.environ["OPENAI_API_KEY"] = "mock"
+
+    flags = {
+        "segmenter": client_module.use_llm_context_segmenter,
+        "rerank": client_module.use_llm_rerank,
+        "planner": client_module.use_llm_planner,
+    }
+    if not any(flags.values()):
+        print("No USE_LLM_* flag is set; both paths only do CPU work and should perform alike.")
+
+    pool = load_queries()
+    if not pool:
+        print("Nothing to benchmark: no evaluation queries found.")
+        return
+    rows = asyncio.run(main_async(args, pool))
+    print(f"\nrequests={args.requests} concurrency={args.concurrency} llm_stages={[k for k, v in flags.items() if v]}")
+    print(f"{'path':<6} {'wall_s':>7} {'req/s':>7} {'p50_ms':>8} {'p99_ms':>8}")
+    for name, row in rows:
+        print(f"{name:<6} {row['wall_s']:>7.2f} {row['req_per_s']:>7.2f} {row['p50_ms']:>8.1f} {row['p99_ms']:>8.1f}")
+    for name, row in rows:
+        cache = row["llm_cache"]
+        print(f"{name:<6} LLM cache: hits={cache['hits']} misses={cache['misses']} bypassed={cache['bypassed']}; "
+              f"LLM transport: {row['llm_transport']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from evaluation.compare_index_types import load_queries  # noqa: E402
+from src.embedder import EMBED_BACKENDS, Embedder  # noqa: E402
+from src.utils import generate_function_as_text, load_functions, normalize, rss_mb  # noqa: E402
+
+
+def time_backend(backend, queries, corpus_texts, batch_size):
+    rss_before = rss_mb()
+    t0 = time.perf_counter()
+    embedder = Embedder(backend=backend)
+    embedder.model  # the registry loads lazily; force it so load time is measured here
+    load_s = time.perf_counter() - t0
+
+    embedder.embed(queries[0])  # first call pays lazy init (graph optimization, allocator warm-up)
+    latencies = []
+    for query in queries:
+        t0 = time.perf_counter()
+        embedder.embed(query)
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+    t0 = time.perf_counter()
+    corpus = embedder.embed_batch(corpus_texts, batch_size=batch_size, num_workers=1)
+    batch_s = time.perf_counter() - t0
+
+    return {
+        "backend": backend,
+        "load_s": load_s,
+        "rss_mb": rss_mb() - rss_before,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "docs_per_s": len(corpus_texts) / batch_s if batch_s > 0 else 0.0,
+        "queries": normalize(embedder.embed_batch(queries, num_workers=1).astype("float32")),
+        "corpus": normalize(corpus.astype("float32")),
+    }
+
+
+def agreement(row, ref, k):
+    # Accuracy against the PyTorch vectors: per-vector cosine, and overlap of each query's top-k tools.
+    cosine = np.sum(row["corpus"] * ref["corpus"], axis=1)
+    k = min(k, len(ref["corpus"]))
+    top = np.argsort(-(row["queries"] @ row["corpus"].T), axis=1)[:, :k]
+    ref_top = np.argsort(-(ref["queries"] @ ref["corpus"].T), axis=1)[:, :k]
+    overlap = np.mean([len(set(a) & set(b)) / k for a, b in zip(top, ref_top)])
+    return float(cosine.mean()), float(cosine.min()), float(overlap)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare Embedder backends: latency, memory and agreement with PyTorch.")
+    parser.add_argument("--backends", nargs="+", default=list(EMBED_BACKENDS), choices=EMBED_BACKENDS)
+    parser.add_argument("--corpus-size", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    queries = load_queries()
+    corpus_texts = [generate_function_as_text(api) for api in list(load_functions().values())[:args.corpus_size]]
+    if not queries or not corpus_texts:
+        print("Nothing to benchmark: empty tool catalog or no queries.")
+        return
+
+    backends = ["torch"] + [b for b in args.backends if b != "torch"]
+    rows = [time_backend(backend, queries, corpus_texts, args.batch_size) for backend in backends]
+    ref = rows[0]
+
+    print(f"\nqueries={len(queries)} corpus={len(corpus_texts)} batch_size={args.batch_size} "
+          f"(RSS is the increase while loading and encoding; run one backend per process for exact numbers)")
+    print(f"{'backend':<10} {'load_s':>7} {'rss_mb':>7} {'p50_ms':>7} {'p99_ms':>7} {'docs/s':>8} "
+          f"{'cos_mean':>8} {'cos_min':>8} {'top' + str(args.k):>6}")
+    for row in rows:
+        cos_mean, cos_min, overlap = agreement(row, ref, args.k)
+        print(
+            f"{row['backend']:<10} {row['load_s']:>7.2f} {row['rss_mb']:>7.0f} {row['p50_ms']:>7.2f} "
+            f"{row['p99_ms']:>7.2f} {row['docs_per_s']:>8.1f} {cos_mean:>8.4f} {cos_min:>8.4f} {overlap:>6.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from src.context_segmenter import DeterministicSegmenter  # noqa: E402
+
+# Tool ids as the reranker / planner prompts list them ("0. id:<tool_id> name:..." / "- id:<tool_id> name:...").
+TOOL_ID_RE = re.compile(r"id:(\S+)")
+
+
+def reply_for(prompt):
+    # Answers in the JSON shape each stage's prompt asks for, so the pipeline runs end to end.
+    if '"segments"' in prompt:
+        query = prompt.rsplit("User request:\n", 1)[-1]
+        return {"segments": DeterministicSegmenter().segment(query) or [query]}
+    tool_ids = TOOL_ID_RE.findall(prompt)
+    if '"ranked_ids"' in prompt:
+        return {"ranked_ids": tool_ids}
+    return {"strategy": "llm_planner", "steps": [{"tool_id": tid, "arguments": {}} for tid in tool_ids[:1]]}
+
+
+def response_body(model, text):
+    return {
+        "id": f"resp_{uuid.uuid4().hex}",
+        "object": "response",
+        "created_at": int(time.time()),
+        "status": "completed",
+        "model": model,
+        "output": [{
+            "type": "message",
+            "id": f"msg_{uuid.uuid4().hex}",
+            "status": "completed",
+            "role": "assistant",
+            "content": [{"type": "output_text", "text": text, "annotations": []}],
+        }],
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": [],
+        "usage": {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0},
+    }
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection pooling on the client side is measurable
+    latency_ms = 300.0
+    jitter_ms = 50.0
+    error_rate = 0.0
+    requests = 0
+    connections = set()
+    _lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        with self._lock:
+            type(self).requests += 1
+            type(self).connections.add(self.client_address)
+        time.sleep(max(0.0, random.gauss(self.latency_ms, self.jitter_ms)) / 1000)
+
+        if not self.path.rstrip("/").endswith("/responses"):
+            self._send(404, {"error": {"message": f"{self.path} is not mocked", "type": "invalid_request_error"}})
+            return
+        if random.random() < self.error_rate:
+            self._send(503, {"error": {"message": "mock overload", "type": "server_error"}})
+            return
+        prompt = request.get("input") or ""
+        self._send(200, response_body(request.get("model", "mock"), json.dumps(reply_for(str(prompt)))))
+
+
+def serve(host="127.0.0.1", port=8090, latency_ms=300.0, jitter_ms=50.0, error_rate=0.0):
+    handler = type("Handler", (MockOpenAIHandler,), {
+        "latency_ms": latency_ms, "jitter_ms": jitter_ms, "error_rate": error_rate, "connections": set(),
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="OpenAI-compatible /v1/responses mock for offline latency and throughput runs.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls answered with a 503")
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, args.latency_ms, args.jitter_ms, args.error_rate)
+    print(f"Mock OpenAI API on http://{args.host}:{server.server_address[1]}/v1 "
+          f"(latency {args.latency_ms}±{args.jitter_ms} ms, error rate {args.error_rate})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Served {server.RequestHandlerClass.requests} requests over "
+              f"{len(server.RequestHandlerClass.connections)} connections.")
+
+
+if __name__ == "__main__":
+    main()